@@ -0,0 +1,60 @@
+"""
+HTTP-кеширование ресурсов лабиринта.
+
+Сетка лабиринта меняется только через PATCH /cells, каждая правка повышает
+ревизию. ETag строится из ID, ревизии, версии представления и формата
+(JSON/MessagePack) и читает из БД только ревизию. Список решений растет, его
+ETag включает число решений и максимальный ID. REPRESENTATION_VERSION
+повышается при любом изменении формата ответов.
+"""
+from typing import Optional
+
+from fastapi import Request
+from fastapi.responses import Response
+
+REPRESENTATION_VERSION = 2
+
+# Ресурс может измениться: клиент и CDN обязаны перепроверять ETag
+REVALIDATE = "no-cache"
+
+
+def maze_etag(maze_id: int, revision: int, binary: bool = False) -> str:
+    fmt = "msgpack" if binary else "json"
+    return f'"m{maze_id}-r{revision}-v{REPRESENTATION_VERSION}-{fmt}"'
+
+
+def tile_etag(maze_id: int, revision: int) -> str:
+    # Координаты фрагмента входят в URL, кеши различают их по нему
+    return f'"t{maze_id}-r{revision}-v{REPRESENTATION_VERSION}"'
+
+
+def solutions_etag(maze_id: int, count: int, max_id: Optional[int]) -> str:
+    return f'"s{maze_id}-{count}-{max_id or 0}-v{REPRESENTATION_VERSION}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """If-None-Match со слабым сравнением (RFC 9110, 13.1.2)"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+def cache_headers(response: Response, etag: str, cache_control: str, vary: bool = True) -> Response:
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = cache_control
+    if vary:
+        response.headers["Vary"] = "Accept"
+    return response
+
+
+def not_modified(etag: str, cache_control: str, vary: bool = True) -> Response:
+    return cache_headers(Response(status_code=304), etag, cache_control, vary)
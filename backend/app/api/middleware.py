@@ -0,0 +1,94 @@
+import time
+
+from app.config import get_settings
+from app.services.metrics import REQUEST_LATENCY, RESPONSE_SIZE
+from app.services.profiler import RequestProfiler, wants_profile
+from app.services.timing import clear_timer, start_timer
+
+
+def route_label(scope) -> str:
+    """Шаблон пути маршрута (/api/maze/{maze_id}), а не конкретный URL"""
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+class MetricsMiddleware:
+    """ASGI-middleware: латентность и размер ответа по маршрутам"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500
+        size = 0
+
+        async def send_wrapper(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = route_label(scope)
+            method = scope["method"]
+            REQUEST_LATENCY.observe(
+                time.perf_counter() - started, method=method, route=route, status=status
+            )
+            RESPONSE_SIZE.observe(size, method=method, route=route)
+
+
+class ServerTimingMiddleware:
+    """
+    Заголовок Server-Timing с фазами запроса (см. app.services.timing) и
+    опциональное профилирование cProfile (см. app.services.profiler).
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        settings = get_settings()
+        header_name = settings.PROFILE_HEADER.lower().encode()
+        profile_header = None
+        for name, value in scope["headers"]:
+            if name == header_name:
+                profile_header = value.decode("latin-1")
+                break
+
+        profiler = None
+        if wants_profile(profile_header):
+            profiler = RequestProfiler()
+            if not profiler.start():
+                profiler = None
+
+        timer = start_timer()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", timer.header_value().encode()))
+                if profiler is not None:
+                    profile_id = await profiler.stop()
+                    headers.append((b"x-profile-id", profile_id.encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            clear_timer()
+            if profiler is not None and profiler.profile_id is None:
+                await profiler.stop()
@@ -0,0 +1,107 @@
+import uuid
+from typing import Any, Dict
+
+import msgpack
+import orjson
+from fastapi import Request
+from fastapi.responses import JSONResponse, Response
+
+MSGPACK_MEDIA_TYPE = "application/x-msgpack"
+MSGPACK_MEDIA_TYPES = {MSGPACK_MEDIA_TYPE, "application/msgpack", "application/vnd.msgpack"}
+
+# Описание альтернативного представления для OpenAPI (responses=... в декораторе)
+BINARY_RESPONSES = {
+    200: {
+        "content": {MSGPACK_MEDIA_TYPE: {}},
+        "description": "JSON по умолчанию или MessagePack при Accept: application/x-msgpack",
+    }
+}
+
+
+class RawJSON:
+    """Уже сериализованный JSON (например, колонка grid из БД), вставляется как есть"""
+
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value.encode() if isinstance(value, str) else value
+
+
+def dumps(content: Any) -> bytes:
+    """
+    orjson-сериализация с подстановкой RawJSON без декодирования.
+
+    Каждое RawJSON заменяется уникальной строкой-заглушкой, после orjson.dumps
+    заглушки в байтах заменяются исходным JSON-текстом.
+    """
+    raw: Dict[bytes, bytes] = {}
+    prefix = f"__raw_{uuid.uuid4().hex}_"
+
+    def substitute(value):
+        if isinstance(value, RawJSON):
+            key = f"{prefix}{len(raw)}"
+            raw[b'"' + key.encode() + b'"'] = value.value
+            return key
+        if isinstance(value, dict):
+            return {k: substitute(v) for k, v in value.items()}
+        if isinstance(value, list):
+            return [substitute(v) for v in value]
+        return value
+
+    body = orjson.dumps(substitute(content))
+    for placeholder, value in raw.items():
+        body = body.replace(placeholder, value, 1)
+    return body
+
+
+class TrustedJSONResponse(JSONResponse):
+    """
+    Ответ для данных из собственного репозитория.
+
+    Возвращается из обработчика напрямую, поэтому FastAPI не прогоняет его через
+    response_model (схема OpenAPI при этом остается прежней).
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+class MsgPackResponse(Response):
+    media_type = MSGPACK_MEDIA_TYPE
+
+    def render(self, content: Any) -> bytes:
+        return msgpack.packb(content, use_bin_type=True, datetime=False, default=_msgpack_default)
+
+
+def _msgpack_default(value):
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    raise TypeError(f"Тип не поддерживается MessagePack: {type(value)!r}")
+
+
+def wants_msgpack(request: Request) -> bool:
+    """
+    Разбор заголовка Accept: MessagePack выбирается, только если его q
+    строго выше, чем у JSON. */* и отсутствие заголовка дают JSON.
+    """
+    accept = request.headers.get("accept")
+    if not accept:
+        return False
+
+    json_q = msgpack_q = 0.0
+    for item in accept.split(","):
+        media_type, _, params = item.strip().partition(";")
+        media_type = media_type.strip().lower()
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if media_type in MSGPACK_MEDIA_TYPES:
+            msgpack_q = max(msgpack_q, q)
+        elif media_type in ("application/json", "application/*", "*/*"):
+            json_q = max(json_q, q)
+    return msgpack_q > json_q
@@ -0,0 +1,56 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+
+from app.database import get_db
+from app.api.responses import TrustedJSONResponse
+from app.schemas.analytics import MazeMetricsListResponse
+from app.repositories.analytics_repository import METRIC_FIELDS, AnalyticsRepository
+
+router = APIRouter(prefix="/api/analytics", tags=["analytics"])
+
+
+def get_analytics_repository(db: AsyncSession = Depends(get_db)) -> AnalyticsRepository:
+    return AnalyticsRepository(db)
+
+
+@router.get("/mazes", response_model=MazeMetricsListResponse)
+async def list_maze_metrics(
+    page: int = Query(1, ge=1, description="Номер страницы"),
+    size: int = Query(10, ge=1, le=100, description="Размер страницы"),
+    sort: str = Query("-dead_ends", description="Поле метрики; '-' в начале - по убыванию"),
+    algorithm: Optional[str] = Query(None, description="Алгоритм генерации"),
+    min_dead_ends: Optional[int] = Query(None, ge=0),
+    max_dead_ends: Optional[int] = Query(None, ge=0),
+    min_junctions: Optional[int] = Query(None, ge=0),
+    max_junctions: Optional[int] = Query(None, ge=0),
+    min_solution_length: Optional[int] = Query(None, ge=0),
+    max_solution_length: Optional[int] = Query(None, ge=0),
+    min_tortuosity: Optional[float] = Query(None, ge=0),
+    max_tortuosity: Optional[float] = Query(None, ge=0),
+    repo: AnalyticsRepository = Depends(get_analytics_repository)
+):
+    """Метрики лабиринтов (заполняет задача analyze или CLI) с фильтрами и сортировкой"""
+    if sort.lstrip("-") not in METRIC_FIELDS:
+        raise HTTPException(
+            status_code=422, detail=f"Сортировка возможна по полям: {', '.join(METRIC_FIELDS)}"
+        )
+    
+    rows, total = await repo.list_metrics(
+        skip=(page - 1) * size,
+        limit=size,
+        sort=sort,
+        algorithm=algorithm,
+        ranges={
+            "dead_ends": (min_dead_ends, max_dead_ends),
+            "junctions": (min_junctions, max_junctions),
+            "solution_length": (min_solution_length, max_solution_length),
+            "tortuosity": (min_tortuosity, max_tortuosity),
+        }
+    )
+    return TrustedJSONResponse({
+        "items": [repo.metrics_to_response(row) for row in rows],
+        "total": total,
+        "page": page,
+        "size": size
+    })
@@ -0,0 +1,96 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+
+from app.config import get_settings
+from app.api.responses import TrustedJSONResponse
+from app.api.routes.maze import get_maze_repository
+from app.schemas.job import JobAnalyzeRequest, JobGenerateRequest, JobResponse, JobSolveRequest
+from app.services.job_queue import JobQueue, QueueFullError, get_job_queue
+from app.repositories.job_repository import JobRepository
+from app.repositories.maze_repository import MazeRepository
+
+router = APIRouter(prefix="/api/jobs", tags=["jobs"])
+
+settings = get_settings()
+
+
+async def submit_job(queue: JobQueue, kind: str, params: dict, priority: int):
+    try:
+        job = await queue.submit(kind, params, priority)
+    except QueueFullError as e:
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": str(max(1, round(settings.JOB_POLL_INTERVAL * 10)))}
+        )
+    return TrustedJSONResponse(JobRepository.job_to_response(job), status_code=202)
+
+
+@router.post("/generate", response_model=JobResponse, status_code=202)
+async def submit_generate(
+    request: JobGenerateRequest,
+    queue: JobQueue = Depends(get_job_queue)
+):
+    params = request.model_dump(exclude={"priority"})
+    return await submit_job(queue, "generate", params, request.priority)
+
+
+@router.post("/solve", response_model=JobResponse, status_code=202)
+async def submit_solve(
+    request: JobSolveRequest,
+    queue: JobQueue = Depends(get_job_queue),
+    repo: MazeRepository = Depends(get_maze_repository)
+):
+    maze = await repo.get_maze(request.maze_id)
+    if not maze:
+        raise HTTPException(status_code=404, detail="Лабиринт не найден")
+    if request.record_steps and maze.width * maze.height > settings.JOB_MAX_TRACE_CELLS:
+        # Трасса хранится в строке solutions целиком
+        raise HTTPException(
+            status_code=422,
+            detail=f"record_steps доступен для лабиринтов до {settings.JOB_MAX_TRACE_CELLS} клеток"
+        )
+    
+    params = request.model_dump(exclude={"priority"})
+    return await submit_job(queue, "solve", params, request.priority)
+
+
+@router.post("/analyze", response_model=JobResponse, status_code=202)
+async def submit_analyze(
+    request: JobAnalyzeRequest,
+    queue: JobQueue = Depends(get_job_queue)
+):
+    """Пересчитать метрики лабиринтов без метрик или измененных после расчета"""
+    params = request.model_dump(exclude={"priority"})
+    return await submit_job(queue, "analyze", params, request.priority)
+
+
+@router.get("/{job_id}", response_model=JobResponse)
+async def get_job(
+    job_id: int,
+    wait: float = Query(
+        0, ge=0, le=settings.JOB_MAX_WAIT,
+        description="Ждать завершения задачи до N секунд (long-poll)"
+    ),
+    queue: JobQueue = Depends(get_job_queue)
+):
+    job = await queue.wait(job_id, wait) if wait else await queue.get(job_id)
+    
+    if not job:
+        raise HTTPException(status_code=404, detail="Задача не найдена")
+    
+    return TrustedJSONResponse(JobRepository.job_to_response(job))
+
+
+@router.post("/{job_id}/cancel", response_model=JobResponse)
+async def cancel_job(
+    job_id: int,
+    queue: JobQueue = Depends(get_job_queue)
+):
+    job = await queue.cancel(job_id)
+    
+    if not job:
+        raise HTTPException(status_code=404, detail="Задача не найдена")
+    if job.status != "cancelled":
+        raise HTTPException(status_code=409, detail=f"Задача уже завершена: {job.status}")
+    
+    return TrustedJSONResponse(JobRepository.job_to_response(job))
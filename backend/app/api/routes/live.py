@@ -0,0 +1,105 @@
+import asyncio
+
+import orjson
+from fastapi import APIRouter, Depends, Query, WebSocket, WebSocketDisconnect
+
+from app.config import get_settings
+from app.api.routes.maze import get_maze_repository
+from app.services.live_solve import LiveControl, LiveSolveSession
+from app.services.pathfinder import PathFinder
+from app.repositories.maze_repository import MazeRepository
+
+router = APIRouter(tags=["live"])
+
+settings = get_settings()
+
+
+async def read_controls(websocket: WebSocket, control: LiveControl) -> None:
+    try:
+        while True:
+            text = await websocket.receive_text()
+            try:
+                message = orjson.loads(text)
+            except orjson.JSONDecodeError:
+                continue
+            if isinstance(message, dict):
+                control.apply(message)
+    except WebSocketDisconnect:
+        control.disconnect()
+
+
+@router.websocket("/ws/maze/{maze_id}/solve")
+async def live_solve(
+    websocket: WebSocket,
+    maze_id: int,
+    algorithm: str = Query("astar"),
+    fps: float = Query(settings.LIVE_DEFAULT_FPS),
+    steps_per_frame: int = Query(1),
+    save: bool = Query(True, description="Сохранить решение (без трассы шагов)"),
+    repo: MazeRepository = Depends(get_maze_repository)
+):
+    await websocket.accept()
+    
+    async def send(message: dict) -> None:
+        await websocket.send_text(orjson.dumps(message).decode())
+    
+    if algorithm not in settings.PATHFINDING_ALGORITHMS:
+        await send({"type": "error", "detail": f"Неизвестный алгоритм: {algorithm}"})
+        await websocket.close(code=1008)
+        return
+    if algorithm == "bfs_bitboard":
+        # Волна идет плитками, пошаговой трассы у движка нет
+        await send({"type": "error", "detail": f"Алгоритм без пошагового режима: {algorithm}"})
+        await websocket.close(code=1008)
+        return
+    
+    maze = await repo.get_maze(maze_id)
+    if not maze:
+        await send({"type": "error", "detail": "Лабиринт не найден"})
+        await websocket.close(code=1008)
+        return
+    
+    grid = repo.load_grid(maze)
+    finder = PathFinder(grid, (maze.start_x, maze.start_y), (maze.end_x, maze.end_y))
+    await repo.release()
+    
+    control = LiveControl(
+        fps, steps_per_frame, settings.LIVE_MAX_FPS, settings.LIVE_MAX_STEPS_PER_FRAME
+    )
+    session = LiveSolveSession(
+        finder, algorithm, control, send, settings.LIVE_FRAME_WINDOW, settings.LIVE_TICK_BUDGET_MS
+    )
+    reader = asyncio.create_task(read_controls(websocket, control))
+    try:
+        await send({
+            "type": "start",
+            "maze_id": maze_id,
+            "algorithm": algorithm,
+            "fps": control.fps,
+            "steps_per_frame": control.steps_per_frame,
+            "window": session.window
+        })
+        result = await session.run()
+        if result is None:
+            if not control.disconnected:
+                await websocket.close()
+            return
+        
+        solution_id = None
+        if save:
+            solution = await repo.create_solution(
+                maze_id=maze_id,
+                algorithm=algorithm,
+                path=result["path"],
+                steps=[],
+                **result["stats"]
+            )
+            solution_id = solution.id
+        await send({"type": "done", "solution_id": solution_id, **result})
+        await websocket.close()
+    except (WebSocketDisconnect, RuntimeError):
+        # Отправка в уже закрытый клиентом сокет
+        if not control.disconnected:
+            raise
+    finally:
+        reader.cancel()
@@ -1,142 +1,633 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+import asyncio
+import time
+from concurrent.futures import Executor
+from contextlib import asynccontextmanager
+from typing import List, Optional
 
 from app.database import get_db
+from app.api.caching import (
+    REVALIDATE,
+    cache_headers,
+    etag_matches,
+    maze_etag,
+    not_modified,
+    solutions_etag,
+    tile_etag
+)
+from app.api.responses import (
+    BINARY_RESPONSES,
+    MSGPACK_MEDIA_TYPE,
+    MsgPackResponse,
+    TrustedJSONResponse,
+    wants_msgpack
+)
 from app.schemas.maze import (
+    EphemeralMazeRequest,
+    EphemeralMazeResponse,
+    MazeCompareRequest,
+    MazeCompareResponse,
+    MazeCellsPatch,
+    MazeCellsResponse,
     MazeGenerateRequest,
+    MazePathsBatchRequest,
+    MazePathsBatchResponse,
     MazeSolveRequest,
     MazeResponse,
     SolutionResponse,
-    MazeListResponse
+    MazeListResponse,
+    MazeTileResponse
+)
+from app.services.admission import (
+    AdmissionController,
+    AdmissionRejected,
+    client_id,
+    generation_cost,
+    get_admission_controller,
+    solve_cost
 )
+from app.services.batch_paths import assemble_results, group_queries, run_path_groups, split_groups
+from app.services.compare import run_compare_solve, share_grid
+from app.services.ephemeral import generate_and_solve
+from app.services.executor import get_request_executor, request_workers
 from app.services.maze_generator import MazeGenerator
-from app.services.pathfinder import PathFinder
+from app.services.pathfinder import PathFinder, SearchBudget
+from app.services.grid_store import GridStore, get_grid_store
+from app.services.metrics import (
+    GENERATION_TIME,
+    NODES_EXPLORED,
+    REPLAN_TIME,
+    SOLVE_TIME,
+    SOLVES_STOPPED,
+    size_bucket
+)
+from app.services.profiler import profiled
+from app.services.replanner import IncrementalPlanner, ReplannerCache, get_replanner_cache
+from app.services.response_cache import ResponseCache, get_response_cache
+from app.services.shared_cache import SharedGridCache, get_shared_grid_cache
+from app.services.timing import phase
+from app.services.write_behind import WriteBehindBuffer, get_write_behind
 from app.repositories.maze_repository import MazeRepository
 
 router = APIRouter(prefix="/api/maze", tags=["maze"])
 
 
-@router.post("/generate", response_model=MazeResponse)
-async def generate_maze(
-    request: MazeGenerateRequest,
-    db: Session = Depends(get_db)
+def get_maze_repository(
+    db: AsyncSession = Depends(get_db),
+    write_behind: Optional[WriteBehindBuffer] = Depends(get_write_behind),
+    grid_store: GridStore = Depends(get_grid_store),
+    shared_grids: Optional[SharedGridCache] = Depends(get_shared_grid_cache)
+) -> MazeRepository:
+    return MazeRepository(db, write_behind, grid_store, shared_grids)
+
+
+@asynccontextmanager
+async def admitted(
+    admission: Optional[AdmissionController],
+    http_request: Request,
+    cost: float,
+    endpoint: str
 ):
+    """Выполнить тело в бюджете контроля допуска; при перегрузке - 429"""
+    if admission is None:
+        yield
+        return
     try:
-        generator = MazeGenerator(request.width, request.height)
-        grid, start, end = generator.generate(request.algorithm)
-        
-        repo = MazeRepository(db)
-        maze = repo.create_maze(
-            width=request.width,
-            height=request.height,
-            grid=grid,
-            start=start,
-            end=end,
-            algorithm=request.algorithm
+        await admission.acquire(client_id(http_request), cost, endpoint)
+    except AdmissionRejected as e:
+        raise HTTPException(
+            status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)}
         )
+    try:
+        yield
+    finally:
+        admission.release(client_id(http_request), cost)
+
+
+async def cancel_on_disconnect(http_request: Request, budget: SearchBudget) -> None:
+    """Отменить поиск, когда клиент закрыл соединение"""
+    while True:
+        message = await http_request.receive()
+        if message["type"] == "http.disconnect":
+            budget.cancel()
+            return
+
+
+def discard_maze_bodies(cache: ResponseCache, maze_id: int, revision: int) -> None:
+    cache.discard(maze_etag(maze_id, revision))
+    cache.discard(maze_etag(maze_id, revision, binary=True))
+
+
+def maze_response(http_request: Request, repo: MazeRepository, maze):
+    with phase("serialize"):
+        if wants_msgpack(http_request):
+            response = MsgPackResponse(repo.maze_to_binary(maze))
+        else:
+            response = TrustedJSONResponse(repo.maze_to_response(maze, raw=True))
+    response.headers["Vary"] = "Accept"
+    return response
+
+
+def solution_response(http_request: Request, repo: MazeRepository, solution):
+    with phase("serialize"):
+        if wants_msgpack(http_request):
+            response = MsgPackResponse(repo.solution_to_binary(solution))
+        else:
+            response = TrustedJSONResponse(repo.solution_to_response(solution, raw=True))
+    response.headers["Vary"] = "Accept"
+    return response
+
+
+@router.post("/generate", response_model=MazeResponse, responses=BINARY_RESPONSES)
+async def generate_maze(
+    request: MazeGenerateRequest,
+    http_request: Request,
+    repo: MazeRepository = Depends(get_maze_repository),
+    admission: Optional[AdmissionController] = Depends(get_admission_controller)
+):
+    cost = generation_cost(request.width, request.height, request.algorithm)
+    async with admitted(admission, http_request, cost, "generate"):
+        try:
+            generator = MazeGenerator(request.width, request.height)
+            with phase("generate"), GENERATION_TIME.time(
+                algorithm=request.algorithm,
+                size_bucket=size_bucket(request.width, request.height)
+            ):
+                grid, start, end = generator.generate(request.algorithm)
+            
+            maze = await repo.create_maze(
+                width=request.width,
+                height=request.height,
+                grid=grid,
+                start=start,
+                end=end,
+                algorithm=request.algorithm
+            )
+            
+            return maze_response(http_request, repo, maze)
         
-        return repo.maze_to_response(maze)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Ошибка генерации: {str(e)}")
+
+
+@router.post("/ephemeral", response_model=EphemeralMazeResponse, responses=BINARY_RESPONSES)
+async def ephemeral_maze(
+    request: EphemeralMazeRequest,
+    http_request: Request,
+    executor: Executor = Depends(get_request_executor),
+    admission: Optional[AdmissionController] = Depends(get_admission_controller)
+):
+    """Сгенерировать и при необходимости решить лабиринт без сохранения в БД"""
+    cost = generation_cost(request.width, request.height, request.algorithm)
+    if request.solve is not None:
+        cost += solve_cost(request.width, request.height, request.solve, request.record_steps)
+    binary = wants_msgpack(http_request)
+    
+    async with admitted(admission, http_request, cost, "ephemeral"):
+        try:
+            loop = asyncio.get_running_loop()
+            with phase("compute"):
+                body, generation_time, stats = await loop.run_in_executor(
+                    executor, generate_and_solve,
+                    request.width, request.height, request.algorithm,
+                    request.solve, request.record_steps, binary
+                )
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Ошибка генерации: {str(e)}")
+    
+    bucket = size_bucket(request.width, request.height)
+    GENERATION_TIME.observe(generation_time, algorithm=request.algorithm, size_bucket=bucket)
+    if stats is not None:
+        SOLVE_TIME.observe(stats["search_time_ns"] / 1e9, algorithm=request.solve, size_bucket=bucket)
+        NODES_EXPLORED.observe(stats["nodes_explored"], algorithm=request.solve, size_bucket=bucket)
     
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Ошибка генерации: {str(e)}")
+    media_type = MSGPACK_MEDIA_TYPE if binary else "application/json"
+    return Response(body, media_type=media_type, headers={"Vary": "Accept"})
 
 
-@router.get("/{maze_id}", response_model=MazeResponse)
+@router.get("/{maze_id}", response_model=MazeResponse, responses=BINARY_RESPONSES)
 async def get_maze(
     maze_id: int,
-    db: Session = Depends(get_db)
+    http_request: Request,
+    repo: MazeRepository = Depends(get_maze_repository),
+    cache: Optional[ResponseCache] = Depends(get_response_cache)
 ):
-    repo = MazeRepository(db)
-    maze = repo.get_maze(maze_id)
+    # Сетка меняется только с ревизией: для 304 достаточно прочитать ревизию
+    revision = await repo.maze_revision(maze_id)
+    if revision is None:
+        raise HTTPException(status_code=404, detail="Лабиринт не найден")
+    
+    binary = wants_msgpack(http_request)
+    etag = maze_etag(maze_id, revision, binary)
+    if etag_matches(http_request, etag):
+        return not_modified(etag, REVALIDATE)
+    
+    body = cache.get(etag) if cache is not None else None
+    if body is not None:
+        media_type = MSGPACK_MEDIA_TYPE if binary else "application/json"
+        return cache_headers(Response(body, media_type=media_type), etag, REVALIDATE)
+    
+    maze = await repo.get_maze(maze_id)
     
     if not maze:
         raise HTTPException(status_code=404, detail="Лабиринт не найден")
     
-    return repo.maze_to_response(maze)
+    # Правка могла пройти между чтениями: ETag по ревизии прочитанной строки
+    etag = maze_etag(maze_id, maze.revision or 0, binary)
+    response = maze_response(http_request, repo, maze)
+    if cache is not None:
+        cache.put(etag, response.body)
+    return cache_headers(response, etag, REVALIDATE)
+
+
+@router.get("/{maze_id}/tile", response_model=MazeTileResponse)
+async def get_maze_tile(
+    maze_id: int,
+    http_request: Request,
+    x: int = Query(0, ge=0, description="Левый край фрагмента"),
+    y: int = Query(0, ge=0, description="Верхний край фрагмента"),
+    width: int = Query(32, ge=1, le=512, description="Ширина фрагмента"),
+    height: int = Query(32, ge=1, le=512, description="Высота фрагмента"),
+    repo: MazeRepository = Depends(get_maze_repository)
+):
+    revision = await repo.maze_revision(maze_id)
+    if revision is None:
+        raise HTTPException(status_code=404, detail="Лабиринт не найден")
+    
+    etag = tile_etag(maze_id, revision)
+    if etag_matches(http_request, etag):
+        return not_modified(etag, REVALIDATE, vary=False)
+    
+    maze = await repo.get_maze(maze_id)
+    
+    if not maze:
+        raise HTTPException(status_code=404, detail="Лабиринт не найден")
+    
+    etag = tile_etag(maze_id, maze.revision or 0)
+    grid = repo.load_grid(maze)
+    if isinstance(grid, list):
+        tile = [row[x:x + width] for row in grid[y:y + height]]
+    else:
+        tile = grid.tile(x, y, width, height)
+    
+    response = TrustedJSONResponse({
+        "maze_id": maze_id,
+        "x": x,
+        "y": y,
+        "width": len(tile[0]) if tile else 0,
+        "height": len(tile),
+        "grid": tile
+    })
+    return cache_headers(response, etag, REVALIDATE, vary=False)
 
 
 @router.get("/", response_model=MazeListResponse)
 async def get_mazes(
     page: int = Query(1, ge=1, description="Номер страницы"),
     size: int = Query(10, ge=1, le=100, description="Размер страницы"),
-    db: Session = Depends(get_db)
+    repo: MazeRepository = Depends(get_maze_repository)
 ):
-    repo = MazeRepository(db)
     skip = (page - 1) * size
-    mazes, total = repo.get_mazes(skip=skip, limit=size)
+    mazes, total = await repo.get_mazes(skip=skip, limit=size)
     
-    items = [repo.maze_to_response(maze) for maze in mazes]
+    items = [repo.maze_to_response(maze, raw=True) for maze in mazes]
     
-    return {
+    return TrustedJSONResponse({
         "items": items,
         "total": total,
         "page": page,
         "size": size
-    }
+    })
 
 
-@router.post("/{maze_id}/solve", response_model=SolutionResponse)
+@router.post("/{maze_id}/solve", response_model=SolutionResponse, responses=BINARY_RESPONSES)
 async def solve_maze(
     maze_id: int,
     request: MazeSolveRequest,
-    db: Session = Depends(get_db)
+    http_request: Request,
+    repo: MazeRepository = Depends(get_maze_repository),
+    admission: Optional[AdmissionController] = Depends(get_admission_controller)
 ):
-    repo = MazeRepository(db)
-    maze = repo.get_maze(maze_id)
+    maze = await repo.get_maze(maze_id)
     
     if not maze:
         raise HTTPException(status_code=404, detail="Лабиринт не найден")
     
-    try:
-        import json
-        grid = json.loads(maze.grid)
-        start = (maze.start_x, maze.start_y)
-        end = (maze.end_x, maze.end_y)
+    cost = solve_cost(
+        maze.width, maze.height, request.algorithm, request.record_steps,
+        request.max_nodes, request.max_ms
+    )
+    async with admitted(admission, http_request, cost, "solve"):
+        try:
+            with phase("decode"):
+                grid = repo.load_grid(maze)
+            start = (maze.start_x, maze.start_y)
+            end = (maze.end_x, maze.end_y)
+            
+            # Поиск идет в потоке, event loop тем временем следит за соединением:
+            # ушедший клиент останавливает поиск на ближайшей контрольной точке
+            budget = SearchBudget(request.max_nodes, request.max_ms)
+            watcher = asyncio.create_task(cancel_on_disconnect(http_request, budget))
+            pathfinder = PathFinder(grid, start, end)
+            try:
+                with phase("search"):
+                    result = await run_in_threadpool(
+                        profiled(pathfinder.find_path),
+                        request.algorithm,
+                        record_steps=request.record_steps,
+                        budget=budget
+                    )
+            finally:
+                watcher.cancel()
+            
+            if result["stopped"] is not None:
+                SOLVES_STOPPED.inc(algorithm=request.algorithm, reason=result["stopped"])
+            if result["stopped"] == "cancelled":
+                # Ответ никто не прочитает, результат не сохраняется
+                return Response(status_code=499)
+            if result["stopped"] is not None:
+                return JSONResponse(status_code=422, content={
+                    "detail": "Бюджет поиска исчерпан",
+                    "reason": result["stopped"],
+                    "stats": result["stats"]
+                })
+            
+            bucket = size_bucket(maze.width, maze.height)
+            SOLVE_TIME.observe(
+                result["stats"]["search_time_ns"] / 1e9, algorithm=request.algorithm, size_bucket=bucket
+            )
+            NODES_EXPLORED.observe(
+                result["stats"]["nodes_explored"], algorithm=request.algorithm, size_bucket=bucket
+            )
+            
+            solution = await repo.create_solution(
+                maze_id=maze_id,
+                algorithm=request.algorithm,
+                path=result["path"],
+                steps=result["steps"],
+                **result["stats"]
+            )
+            
+            return solution_response(http_request, repo, solution)
+    
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Ошибка поиска пути: {str(e)}")
+
+
+@router.post("/{maze_id}/compare", response_model=MazeCompareResponse)
+async def compare_algorithms(
+    maze_id: int,
+    request: MazeCompareRequest,
+    http_request: Request,
+    repo: MazeRepository = Depends(get_maze_repository),
+    executor: Executor = Depends(get_request_executor),
+    admission: Optional[AdmissionController] = Depends(get_admission_controller)
+):
+    """Решить лабиринт несколькими алгоритмами параллельно и сохранить результаты вместе"""
+    maze = await repo.get_maze(maze_id)
+    
+    if not maze:
+        raise HTTPException(status_code=404, detail="Лабиринт не найден")
+    
+    cost = sum(
+        solve_cost(maze.width, maze.height, algorithm, request.record_steps)
+        for algorithm in request.algorithms
+    )
+    async with admitted(admission, http_request, cost, "compare"):
+        shm = None
+        try:
+            # Сетка декодируется один раз; файл GridStore воркеры открывают сами
+            if maze.grid_file:
+                grid_path = repo.grid_store.path(maze.grid_file)
+            else:
+                with phase("decode"):
+                    shm = share_grid(repo.load_grid(maze))
+                grid_path = None
+            
+            loop = asyncio.get_running_loop()
+            with phase("search"):
+                results = await asyncio.gather(*(
+                    loop.run_in_executor(
+                        executor, run_compare_solve,
+                        shm.name if shm is not None else None, grid_path,
+                        maze.width, maze.height,
+                        (maze.start_x, maze.start_y), (maze.end_x, maze.end_y),
+                        algorithm, request.record_steps
+                    )
+                    for algorithm in request.algorithms
+                ))
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Ошибка поиска пути: {str(e)}")
+        finally:
+            if shm is not None:
+                shm.close()
+                shm.unlink()
+    
+    bucket = size_bucket(maze.width, maze.height)
+    for algorithm, result in zip(request.algorithms, results):
+        result["algorithm"] = algorithm
+        SOLVE_TIME.observe(result["stats"]["search_time_ns"] / 1e9, algorithm=algorithm, size_bucket=bucket)
+        NODES_EXPLORED.observe(result["stats"]["nodes_explored"], algorithm=algorithm, size_bucket=bucket)
+    
+    solutions = await repo.create_solutions(maze_id, results)
+    
+    with phase("serialize"):
+        return TrustedJSONResponse({
+            "maze_id": maze_id,
+            "results": [
+                {
+                    "solution_id": solution.id,
+                    "algorithm": result["algorithm"],
+                    "path": result["path"],
+                    "stats": result["stats"]
+                }
+                for solution, result in zip(solutions, results)
+            ]
+        })
+
+
+@router.post("/{maze_id}/paths/batch", response_model=MazePathsBatchResponse)
+async def batch_paths(
+    maze_id: int,
+    request: MazePathsBatchRequest,
+    http_request: Request,
+    repo: MazeRepository = Depends(get_maze_repository),
+    executor: Executor = Depends(get_request_executor),
+    admission: Optional[AdmissionController] = Depends(get_admission_controller)
+):
+    """
+    Кратчайшие пути для пакета пар (start, end). Одна волна BFS на источник:
+    пары группируются по общему концу, группы считаются в CPU-пуле параллельно.
+    Решения не сохраняются.
+    """
+    maze = await repo.get_maze(maze_id)
+    
+    if not maze:
+        raise HTTPException(status_code=404, detail="Лабиринт не найден")
+    
+    queries = []
+    for query in request.queries:
+        for x, y in (query.start, query.end):
+            if not (0 <= x < maze.width and 0 <= y < maze.height):
+                raise HTTPException(status_code=422, detail=f"Клетка ({x}, {y}) вне лабиринта")
+        queries.append((query.start, query.end))
+    
+    groups, placement = group_queries(queries)
+    cost = len(groups) * solve_cost(maze.width, maze.height, "bfs_bitboard", False)
+    async with admitted(admission, http_request, cost, "paths_batch"):
+        shm = None
+        try:
+            if maze.grid_file:
+                grid_path = repo.grid_store.path(maze.grid_file)
+            else:
+                with phase("decode"):
+                    shm = share_grid(repo.load_grid(maze))
+                grid_path = None
+            await repo.release()
+            
+            loop = asyncio.get_running_loop()
+            started = time.perf_counter()
+            with phase("search"):
+                chunks = await asyncio.gather(*(
+                    loop.run_in_executor(
+                        executor, run_path_groups,
+                        shm.name if shm is not None else None, grid_path,
+                        maze.width, maze.height, chunk
+                    )
+                    for chunk in split_groups(groups, request_workers())
+                ))
+            execution_time = time.perf_counter() - started
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Ошибка поиска пути: {str(e)}")
+        finally:
+            if shm is not None:
+                shm.close()
+                shm.unlink()
+    
+    paths = {number: found for chunk in chunks for number, found in chunk}
+    with phase("serialize"):
+        return TrustedJSONResponse({
+            "maze_id": maze_id,
+            "searches": len(groups),
+            "execution_time": execution_time,
+            "results": assemble_results(queries, placement, paths)
+        })
+
+
+@router.patch("/{maze_id}/cells", response_model=MazeCellsResponse)
+async def edit_maze_cells(
+    maze_id: int,
+    request: MazeCellsPatch,
+    repo: MazeRepository = Depends(get_maze_repository),
+    planners: ReplannerCache = Depends(get_replanner_cache),
+    cache: Optional[ResponseCache] = Depends(get_response_cache)
+):
+    """
+    Переключить стены и досчитать путь LPA*. Планировщик лабиринта остается в
+    памяти процесса, следующая правка пересчитывает только затронутые клетки.
+    """
+    async with planners.lock(maze_id):
+        maze = await repo.get_maze(maze_id)
         
-        pathfinder = PathFinder(grid, start, end)
-        result = pathfinder.find_path(request.algorithm)
+        if not maze:
+            raise HTTPException(status_code=404, detail="Лабиринт не найден")
         
-        solution = repo.create_solution(
-            maze_id=maze_id,
-            algorithm=request.algorithm,
-            path=result["path"],
-            steps=result["steps"],
-            nodes_explored=result["stats"]["nodes_explored"],
-            path_length=result["stats"]["path_length"],
-            execution_time=result["stats"]["execution_time"]
-        )
+        revision = maze.revision or 0
+        if request.revision is not None and request.revision != revision:
+            raise HTTPException(status_code=409, detail=f"Лабиринт изменен, текущая ревизия {revision}")
+        
+        fixed = {(maze.start_x, maze.start_y), (maze.end_x, maze.end_y)}
+        edits = []
+        for cell in request.cells:
+            if cell.x >= maze.width or cell.y >= maze.height:
+                raise HTTPException(status_code=422, detail=f"Клетка ({cell.x}, {cell.y}) вне лабиринта")
+            if (cell.x, cell.y) in fixed:
+                raise HTTPException(status_code=422, detail="Старт и выход нельзя сделать стеной")
+            edits.append((cell.x, cell.y, cell.wall))
         
-        return repo.solution_to_response(solution)
+        planner = planners.get(maze_id, revision)
+        try:
+            if planner is None:
+                grid = repo.load_grid(maze)
+                with phase("search"):
+                    planner = await run_in_threadpool(
+                        profiled(IncrementalPlanner), grid, maze.width, maze.height,
+                        (maze.start_x, maze.start_y), (maze.end_x, maze.end_y)
+                    )
+            with phase("search"):
+                result = await run_in_threadpool(profiled(planner.apply), edits)
+            
+            if result["changed"]:
+                new_revision = await repo.update_grid(maze, planner.rows(), revision)
+                if new_revision is None:
+                    planners.discard(maze_id)
+                    raise HTTPException(status_code=409, detail="Лабиринт изменен параллельно")
+                if cache is not None:
+                    discard_maze_bodies(cache, maze_id, revision)
+                revision = new_revision
+        except BaseException:
+            # Планировщик мог разойтись с сохраненной сеткой
+            planners.discard(maze_id)
+            raise
+        planners.put(maze_id, revision, planner)
     
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Ошибка поиска пути: {str(e)}")
+    REPLAN_TIME.observe(
+        result["stats"]["execution_time"], size_bucket=size_bucket(maze.width, maze.height)
+    )
+    return TrustedJSONResponse({
+        "maze_id": maze_id,
+        "revision": revision,
+        "changed": result["changed"],
+        "path": result["path"],
+        "stats": result["stats"]
+    })
 
 
 @router.get("/{maze_id}/solutions", response_model=List[SolutionResponse])
 async def get_maze_solutions(
     maze_id: int,
-    db: Session = Depends(get_db)
+    http_request: Request,
+    repo: MazeRepository = Depends(get_maze_repository),
+    cache: Optional[ResponseCache] = Depends(get_response_cache)
 ):
-    repo = MazeRepository(db)
-    maze = repo.get_maze(maze_id)
-    
-    if not maze:
+    if not await repo.maze_exists(maze_id):
         raise HTTPException(status_code=404, detail="Лабиринт не найден")
     
-    solutions = repo.get_solutions_for_maze(maze_id)
-    return [repo.solution_to_response(sol) for sol in solutions]
+    etag = solutions_etag(maze_id, *await repo.solutions_version(maze_id))
+    if etag_matches(http_request, etag):
+        return not_modified(etag, REVALIDATE, vary=False)
+    
+    body = cache.get(etag) if cache is not None else None
+    if body is not None:
+        return cache_headers(
+            Response(body, media_type="application/json"), etag, REVALIDATE, vary=False
+        )
+    
+    solutions = await repo.get_solutions_for_maze(maze_id)
+    with phase("serialize"):
+        response = TrustedJSONResponse([repo.solution_to_response(sol, raw=True) for sol in solutions])
+    if cache is not None:
+        cache.put(etag, response.body)
+    return cache_headers(response, etag, REVALIDATE, vary=False)
 
 
 @router.delete("/{maze_id}")
 async def delete_maze(
     maze_id: int,
-    db: Session = Depends(get_db)
+    repo: MazeRepository = Depends(get_maze_repository),
+    cache: Optional[ResponseCache] = Depends(get_response_cache)
 ):
-    repo = MazeRepository(db)
-    success = repo.delete_maze(maze_id)
+    revision = await repo.maze_revision(maze_id)
+    success = await repo.delete_maze(maze_id)
     
     if not success:
         raise HTTPException(status_code=404, detail="Лабиринт не найден")
     
+    if cache is not None and revision is not None:
+        # Освободить память; отдавать удаленный лабиринт не дает проверка ревизии
+        discard_maze_bodies(cache, maze_id, revision)
+    
     return {"message": "Лабиринт успешно удален"}
\ No newline at end of file
@@ -0,0 +1,28 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+
+from app.database import get_db
+from app.api.responses import TrustedJSONResponse
+from app.schemas.stats import AlgorithmStatsResponse
+from app.repositories.rollup_repository import RollupRepository
+
+router = APIRouter(prefix="/api/stats", tags=["stats"])
+
+
+def get_rollup_repository(db: AsyncSession = Depends(get_db)) -> RollupRepository:
+    return RollupRepository(db)
+
+
+@router.get("/algorithms", response_model=AlgorithmStatsResponse)
+async def algorithm_stats(
+    algorithm: Optional[str] = Query(None, description="Алгоритм поиска"),
+    generator: Optional[str] = Query(None, description="Алгоритм генерации"),
+    size_bucket: Optional[str] = Query(None, description="Например <=64"),
+    repo: RollupRepository = Depends(get_rollup_repository)
+):
+    """Средние, min/max и перцентили решений из накопительных агрегатов"""
+    rollups, buckets = await repo.get_rollups(algorithm, generator, size_bucket)
+    return TrustedJSONResponse({
+        "items": [repo.rollup_to_response(rollup, buckets) for rollup in rollups]
+    })
@@ -0,0 +1,103 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from typing import Optional
+
+from app.config import get_settings
+from app.database import get_db, get_session_factory
+from app.api.responses import MSGPACK_MEDIA_TYPE, MSGPACK_MEDIA_TYPES, TrustedJSONResponse, wants_msgpack
+from app.schemas.transfer import ImportResponse
+from app.services.grid_store import GridStore, get_grid_store
+from app.services.transfer import (
+    NDJSON_MEDIA_TYPE,
+    TransferError,
+    decompressed,
+    export_stream,
+    import_records,
+    read_records
+)
+from app.services.write_behind import WriteBehindBuffer, get_write_behind
+from app.repositories.transfer_repository import TransferRepository
+
+router = APIRouter(prefix="/api", tags=["transfer"])
+
+settings = get_settings()
+
+EXPORT_RESPONSES = {
+    200: {
+        "content": {NDJSON_MEDIA_TYPE: {}, MSGPACK_MEDIA_TYPE: {}},
+        "description": "NDJSON по умолчанию или поток MessagePack при Accept: application/x-msgpack",
+    }
+}
+
+
+@router.get("/export", response_class=StreamingResponse, responses=EXPORT_RESPONSES)
+async def export_mazes(
+    http_request: Request,
+    after_id: int = Query(0, ge=0, description="Только лабиринты с ID больше (продолжение выгрузки)"),
+    solutions: bool = Query(True, description="Выгружать решения"),
+    steps: bool = Query(True, description="Выгружать трассы шагов решений (самая объемная часть)"),
+    compression: str = Query("none", pattern="^(none|gzip)$"),
+    session_factory: async_sessionmaker = Depends(get_session_factory),
+    write_behind: Optional[WriteBehindBuffer] = Depends(get_write_behind),
+    grid_store: GridStore = Depends(get_grid_store)
+):
+    """Все лабиринты по возрастанию ID, за каждым - его решения; тело отдается потоком"""
+    binary = wants_msgpack(http_request)
+    filename = "mazes.msgpack" if binary else "mazes.ndjson"
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
+    gzip = compression == "gzip"
+    if gzip:
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(
+        export_stream(
+            session_factory, grid_store, write_behind,
+            binary=binary, gzip=gzip, after_id=after_id,
+            with_solutions=solutions, with_steps=steps
+        ),
+        media_type=MSGPACK_MEDIA_TYPE if binary else NDJSON_MEDIA_TYPE,
+        headers=headers
+    )
+
+
+@router.post("/import", response_model=ImportResponse)
+async def import_mazes(
+    http_request: Request,
+    db: AsyncSession = Depends(get_db),
+    write_behind: Optional[WriteBehindBuffer] = Depends(get_write_behind),
+    grid_store: GridStore = Depends(get_grid_store)
+):
+    """
+    Поток экспорта (NDJSON или MessagePack по Content-Type, gzip по
+    Content-Encoding). Лабиринты получают новые ID.
+    """
+    media_type = http_request.headers.get("content-type", NDJSON_MEDIA_TYPE).split(";")[0].strip().lower()
+    if media_type in MSGPACK_MEDIA_TYPES:
+        binary = True
+    elif media_type in (NDJSON_MEDIA_TYPE, "application/json", "text/plain"):
+        binary = False
+    else:
+        raise HTTPException(status_code=415, detail=f"Неподдерживаемый Content-Type: {media_type}")
+    
+    encoding = http_request.headers.get("content-encoding", "identity").strip().lower()
+    if encoding not in ("identity", "gzip", "deflate"):
+        raise HTTPException(status_code=415, detail=f"Неподдерживаемый Content-Encoding: {encoding}")
+    
+    chunks = http_request.stream()
+    if encoding != "identity":
+        chunks = decompressed(chunks, settings.TRANSFER_CHUNK_BYTES)
+    
+    counts = {"mazes": 0, "solutions": 0}
+    try:
+        await import_records(
+            read_records(chunks, binary, settings.TRANSFER_MAX_RECORD_BYTES),
+            TransferRepository(db, write_behind, grid_store),
+            grid_store,
+            counts
+        )
+    except TransferError as e:
+        raise HTTPException(
+            status_code=422,
+            detail=f"{e}; записано лабиринтов: {counts['mazes']}, решений: {counts['solutions']}"
+        )
+    return TrustedJSONResponse(counts)
@@ -8,6 +8,75 @@ class Settings(BaseSettings):
     DEBUG: bool = True
     
     DATABASE_URL: str = "sqlite:///./maze_app.db"
+    SQL_ECHO: bool = False
+    
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30.0
+    
+    SQLITE_JOURNAL_MODE: str = "WAL"
+    SQLITE_SYNCHRONOUS: str = "NORMAL"
+    SQLITE_MMAP_SIZE: int = 256 * 1024 * 1024
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    
+    WRITE_BEHIND_ENABLED: bool = False
+    WRITE_BEHIND_BATCH_SIZE: int = 200
+    WRITE_BEHIND_FLUSH_INTERVAL: float = 0.05
+    WRITE_BEHIND_MAX_ATTEMPTS: int = 3  # после стольких нарушений ограничений пачка пишется построчно
+    ID_BLOCK_SIZE: int = 1000
+    
+    GRID_STORE_DIR: str = "./grid_store"
+    GRID_STORE_MIN_CELLS: int = 4096
+    GRID_STORE_MAX_OPEN: int = 64
+    
+    PROFILE_HEADER_ENABLED: bool = False
+    PROFILE_HEADER: str = "X-Profile"
+    PROFILE_SAMPLE_RATE: float = 0.0
+    PROFILE_DIR: str = "./profiles"
+    PROFILE_MAX_FILES: int = 200  # старые .prof удаляются
+    
+    JOB_WORKERS: int = 2
+    JOB_EXECUTOR: str = "process"  # process | thread
+    JOB_MAX_QUEUED: int = 1000
+    JOB_POLL_INTERVAL: float = 0.5
+    JOB_LEASE_SECONDS: float = 30.0  # без продления задача в работе возвращается в очередь
+    JOB_MAX_WAIT: float = 30.0
+    JOB_MAX_MAZE_SIZE: int = 2001
+    JOB_MAX_TRACE_CELLS: int = 250_000  # record_steps только для лабиринтов не больше
+    
+    ANALYTICS_BATCH_SIZE: int = 64  # лабиринтов на одну выборку и запись метрик
+    
+    TRANSFER_BATCH_SIZE: int = 1000  # строк на выборку курсора экспорта и на пачку импорта
+    TRANSFER_BATCH_BYTES: int = 16 * 1024 * 1024  # импорт пишет пачку раньше, если строки крупные
+    TRANSFER_CHUNK_BYTES: int = 256 * 1024  # кусок потокового ответа экспорта
+    TRANSFER_MAX_RECORD_BYTES: int = 64 * 1024 * 1024  # предел одной записи импорта
+    TRANSFER_GZIP_LEVEL: int = 1
+    
+    EPHEMERAL_EXECUTOR: str = "process"  # process | thread
+    EPHEMERAL_WORKERS: int = 0  # 0 - по числу CPU
+    
+    ADMISSION_ENABLED: bool = False  # включать после калибровки бюджета под свое железо
+    ADMISSION_BUDGET: float = 2_000_000  # условные мкс CPU одновременно выполняемых запросов
+    ADMISSION_CLIENT_BUDGET: float = 1_000_000
+    ADMISSION_CLIENT_CONCURRENCY: int = 8
+    ADMISSION_FREE_COST: float = 20_000  # дешевые запросы не ограничиваются бюджетом
+    ADMISSION_QUEUE_TIMEOUT: float = 2.0
+    ADMISSION_MAX_WAITERS: int = 100
+    ADMISSION_CLIENT_HEADER: str = ""  # например X-Forwarded-For за балансировщиком
+    
+    RESPONSE_CACHE_MAX_BYTES: int = 0  # 0 - кеш сериализованных ответов выключен
+    
+    REPLAN_CACHE_MAX_CELLS: int = 4_000_000  # клетки планировщиков LPA* в памяти процесса
+    
+    SHARED_GRID_CACHE_MAX_BYTES: int = 0  # 0 - общий для процессов кеш сеток выключен
+    SHARED_GRID_CACHE_SLOTS: int = 256
+    SHARED_GRID_CACHE_NAME: str = "maze_grids"  # префикс сегментов shared_memory хоста
+    
+    LIVE_DEFAULT_FPS: float = 30.0
+    LIVE_MAX_FPS: float = 120.0
+    LIVE_MAX_STEPS_PER_FRAME: int = 5000
+    LIVE_TICK_BUDGET_MS: float = 2.0  # предел времени поиска за тик в event loop
+    LIVE_FRAME_WINDOW: int = 4
     
     CORS_ORIGINS: list = [
         "http://localhost:3000",
@@ -28,7 +97,8 @@ class Settings(BaseSettings):
     PATHFINDING_ALGORITHMS: list = [
         "bfs",
         "dfs",
-        "astar"
+        "astar",
+        "bfs_bitboard"  # без пошаговой трассы
     ]
     
     class Config:
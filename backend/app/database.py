@@ -1,29 +1,168 @@
-from sqlalchemy import create_engine
+from sqlalchemy import MetaData, create_engine, event, inspect
+from sqlalchemy.engine import Engine
+from sqlalchemy.schema import CreateTable
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, Session
-from typing import Generator
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from typing import AsyncGenerator
 from app.config import get_settings
+from app.services.metrics import install_query_metrics
 
 settings = get_settings()
 
-engine = create_engine(
-    settings.DATABASE_URL,
-    connect_args={"check_same_thread": False},  
-    echo=settings.DEBUG
-)
 
+def to_async_url(url: str) -> str:
+    """sqlite:///... -> sqlite+aiosqlite:///..."""
+    if url.startswith("sqlite://"):
+        return "sqlite+aiosqlite://" + url[len("sqlite://"):]
+    return url
+
+
+def _pool_kwargs(url: str, poolclass) -> dict:
+    # Для in-memory SQLite используется StaticPool, параметры пула к нему неприменимы
+    if ":memory:" in url:
+        return {}
+    return {
+        "poolclass": poolclass,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+    }
+
+
+def install_sqlite_pragmas(sync_engine: Engine) -> None:
+    """Настройка каждого нового соединения: WAL, synchronous, mmap и busy timeout"""
+
+    @event.listens_for(sync_engine, "connect")
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"PRAGMA journal_mode={settings.SQLITE_JOURNAL_MODE}")
+        cursor.execute(f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA mmap_size={int(settings.SQLITE_MMAP_SIZE)}")
+        cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+        cursor.close()
+
+
+def create_db_engine(url: str) -> Engine:
+    """Синхронный движок (CLI, бенчмарки, фоновые утилиты)"""
+    engine = create_engine(
+        url,
+        connect_args={"check_same_thread": False},
+        echo=settings.SQL_ECHO,
+        **_pool_kwargs(url, QueuePool)
+    )
+    if url.startswith("sqlite"):
+        install_sqlite_pragmas(engine)
+    install_query_metrics(engine)
+    return engine
+
+
+def create_async_db_engine(url: str) -> AsyncEngine:
+    """Асинхронный движок для обработчиков FastAPI"""
+    url = to_async_url(url)
+    engine = create_async_engine(
+        url,
+        echo=settings.SQL_ECHO,
+        **_pool_kwargs(url, AsyncAdaptedQueuePool)
+    )
+    if url.startswith("sqlite"):
+        install_sqlite_pragmas(engine.sync_engine)
+    install_query_metrics(engine.sync_engine)
+    return engine
+
+
+engine = create_db_engine(settings.DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+async_engine = create_async_db_engine(settings.DATABASE_URL)
+AsyncSessionLocal = async_sessionmaker(
+    async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False
+)
+
 Base = declarative_base()
 
 
-def get_db() -> Generator[Session, None, None]:
-    db = SessionLocal()
-    try:
+async def get_db() -> AsyncGenerator[AsyncSession, None]:
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
 
-def init_db() -> None:
-    Base.metadata.create_all(bind=engine)
\ No newline at end of file
+def get_session_factory() -> async_sessionmaker:
+    """
+    Для потоковых ответов: сессия из get_db закрывается до отправки тела,
+    поэтому генератор ответа открывает свою.
+    """
+    return AsyncSessionLocal
+
+
+def add_missing_columns(connection) -> None:
+    """
+    create_all не меняет существующие таблицы: новые nullable-колонки моделей
+    добавляются через ALTER TABLE ADD COLUMN.
+    """
+    inspector = inspect(connection)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing or not column.nullable:
+                continue
+            column_type = column.type.compile(dialect=connection.dialect)
+            connection.exec_driver_sql(
+                f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {column_type}'
+            )
+
+
+def add_missing_indexes(connection) -> None:
+    """Индексы, объявленные в моделях после создания таблицы"""
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=connection, checkfirst=True)
+
+
+def enable_sqlite_autoincrement(connection) -> None:
+    """
+    Таблицы с sqlite_autoincrement, созданные до его объявления, пересоздаются:
+    без AUTOINCREMENT SQLite выдает ID удаленной последней строки повторно.
+    Индексы восстанавливает add_missing_indexes.
+    """
+    if connection.dialect.name != "sqlite":
+        return
+    for table in Base.metadata.sorted_tables:
+        if not table.dialect_options["sqlite"]["autoincrement"]:
+            continue
+        sql = connection.exec_driver_sql(
+            "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table.name,)
+        ).scalar()
+        if sql is None or "AUTOINCREMENT" in sql.upper():
+            continue
+        rebuilt = f"{table.name}_rebuild"
+        # Копия метаданных нужна для внешних ключей; индексы создаются позже
+        metadata = MetaData()
+        for other in Base.metadata.sorted_tables:
+            other.to_metadata(metadata)
+        connection.execute(CreateTable(table.to_metadata(metadata, name=rebuilt)))
+        existing = {column["name"] for column in inspect(connection).get_columns(table.name)}
+        columns = ", ".join(f'"{column.name}"' for column in table.columns if column.name in existing)
+        connection.exec_driver_sql(
+            f'INSERT INTO "{rebuilt}" ({columns}) SELECT {columns} FROM "{table.name}"'
+        )
+        connection.exec_driver_sql(f'DROP TABLE "{table.name}"')
+        connection.exec_driver_sql(f'ALTER TABLE "{rebuilt}" RENAME TO "{table.name}"')
+
+
+def create_schema(connection) -> None:
+    Base.metadata.create_all(bind=connection)
+    add_missing_columns(connection)
+    enable_sqlite_autoincrement(connection)
+    add_missing_indexes(connection)
+
+
+async def init_db() -> None:
+    async with async_engine.begin() as conn:
+        await conn.run_sync(create_schema)
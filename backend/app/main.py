@@ -1,19 +1,38 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from contextlib import asynccontextmanager
 
 from app.config import get_settings
-from app.database import init_db
-from app.api.routes import maze
+from app.database import async_engine, init_db
+from app.api.routes import analytics, jobs, live, maze, stats, transfer
+from app.api.middleware import MetricsMiddleware, ServerTimingMiddleware
+from app.services.executor import shutdown_cpu_executor
+from app.services.shared_cache import close_shared_grid_cache
+from app.services.job_queue import get_job_queue
+from app.services.profiler import profile_summary
+from app.services.metrics import REGISTRY
+from app.services.write_behind import get_write_behind
 
 settings = get_settings()
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    init_db()
+    await init_db()
+    write_behind = get_write_behind()
+    if write_behind is not None:
+        write_behind.start()
+    job_queue = get_job_queue()
+    await job_queue.start()
     yield
-    pass
+    await job_queue.stop()
+    shutdown_cpu_executor()
+    close_shared_grid_cache()
+    if write_behind is not None:
+        await write_behind.stop()
+    # Потоки соединений aiosqlite не дают процессу завершиться
+    await async_engine.dispose()
 
 
 app = FastAPI(
@@ -31,7 +50,15 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(ServerTimingMiddleware)
+app.add_middleware(MetricsMiddleware)
+
 app.include_router(maze.router)
+app.include_router(jobs.router)
+app.include_router(live.router)
+app.include_router(analytics.router)
+app.include_router(stats.router)
+app.include_router(transfer.router)
 
 
 @app.get("/")
@@ -52,6 +79,24 @@ async def health_check():
     return {"status": "healthy"}
 
 
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def metrics():
+    return PlainTextResponse(
+        REGISTRY.render(),
+        media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+@app.get("/debug/profiles/{profile_id}", response_class=PlainTextResponse, include_in_schema=False)
+async def get_profile(profile_id: str):
+    if not settings.PROFILE_HEADER_ENABLED:
+        raise HTTPException(status_code=404, detail="Профилирование отключено")
+    summary = profile_summary(profile_id)
+    if summary is None:
+        raise HTTPException(status_code=404, detail="Профиль не найден")
+    return PlainTextResponse(summary)
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
@@ -0,0 +1,27 @@
+from sqlalchemy import Column, DateTime, Float, Index, Integer, String, Text
+from sqlalchemy.sql import func
+from app.database import Base
+
+
+class Job(Base):
+    """Фоновая задача генерации/поиска (app.services.job_queue)"""
+    
+    __tablename__ = "jobs"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String(20), nullable=False)  # generate | solve
+    status = Column(String(20), nullable=False, default="queued")
+    priority = Column(Integer, nullable=False, default=0)
+    params = Column(Text, nullable=False)  # JSON
+    result = Column(Text, nullable=True)  # JSON: {"maze_id": ...} или {"solution_id": ...}
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+    # Процесс, выполняющий задачу, и срок аренды (unix time), который он продлевает
+    owner = Column(String(100), nullable=True)
+    lease_expires = Column(Float, nullable=True)
+    
+    __table_args__ = (
+        Index("ix_jobs_status_priority", "status", "priority"),
+    )
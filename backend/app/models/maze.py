@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, Float, DateTime, ForeignKey
+from sqlalchemy import BigInteger, Column, Integer, String, Text, Float, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database import Base
@@ -11,15 +11,21 @@ class Maze(Base):
     id = Column(Integer, primary_key=True, index=True)
     width = Column(Integer, nullable=False)
     height = Column(Integer, nullable=False)
-    grid = Column(Text, nullable=False)  
+    grid = Column(Text, nullable=False)  # JSON; пустая строка, если сетка в grid_file
+    grid_file = Column(String(255), nullable=True)  # файл GridStore для больших лабиринтов
     start_x = Column(Integer, nullable=False)
     start_y = Column(Integer, nullable=False)
     end_x = Column(Integer, nullable=False)
     end_y = Column(Integer, nullable=False)
     algorithm = Column(String(50), nullable=False)
+    # Номер правки сетки (PATCH /cells); NULL у лабиринтов, созданных до правок, равен 0
+    revision = Column(Integer, nullable=True, default=0)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     solutions = relationship("Solution", back_populates="maze", cascade="all, delete-orphan")
+    
+    # ID не переиспользуются после удаления: на них построены ETag и ключи кешей
+    __table_args__ = {"sqlite_autoincrement": True}
 
 
 class Solution(Base):
@@ -27,13 +33,92 @@ class Solution(Base):
     __tablename__ = "solutions"
     
     id = Column(Integer, primary_key=True, index=True)
-    maze_id = Column(Integer, ForeignKey("mazes.id"), nullable=False)
+    maze_id = Column(Integer, ForeignKey("mazes.id"), nullable=False, index=True)
     algorithm = Column(String(50), nullable=False)
     path = Column(Text, nullable=False)  
     steps = Column(Text, nullable=False)  
     nodes_explored = Column(Integer, nullable=False)
     path_length = Column(Integer, nullable=False)
     execution_time = Column(Float, nullable=False)
+    # Счетчики поиска (PathFinder.find_path); NULL у решений, сохраненных до их появления
+    search_time_ns = Column(BigInteger, nullable=True)
+    trace_time_ns = Column(BigInteger, nullable=True)
+    heap_pushes = Column(Integer, nullable=True)
+    heap_pops = Column(Integer, nullable=True)
+    neighbor_checks = Column(Integer, nullable=True)
+    peak_frontier = Column(Integer, nullable=True)
+    peak_memory_bytes = Column(BigInteger, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
-    maze = relationship("Maze", back_populates="solutions")
\ No newline at end of file
+    maze = relationship("Maze", back_populates="solutions")
+    
+    __table_args__ = {"sqlite_autoincrement": True}
+
+
+class MazeMetrics(Base):
+    """Структурные метрики лабиринта (app.services.analytics) для выборок по сложности"""
+    
+    __tablename__ = "maze_metrics"
+    
+    maze_id = Column(Integer, ForeignKey("mazes.id"), primary_key=True)
+    revision = Column(Integer, nullable=False)  # ревизия сетки, по которой посчитаны метрики
+    open_cells = Column(Integer, nullable=False)
+    dead_ends = Column(Integer, nullable=False)
+    junctions = Column(Integer, nullable=False)
+    crossroads = Column(Integer, nullable=False)
+    corridor_count = Column(Integer, nullable=False)
+    corridor_mean = Column(Float, nullable=False)
+    corridor_max = Column(Integer, nullable=False)
+    corridor_histogram = Column(Text, nullable=False)  # JSON: число коридоров длиной [2^k, 2^(k+1))
+    solution_length = Column(Integer, nullable=True)  # NULL - выход недостижим
+    tortuosity = Column(Float, nullable=True)
+    computed_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    __table_args__ = (
+        Index("ix_maze_metrics_dead_ends", "dead_ends"),
+        Index("ix_maze_metrics_junctions", "junctions"),
+        Index("ix_maze_metrics_solution_length", "solution_length"),
+        Index("ix_maze_metrics_tortuosity", "tortuosity"),
+    )
+
+
+class SolutionRollup(Base):
+    """Накопительные агрегаты решений (app.services.rollups)"""
+    
+    __tablename__ = "solution_rollups"
+    
+    algorithm = Column(String(50), primary_key=True)
+    generator = Column(String(50), primary_key=True)  # алгоритм генерации лабиринта
+    size_bucket = Column(String(20), primary_key=True)  # metrics.size_bucket
+    count = Column(Integer, nullable=False)
+    nodes_explored_sum = Column(BigInteger, nullable=False)
+    nodes_explored_min = Column(Integer, nullable=False)
+    nodes_explored_max = Column(Integer, nullable=False)
+    path_length_sum = Column(BigInteger, nullable=False)
+    path_length_min = Column(Integer, nullable=False)
+    path_length_max = Column(Integer, nullable=False)
+    execution_time_sum = Column(Float, nullable=False)
+    execution_time_min = Column(Float, nullable=False)
+    execution_time_max = Column(Float, nullable=False)
+
+
+class SolutionRollupBucket(Base):
+    """Бакет логарифмического скетча метрики для перцентилей"""
+    
+    __tablename__ = "solution_rollup_buckets"
+    
+    algorithm = Column(String(50), primary_key=True)
+    generator = Column(String(50), primary_key=True)
+    size_bucket = Column(String(20), primary_key=True)
+    metric = Column(String(30), primary_key=True)
+    bucket = Column(Integer, primary_key=True)
+    count = Column(Integer, nullable=False)
+
+
+class IdSequence(Base):
+    """Счетчик для выдачи диапазонов ID (write-behind режим)"""
+    
+    __tablename__ = "id_sequences"
+    
+    name = Column(String(50), primary_key=True)
+    next_id = Column(Integer, nullable=False)
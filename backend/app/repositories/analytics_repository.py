@@ -0,0 +1,122 @@
+from sqlalchemy import Row, delete, func, insert, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Dict, List, Optional, Tuple
+import orjson
+from app.models.maze import Maze, MazeMetrics
+
+# Поля, по которым можно сортировать и фильтровать выборку метрик
+METRIC_FIELDS = (
+    "dead_ends",
+    "junctions",
+    "crossroads",
+    "corridor_count",
+    "corridor_mean",
+    "corridor_max",
+    "solution_length",
+    "tortuosity",
+)
+
+
+class AnalyticsRepository:
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def stale_mazes(self, limit: int, after_id: int = 0, force: bool = False) -> List[Maze]:
+        """Лабиринты с ID > after_id без метрик или с метриками другой ревизии"""
+        query = (
+            select(Maze)
+            .outerjoin(MazeMetrics, MazeMetrics.maze_id == Maze.id)
+            .where(Maze.id > after_id)
+            .order_by(Maze.id)
+            .limit(limit)
+        )
+        if not force:
+            query = query.where(or_(
+                MazeMetrics.maze_id.is_(None),
+                MazeMetrics.revision != func.coalesce(Maze.revision, 0)
+            ))
+        result = await self.db.execute(query)
+        return list(result.scalars().all())
+
+    async def save_metrics(self, rows: List[Dict]) -> None:
+        """Заменить метрики лабиринтов одной транзакцией"""
+        if not rows:
+            return
+        values = [
+            {**row, "corridor_histogram": orjson.dumps(row["corridor_histogram"]).decode()}
+            for row in rows
+        ]
+        await self.db.execute(
+            delete(MazeMetrics).where(MazeMetrics.maze_id.in_([row["maze_id"] for row in rows]))
+        )
+        await self.db.execute(insert(MazeMetrics), values)
+        await self.db.commit()
+
+    async def list_metrics(
+        self,
+        skip: int = 0,
+        limit: int = 10,
+        sort: str = "-dead_ends",
+        algorithm: Optional[str] = None,
+        ranges: Optional[Dict[str, Tuple[Optional[float], Optional[float]]]] = None
+    ) -> Tuple[List[Row], int]:
+        """
+        Метрики вместе с лабиринтом. sort - поле METRIC_FIELDS, "-" в начале -
+        по убыванию; ranges - {поле: (min, max)}, границы включительно.
+        """
+        conditions = []
+        if algorithm is not None:
+            conditions.append(Maze.algorithm == algorithm)
+        for name, (low, high) in (ranges or {}).items():
+            column = getattr(MazeMetrics, name)
+            if low is not None:
+                conditions.append(column >= low)
+            if high is not None:
+                conditions.append(column <= high)
+
+        descending = sort.startswith("-")
+        column = getattr(MazeMetrics, sort.lstrip("-"))
+        order = column.desc() if descending else column.asc()
+
+        # Сетка не читается: из mazes нужны только размеры, алгоритм и ревизия
+        base = (
+            select(
+                MazeMetrics,
+                Maze.width,
+                Maze.height,
+                Maze.algorithm,
+                func.coalesce(Maze.revision, 0).label("maze_revision")
+            )
+            .join(Maze, Maze.id == MazeMetrics.maze_id)
+            .where(*conditions)
+        )
+        total = await self.db.scalar(select(func.count()).select_from(base.subquery()))
+        result = await self.db.execute(
+            base.order_by(order, MazeMetrics.maze_id).offset(skip).limit(limit)
+        )
+        return list(result.all()), total
+
+    @staticmethod
+    def metrics_to_response(row: Row) -> dict:
+        """row - строка list_metrics"""
+        metrics = row.MazeMetrics
+        return {
+            "maze_id": metrics.maze_id,
+            "revision": metrics.revision,
+            "width": row.width,
+            "height": row.height,
+            "algorithm": row.algorithm,
+            "open_cells": metrics.open_cells,
+            "dead_ends": metrics.dead_ends,
+            "junctions": metrics.junctions,
+            "crossroads": metrics.crossroads,
+            "corridor_count": metrics.corridor_count,
+            "corridor_mean": metrics.corridor_mean,
+            "corridor_max": metrics.corridor_max,
+            "corridor_histogram": orjson.loads(metrics.corridor_histogram),
+            "solution_length": metrics.solution_length,
+            "tortuosity": metrics.tortuosity,
+            "stale": metrics.revision != row.maze_revision,
+            "computed_at": metrics.computed_at
+        }
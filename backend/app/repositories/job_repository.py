@@ -0,0 +1,163 @@
+from sqlalchemy import func, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Dict, Iterable, Optional, Tuple
+import time
+import orjson
+from app.models.job import Job
+
+ACTIVE_STATUSES = ("queued", "running")
+TERMINAL_STATUSES = ("succeeded", "failed", "cancelled")
+
+
+class JobRepository:
+    
+    def __init__(self, db: AsyncSession):
+        self.db = db
+    
+    async def create(self, kind: str, params: dict, priority: int = 0) -> Job:
+        job = Job(
+            kind=kind,
+            status="queued",
+            priority=priority,
+            params=orjson.dumps(params).decode()
+        )
+        self.db.add(job)
+        await self.db.commit()
+        await self.db.refresh(job)
+        return job
+    
+    async def get(self, job_id: int) -> Optional[Job]:
+        result = await self.db.execute(
+            select(Job).where(Job.id == job_id).execution_options(populate_existing=True)
+        )
+        return result.scalars().first()
+    
+    async def count_queued(self) -> int:
+        return await self.db.scalar(
+            select(func.count()).select_from(Job).where(Job.status == "queued")
+        )
+    
+    async def count_active(self) -> Dict[Tuple[str, str], int]:
+        """{(kind, status): n} для задач в очереди и в работе"""
+        result = await self.db.execute(
+            select(Job.kind, Job.status, func.count())
+            .where(Job.status.in_(ACTIVE_STATUSES))
+            .group_by(Job.kind, Job.status)
+        )
+        return {(kind, status): count for kind, status, count in result.all()}
+    
+    async def claim_next(self, owner: str = "", lease: float = 30.0) -> Optional[Job]:
+        """
+        Забрать задачу с наибольшим приоритетом одним UPDATE ... RETURNING:
+        две конкурирующие попытки не получат одну и ту же задачу. Задача
+        арендуется owner на lease секунд.
+        """
+        next_id = (
+            select(Job.id)
+            .where(Job.status == "queued")
+            .order_by(Job.priority.desc(), Job.id)
+            .limit(1)
+            .scalar_subquery()
+        )
+        result = await self.db.execute(
+            update(Job)
+            .where(Job.id == next_id, Job.status == "queued")
+            .values(
+                status="running",
+                started_at=func.now(),
+                owner=owner,
+                lease_expires=time.time() + lease
+            )
+            .returning(Job)
+            .execution_options(synchronize_session=False)
+        )
+        job = result.scalars().first()
+        await self.db.commit()
+        return job
+    
+    async def renew(self, owner: str, job_ids: Iterable[int], lease: float) -> int:
+        """Продлить аренду выполняемых задач owner"""
+        updated = await self.db.execute(
+            update(Job)
+            .where(Job.id.in_(list(job_ids)), Job.status == "running", Job.owner == owner)
+            .values(lease_expires=time.time() + lease)
+            .execution_options(synchronize_session=False)
+        )
+        await self.db.commit()
+        return updated.rowcount
+    
+    async def is_owned(self, job_id: int, owner: str) -> bool:
+        """Задача еще выполняется owner: не отменена и не передана другому процессу"""
+        row = (await self.db.execute(
+            select(Job.status, Job.owner).where(Job.id == job_id)
+        )).first()
+        return row is not None and row.status == "running" and row.owner == owner
+    
+    async def finish(
+        self,
+        job_id: int,
+        status: str,
+        result: Optional[dict] = None,
+        error: Optional[str] = None,
+        owner: str = ""
+    ) -> bool:
+        """Завершить выполняемую задачу; False, если ее отменили или она передана другому"""
+        updated = await self.db.execute(
+            update(Job)
+            .where(Job.id == job_id, Job.status == "running", Job.owner == owner)
+            .values(
+                status=status,
+                result=orjson.dumps(result).decode() if result is not None else None,
+                error=error,
+                finished_at=func.now()
+            )
+            .execution_options(synchronize_session=False)
+        )
+        await self.db.commit()
+        return updated.rowcount > 0
+    
+    async def cancel(self, job_id: int) -> bool:
+        updated = await self.db.execute(
+            update(Job)
+            .where(Job.id == job_id, Job.status.in_(ACTIVE_STATUSES))
+            .values(status="cancelled", finished_at=func.now())
+            .execution_options(synchronize_session=False)
+        )
+        await self.db.commit()
+        return updated.rowcount > 0
+    
+    async def requeue(self, job_ids: Iterable[int], owner: str = "") -> int:
+        """Вернуть в очередь перечисленные задачи, которые выполняет owner"""
+        return await self._requeue(Job.id.in_(list(job_ids)), Job.owner == owner)
+    
+    async def requeue_expired(self) -> int:
+        """
+        Вернуть в очередь задачи с истекшей арендой (процесс упал или завис).
+        Задачи без аренды взяты версией без продления и тоже считаются брошенными.
+        """
+        return await self._requeue(or_(Job.lease_expires.is_(None), Job.lease_expires < time.time()))
+    
+    async def _requeue(self, *conditions) -> int:
+        updated = await self.db.execute(
+            update(Job)
+            .where(Job.status == "running", *conditions)
+            .values(status="queued", started_at=None, owner=None, lease_expires=None)
+            .execution_options(synchronize_session=False)
+        )
+        await self.db.commit()
+        return updated.rowcount
+    
+    @staticmethod
+    def job_to_response(job: Job) -> dict:
+        return {
+            "id": job.id,
+            "kind": job.kind,
+            "status": job.status,
+            "priority": job.priority,
+            "params": orjson.loads(job.params),
+            "result": orjson.loads(job.result) if job.result else None,
+            "error": job.error,
+            "created_at": job.created_at,
+            "started_at": job.started_at,
+            "finished_at": job.finished_at
+        }
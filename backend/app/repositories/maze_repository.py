@@ -1,16 +1,57 @@
-from sqlalchemy.orm import Session
-from typing import List, Optional
-import json
-from app.models.maze import Maze, Solution
-from app.schemas.maze import MazeResponse, SolutionResponse
+from sqlalchemy import select, delete, func, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional, Union
+import asyncio
+import orjson
+from app.config import get_settings
+from app.models.maze import Maze, MazeMetrics, Solution
+from app.api.responses import RawJSON
+from app.services.grid_codec import pack_grid, pack_grid_json, pack_points, pack_steps
+from app.services.grid_store import GridStore, MappedGrid
+from app.services.metrics import record_cache
+from app.services.rollups import apply_rollups
+from app.services.shared_cache import SharedGrid, SharedGridCache, grid_tag
+from app.services.timing import phase
+from app.services.write_behind import WriteBehindBuffer
+
+# Счетчики поиска, которые сохраняются вместе с решением
+SOLUTION_COUNTERS = (
+    "search_time_ns",
+    "trace_time_ns",
+    "heap_pushes",
+    "heap_pops",
+    "neighbor_checks",
+    "peak_frontier",
+    "peak_memory_bytes",
+)
+
+
+def solution_stats(solution: Solution) -> dict:
+    stats = {
+        "nodes_explored": solution.nodes_explored,
+        "path_length": solution.path_length,
+        "execution_time": solution.execution_time
+    }
+    for name in SOLUTION_COUNTERS:
+        stats[name] = getattr(solution, name)
+    return stats
 
 
 class MazeRepository:
     
-    def __init__(self, db: Session):
+    def __init__(
+        self,
+        db: AsyncSession,
+        write_behind: Optional[WriteBehindBuffer] = None,
+        grid_store: Optional[GridStore] = None,
+        shared_grids: Optional[SharedGridCache] = None
+    ):
         self.db = db
+        self.write_behind = write_behind
+        self.grid_store = grid_store
+        self.shared_grids = shared_grids
     
-    def create_maze(
+    async def create_maze(
         self,
         width: int,
         height: int,
@@ -19,44 +60,134 @@ class MazeRepository:
         end: tuple,
         algorithm: str
     ) -> Maze:
+        grid_file = None
+        with phase("encode"):
+            if self.grid_store is not None and width * height >= get_settings().GRID_STORE_MIN_CELLS:
+                grid_file = await asyncio.to_thread(self.grid_store.write, grid, start, end)
+                grid_json = ""
+            else:
+                grid_json = orjson.dumps(grid).decode()
+        
         maze = Maze(
             width=width,
             height=height,
-            grid=json.dumps(grid),
+            grid=grid_json,
+            grid_file=grid_file,
             start_x=start[0],
             start_y=start[1],
             end_x=end[0],
             end_y=end[1],
             algorithm=algorithm
         )
-        self.db.add(maze)
-        self.db.commit()
-        self.db.refresh(maze)
+        if self.write_behind is not None:
+            return await self.write_behind.add_maze(maze)
+        with phase("db"):
+            self.db.add(maze)
+            await self.db.commit()
+            await self.db.refresh(maze)
         return maze
     
-    def get_maze(self, maze_id: int) -> Optional[Maze]:
-        return self.db.query(Maze).filter(Maze.id == maze_id).first()
+    async def get_maze(self, maze_id: int) -> Optional[Maze]:
+        if self.write_behind is not None:
+            pending = self.write_behind.get_maze(maze_id)
+            record_cache("write_behind", pending is not None)
+            if pending is not None:
+                return pending
+        with phase("db"):
+            result = await self.db.execute(select(Maze).where(Maze.id == maze_id))
+            return result.scalars().first()
+    
+    async def maze_exists(self, maze_id: int) -> bool:
+        """Проверка по первичному ключу, без чтения сетки"""
+        if self.write_behind is not None and self.write_behind.get_maze(maze_id) is not None:
+            return True
+        with phase("db"):
+            found = await self.db.scalar(select(Maze.id).where(Maze.id == maze_id))
+        return found is not None
     
-    def get_mazes(self, skip: int = 0, limit: int = 10) -> tuple[List[Maze], int]:
-        total = self.db.query(Maze).count()
-        mazes = (
-            self.db.query(Maze)
+    async def maze_revision(self, maze_id: int) -> Optional[int]:
+        """Ревизия сетки по первичному ключу (для ETag); None - лабиринта нет"""
+        if self.write_behind is not None:
+            pending = self.write_behind.get_maze(maze_id)
+            if pending is not None:
+                return pending.revision or 0
+        with phase("db"):
+            return await self.db.scalar(
+                select(func.coalesce(Maze.revision, 0)).where(Maze.id == maze_id)
+            )
+    
+    async def update_grid(self, maze: Maze, grid: List[List[int]], revision: int) -> Optional[int]:
+        """
+        Заменить сетку, если ревизия в БД все еще revision (оптимистичная блокировка).
+        Возвращает новую ревизию или None, если лабиринт изменили параллельно.
+        """
+        if self.write_behind is not None:
+            # UPDATE должен найти строку, еще не записанную из очереди
+            await self.write_behind.flush()
+        start = (maze.start_x, maze.start_y)
+        end = (maze.end_x, maze.end_y)
+        old_file = maze.grid_file
+        grid_file = None
+        with phase("encode"):
+            if old_file:
+                # Файлы GridStore неизменяемы: новая ревизия пишется в новый файл
+                grid_file = await asyncio.to_thread(self.grid_store.write, grid, start, end)
+                grid_json = ""
+            else:
+                grid_json = orjson.dumps(grid).decode()
+        
+        with phase("db"):
+            result = await self.db.execute(
+                update(Maze)
+                .where(Maze.id == maze.id, func.coalesce(Maze.revision, 0) == revision)
+                .values(grid=grid_json, grid_file=grid_file, revision=revision + 1)
+                .execution_options(synchronize_session=False)
+            )
+            await self.db.commit()
+        if result.rowcount == 0:
+            if grid_file:
+                self.grid_store.delete(grid_file)
+            return None
+        
+        if old_file:
+            self.grid_store.delete(old_file)
+        maze.grid = grid_json
+        maze.grid_file = grid_file
+        maze.revision = revision + 1
+        return maze.revision
+    
+    async def get_mazes(self, skip: int = 0, limit: int = 10) -> tuple[List[Maze], int]:
+        if self.write_behind is not None:
+            # Пагинация по БД корректна только после записи очереди
+            await self.write_behind.flush()
+        total = await self.db.scalar(select(func.count()).select_from(Maze))
+        result = await self.db.execute(
+            select(Maze)
             .order_by(Maze.created_at.desc())
             .offset(skip)
             .limit(limit)
-            .all()
         )
-        return mazes, total
+        return list(result.scalars().all()), total
     
-    def delete_maze(self, maze_id: int) -> bool:
-        maze = self.get_maze(maze_id)
-        if maze:
-            self.db.delete(maze)
-            self.db.commit()
-            return True
-        return False
+    async def delete_maze(self, maze_id: int) -> bool:
+        discarded = False
+        grid_file = None
+        if self.write_behind is not None:
+            pending = self.write_behind.get_maze(maze_id)
+            grid_file = pending.grid_file if pending is not None else None
+            discarded = await self.write_behind.discard_maze(maze_id)
+        if grid_file is None:
+            grid_file = await self.db.scalar(select(Maze.grid_file).where(Maze.id == maze_id))
+        # Явное удаление решений: ленивая загрузка relationship недоступна в async-сессии
+        await self.db.execute(delete(Solution).where(Solution.maze_id == maze_id))
+        await self.db.execute(delete(MazeMetrics).where(MazeMetrics.maze_id == maze_id))
+        result = await self.db.execute(delete(Maze).where(Maze.id == maze_id))
+        await self.db.commit()
+        if grid_file and self.grid_store is not None:
+            self.grid_store.delete(grid_file)
+        return discarded or result.rowcount > 0
     
-    def create_solution(
+    async def create_solution(
         self,
         maze_id: int,
         algorithm: str,
@@ -64,58 +195,197 @@ class MazeRepository:
         steps: List[dict],
         nodes_explored: int,
         path_length: int,
-        execution_time: float
+        execution_time: float,
+        **counters: int
     ) -> Solution:
-        solution = Solution(
+        """counters - поля SOLUTION_COUNTERS из stats PathFinder.find_path"""
+        solution = self._new_solution(maze_id, algorithm, path, steps, {
+            "nodes_explored": nodes_explored,
+            "path_length": path_length,
+            "execution_time": execution_time,
+            **counters
+        })
+        if self.write_behind is not None:
+            return await self.write_behind.add_solution(solution)
+        with phase("db"):
+            self.db.add(solution)
+            await apply_rollups(self.db, [solution])
+            await self.db.commit()
+            await self.db.refresh(solution)
+        return solution
+    
+    async def create_solutions(self, maze_id: int, results: List[dict]) -> List[Solution]:
+        """
+        Сохранить несколько решений одной транзакцией.
+        results - элементы {"algorithm", "path", "steps", "stats"}.
+        """
+        solutions = [
+            self._new_solution(
+                maze_id, result["algorithm"], result["path"], result["steps"], result["stats"]
+            )
+            for result in results
+        ]
+        if self.write_behind is not None:
+            return await self.write_behind.add_solutions(solutions)
+        with phase("db"):
+            self.db.add_all(solutions)
+            await apply_rollups(self.db, solutions)
+            await self.db.commit()
+            for solution in solutions:
+                await self.db.refresh(solution)
+        return solutions
+    
+    @staticmethod
+    def _new_solution(
+        maze_id: int,
+        algorithm: str,
+        path: List[tuple],
+        steps: List[dict],
+        stats: dict
+    ) -> Solution:
+        with phase("encode"):
+            path_json = orjson.dumps(path).decode()
+            steps_json = orjson.dumps(steps).decode()
+        return Solution(
             maze_id=maze_id,
             algorithm=algorithm,
-            path=json.dumps(path),
-            steps=json.dumps(steps),
-            nodes_explored=nodes_explored,
-            path_length=path_length,
-            execution_time=execution_time
+            path=path_json,
+            steps=steps_json,
+            nodes_explored=stats["nodes_explored"],
+            path_length=stats["path_length"],
+            execution_time=stats["execution_time"],
+            **{name: stats.get(name) for name in SOLUTION_COUNTERS}
         )
-        self.db.add(solution)
-        self.db.commit()
-        self.db.refresh(solution)
-        return solution
     
-    def get_solution(self, solution_id: int) -> Optional[Solution]:
-        return self.db.query(Solution).filter(Solution.id == solution_id).first()
+    async def get_solution(self, solution_id: int) -> Optional[Solution]:
+        if self.write_behind is not None:
+            pending = self.write_behind.get_solution(solution_id)
+            if pending is not None:
+                return pending
+        result = await self.db.execute(select(Solution).where(Solution.id == solution_id))
+        return result.scalars().first()
     
-    def get_solutions_for_maze(self, maze_id: int) -> List[Solution]:
-        return (
-            self.db.query(Solution)
-            .filter(Solution.maze_id == maze_id)
-            .order_by(Solution.created_at.desc())
-            .all()
-        )
+    async def solutions_version(self, maze_id: int) -> tuple[int, Optional[int]]:
+        """Число решений лабиринта и максимальный ID - для ETag списка"""
+        with phase("db"):
+            result = await self.db.execute(
+                select(func.count(Solution.id), func.max(Solution.id))
+                .where(Solution.maze_id == maze_id)
+            )
+            count, max_id = result.one()
+        if self.write_behind is not None:
+            pending = [s.id for s in self.write_behind.get_solutions_for_maze(maze_id)]
+            if pending:
+                count += len(pending)
+                max_id = max(max_id or 0, *pending)
+        return count, max_id
+    
+    async def get_solutions_for_maze(self, maze_id: int) -> List[Solution]:
+        with phase("db"):
+            result = await self.db.execute(
+                select(Solution)
+                .where(Solution.maze_id == maze_id)
+                .order_by(Solution.created_at.desc())
+            )
+            solutions = list(result.scalars().all())
+        if self.write_behind is not None:
+            pending = self.write_behind.get_solutions_for_maze(maze_id)
+            if pending:
+                solutions = sorted(
+                    pending + solutions,
+                    key=lambda s: (s.created_at, s.id),
+                    reverse=True
+                )
+        return solutions
+    
+    async def release(self) -> None:
+        """
+        Вернуть соединение в пул, не дожидаясь конца запроса (долгие WebSocket-сессии).
+        Загруженные объекты остаются доступны, сессию можно использовать дальше.
+        """
+        await self.db.close()
+    
+    def load_grid(self, maze: Maze) -> Union[List[List[int]], MappedGrid, SharedGrid]:
+        """
+        Сетка для поиска: из общего кеша процессов (если включен), из файла
+        через mmap либо декодированный JSON
+        """
+        if self.shared_grids is not None:
+            grid = self.shared_grids.load(
+                maze.id, maze.revision or 0, grid_tag(maze.grid_file or maze.grid),
+                maze.width, maze.height, lambda: self._packed_grid(maze)
+            )
+            if grid is not None:
+                return grid
+        if maze.grid_file:
+            return self.grid_store.open(maze.grid_file)
+        return orjson.loads(maze.grid)
+    
+    def _packed_grid(self, maze: Maze) -> bytes:
+        if maze.grid_file:
+            return self.grid_store.open(maze.grid_file).packed
+        return pack_grid_json(maze.grid)
+    
+    def maze_to_response(self, maze: Maze, raw: bool = False) -> dict:
+        """raw=True - JSON-колонки не декодируются (для TrustedJSONResponse)"""
+        if maze.grid_file:
+            grid = self.grid_store.open(maze.grid_file).to_list()
+        elif raw:
+            grid = RawJSON(maze.grid)
+        else:
+            grid = orjson.loads(maze.grid)
+        return {
+            "id": maze.id,
+            "width": maze.width,
+            "height": maze.height,
+            "grid": grid,
+            "start": (maze.start_x, maze.start_y),
+            "end": (maze.end_x, maze.end_y),
+            "algorithm": maze.algorithm,
+            "revision": maze.revision or 0,
+            "created_at": maze.created_at
+        }
     
     @staticmethod
-    def maze_to_response(maze: Maze) -> dict:
+    def solution_to_response(solution: Solution, raw: bool = False) -> dict:
+        return {
+            "id": solution.id,
+            "maze_id": solution.maze_id,
+            "algorithm": solution.algorithm,
+            "path": RawJSON(solution.path) if raw else orjson.loads(solution.path),
+            "steps": RawJSON(solution.steps) if raw else orjson.loads(solution.steps),
+            "stats": solution_stats(solution),
+            "created_at": solution.created_at
+        }
+    
+    def maze_to_binary(self, maze: Maze) -> dict:
+        """Представление для MessagePack: сетка упакована по биту на клетку"""
+        if maze.grid_file:
+            # Битовая плоскость файла совпадает с форматом pack_grid
+            grid = bytes(self.grid_store.open(maze.grid_file).packed)
+        else:
+            grid = pack_grid(orjson.loads(maze.grid))
         return {
             "id": maze.id,
             "width": maze.width,
             "height": maze.height,
-            "grid": json.loads(maze.grid),
+            "grid": grid,
             "start": (maze.start_x, maze.start_y),
             "end": (maze.end_x, maze.end_y),
             "algorithm": maze.algorithm,
+            "revision": maze.revision or 0,
             "created_at": maze.created_at
         }
     
     @staticmethod
-    def solution_to_response(solution: Solution) -> dict:
+    def solution_to_binary(solution: Solution) -> dict:
+        """Представление для MessagePack: int32-массивы пути и delta-трасса шагов"""
         return {
             "id": solution.id,
             "maze_id": solution.maze_id,
             "algorithm": solution.algorithm,
-            "path": json.loads(solution.path),
-            "steps": json.loads(solution.steps),
-            "stats": {
-                "nodes_explored": solution.nodes_explored,
-                "path_length": solution.path_length,
-                "execution_time": solution.execution_time
-            },
+            "path": pack_points(orjson.loads(solution.path)),
+            "steps": pack_steps(orjson.loads(solution.steps)),
+            "stats": solution_stats(solution),
             "created_at": solution.created_at
-        }
\ No newline at end of file
+        }
@@ -0,0 +1,72 @@
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+from app.models.maze import SolutionRollup, SolutionRollupBucket
+from app.services.rollups import QUANTILES, ROLLUP_METRICS, sketch_quantiles
+
+
+class RollupRepository:
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def get_rollups(
+        self,
+        algorithm: Optional[str] = None,
+        generator: Optional[str] = None,
+        size_bucket: Optional[str] = None
+    ) -> Tuple[List[SolutionRollup], Dict[Tuple, List[Tuple[int, int]]]]:
+        """Агрегаты по фильтрам и бакеты скетчей {(algorithm, generator, size_bucket, metric): [(бакет, n)]}"""
+        filters = []
+        bucket_filters = []
+        for name, value in (("algorithm", algorithm), ("generator", generator), ("size_bucket", size_bucket)):
+            if value is not None:
+                filters.append(getattr(SolutionRollup, name) == value)
+                bucket_filters.append(getattr(SolutionRollupBucket, name) == value)
+
+        result = await self.db.execute(
+            select(SolutionRollup)
+            .where(*filters)
+            .order_by(SolutionRollup.algorithm, SolutionRollup.generator, SolutionRollup.size_bucket)
+        )
+        rollups = list(result.scalars().all())
+
+        result = await self.db.execute(
+            select(
+                SolutionRollupBucket.algorithm,
+                SolutionRollupBucket.generator,
+                SolutionRollupBucket.size_bucket,
+                SolutionRollupBucket.metric,
+                SolutionRollupBucket.bucket,
+                SolutionRollupBucket.count
+            ).where(*bucket_filters)
+        )
+        buckets = defaultdict(list)
+        for algorithm, generator, bucket, metric, index, count in result.all():
+            buckets[(algorithm, generator, bucket, metric)].append((index, count))
+        return rollups, buckets
+
+    @staticmethod
+    def rollup_to_response(rollup: SolutionRollup, buckets: Dict[Tuple, List[Tuple[int, int]]]) -> dict:
+        response = {
+            "algorithm": rollup.algorithm,
+            "generator": rollup.generator,
+            "size_bucket": rollup.size_bucket,
+            "count": rollup.count
+        }
+        key = (rollup.algorithm, rollup.generator, rollup.size_bucket)
+        for metric in ROLLUP_METRICS:
+            low, high = getattr(rollup, f"{metric}_min"), getattr(rollup, f"{metric}_max")
+            quantiles = sketch_quantiles(buckets.get(key + (metric,), []), QUANTILES)
+            response[metric] = {
+                "mean": getattr(rollup, f"{metric}_sum") / rollup.count,
+                "min": low,
+                "max": high,
+                # Середина бакета может выйти за точные границы
+                **{
+                    f"p{round(q * 100)}": None if value is None else min(max(value, low), high)
+                    for q, value in quantiles.items()
+                }
+            }
+        return response
@@ -0,0 +1,188 @@
+from sqlalchemy import Row, func, insert, select
+from sqlalchemy.ext.asyncio import AsyncResult, AsyncSession
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+import numpy as np
+import orjson
+from app.models.maze import Maze, Solution
+from app.api.responses import RawJSON
+from app.repositories.maze_repository import solution_stats
+from app.services.grid_codec import pack_grid_json, unpack_grid_json
+from app.services.grid_store import GridStore
+from app.services.rollups import aggregate, write_rollups
+from app.services.write_behind import WriteBehindBuffer
+
+# Колонки mazes для выгрузки (created_at и revision - как в maze_to_response)
+MAZE_COLUMNS = (
+    Maze.id,
+    Maze.width,
+    Maze.height,
+    Maze.grid,
+    Maze.grid_file,
+    Maze.start_x,
+    Maze.start_y,
+    Maze.end_x,
+    Maze.end_y,
+    Maze.algorithm,
+    func.coalesce(Maze.revision, 0).label("revision"),
+    Maze.created_at,
+)
+
+
+async def _rows(result: AsyncResult) -> AsyncIterator[Row]:
+    async for partition in result.partitions():
+        for row in partition:
+            yield row
+
+
+class TransferRepository:
+    """Построчное чтение и пакетная запись для GET /api/export и POST /api/import"""
+
+    def __init__(
+        self,
+        db: AsyncSession,
+        write_behind: Optional[WriteBehindBuffer] = None,
+        grid_store: Optional[GridStore] = None
+    ):
+        self.db = db
+        self.write_behind = write_behind
+        self.grid_store = grid_store
+
+    async def stream(
+        self,
+        after_id: int = 0,
+        with_solutions: bool = True,
+        with_steps: bool = True,
+        batch_size: int = 1000
+    ) -> AsyncIterator[Tuple[Row, List[Row]]]:
+        """
+        Лабиринты с ID > after_id по возрастанию ID, каждый со своими решениями.
+
+        mazes и solutions (по индексу maze_id) читаются двумя серверными курсорами
+        одной транзакции и сливаются по maze_id: в памяти только текущий лабиринт.
+        """
+        if self.write_behind is not None:
+            await self.write_behind.flush()
+        mazes = _rows(await self.db.stream(
+            select(*MAZE_COLUMNS)
+            .where(Maze.id > after_id)
+            .order_by(Maze.id)
+            .execution_options(yield_per=batch_size)
+        ))
+        solutions = None
+        pending = None
+        if with_solutions:
+            columns = [
+                column for column in Solution.__table__.columns
+                if with_steps or column.key != "steps"
+            ]
+            solutions = _rows(await self.db.stream(
+                select(*columns)
+                .where(Solution.maze_id > after_id)
+                .order_by(Solution.maze_id, Solution.id)
+                .execution_options(yield_per=batch_size)
+            ))
+            pending = await anext(solutions, None)
+
+        async for maze in mazes:
+            attached = []
+            # Решения без лабиринта (maze_id меньше текущего) пропускаются
+            while pending is not None and pending.maze_id <= maze.id:
+                if pending.maze_id == maze.id:
+                    attached.append(pending)
+                pending = await anext(solutions, None)
+            yield maze, attached
+
+    def maze_record(self, maze: Row, binary: bool = False) -> Dict:
+        """
+        Запись экспорта. binary=False - сетка RawJSON, binary=True -
+        битовая плоскость pack_grid. Для файла GridStore читает и распаковывает
+        файл, поэтому такие записи строятся в потоке.
+        """
+        if maze.grid_file:
+            packed = self.grid_store.open(maze.grid_file).packed
+            if binary:
+                grid = bytes(packed)
+            else:
+                grid = RawJSON(unpack_grid_json(packed, maze.width, maze.height))
+        elif binary:
+            grid = pack_grid_json(maze.grid)
+        else:
+            grid = RawJSON(maze.grid)
+        return {
+            "type": "maze",
+            "id": maze.id,
+            "width": maze.width,
+            "height": maze.height,
+            "start": (maze.start_x, maze.start_y),
+            "end": (maze.end_x, maze.end_y),
+            "algorithm": maze.algorithm,
+            "revision": maze.revision,
+            "created_at": maze.created_at.isoformat() if maze.created_at else None,
+            "grid": grid
+        }
+
+    @staticmethod
+    def solution_record(solution: Row, binary: bool = False) -> Dict:
+        """Трасса steps в обоих форматах - JSON-текст колонки (в MessagePack - строкой)"""
+        record = {
+            "type": "solution",
+            "id": solution.id,
+            "maze_id": solution.maze_id,
+            "algorithm": solution.algorithm,
+            # int32-пары в формате pack_points
+            "path": (
+                np.asarray(orjson.loads(solution.path), dtype="<i4").tobytes()
+                if binary else RawJSON(solution.path)
+            ),
+            "stats": solution_stats(solution),
+            "created_at": solution.created_at.isoformat() if solution.created_at else None
+        }
+        steps = getattr(solution, "steps", None)
+        if steps is not None:
+            record["steps"] = steps if binary else RawJSON(steps)
+        return record
+
+    async def insert_batch(
+        self,
+        mazes: List[Dict],
+        solutions: List[Dict],
+        refs: List[Optional[int]],
+        rollup_rows: List[Tuple]
+    ) -> List[int]:
+        """
+        Записать пачку одной транзакцией и вернуть новые ID лабиринтов.
+        refs[i] - индекс лабиринта решения i в mazes; None - maze_id уже заполнен.
+        rollup_rows - строки для rollups.aggregate.
+        """
+        ids = await self._insert_mazes(mazes) if mazes else []
+        for solution, ref in zip(solutions, refs):
+            if ref is not None:
+                solution["maze_id"] = ids[ref]
+        if solutions:
+            if self.write_behind is not None:
+                for solution in solutions:
+                    solution["id"] = await self.write_behind.ids.next_id(Solution)
+            await self.db.execute(insert(Solution), solutions)
+            await write_rollups(self.db, *aggregate(rollup_rows))
+        await self.db.commit()
+        return ids
+
+    async def _insert_mazes(self, mazes: List[Dict]) -> List[int]:
+        if self.write_behind is not None:
+            # Обычный автоинкремент может занять ID из блока, выданного буферу
+            ids = [await self.write_behind.ids.next_id(Maze) for _ in mazes]
+        else:
+            # Первый INSERT берет блокировку записи SQLite до commit: новые строки
+            # получают max(id) + 1, поэтому ID за первым свободны и идут подряд
+            first = await self.db.scalar(insert(Maze).values(**mazes[0]).returning(Maze.id))
+            ids = list(range(first, first + len(mazes)))
+            mazes = mazes[1:]
+            if not mazes:
+                return ids
+        await self.db.execute(
+            insert(Maze), [{**maze, "id": maze_id} for maze, maze_id in zip(mazes, ids[-len(mazes):])]
+        )
+        return ids
+
+    async def rollback(self) -> None:
+        await self.db.rollback()
@@ -0,0 +1,30 @@
+from pydantic import BaseModel, Field
+from typing import List, Optional
+from datetime import datetime
+
+
+class MazeMetricsResponse(BaseModel):
+    maze_id: int
+    revision: int
+    width: int
+    height: int
+    algorithm: str
+    open_cells: int
+    dead_ends: int
+    junctions: int = Field(description="Развилки: клетки с 3 открытыми соседями")
+    crossroads: int = Field(description="Перекрестки: клетки с 4 открытыми соседями")
+    corridor_count: int
+    corridor_mean: float
+    corridor_max: int
+    corridor_histogram: List[int] = Field(description="Число коридоров длиной [2^k, 2^(k+1))")
+    solution_length: Optional[int] = Field(description="Клеток в кратчайшем пути; null - выход недостижим")
+    tortuosity: Optional[float] = Field(description="Длина пути к манхэттенскому расстоянию старт-выход")
+    stale: bool = Field(description="Лабиринт изменен после расчета метрик")
+    computed_at: datetime
+
+
+class MazeMetricsListResponse(BaseModel):
+    items: List[MazeMetricsResponse]
+    total: int
+    page: int
+    size: int
@@ -0,0 +1,38 @@
+from pydantic import BaseModel, Field
+from typing import Any, Dict, Optional
+from datetime import datetime
+
+from app.config import get_settings
+from app.schemas.maze import MazeGenerateRequest, MazeSolveRequest
+
+_MAX_SIZE = get_settings().JOB_MAX_MAZE_SIZE
+
+
+class JobGenerateRequest(MazeGenerateRequest):
+    width: int = Field(ge=5, le=_MAX_SIZE, description="Ширина лабиринта")
+    height: int = Field(ge=5, le=_MAX_SIZE, description="Высота лабиринта")
+    priority: int = Field(default=0, ge=-100, le=100, description="Больше - раньше")
+
+
+class JobSolveRequest(MazeSolveRequest):
+    maze_id: int
+    record_steps: bool = Field(default=False, description="Сохранять пошаговую трассу")
+    priority: int = Field(default=0, ge=-100, le=100, description="Больше - раньше")
+
+
+class JobAnalyzeRequest(BaseModel):
+    force: bool = Field(default=False, description="Пересчитать и актуальные метрики")
+    priority: int = Field(default=0, ge=-100, le=100, description="Больше - раньше")
+
+
+class JobResponse(BaseModel):
+    id: int
+    kind: str
+    status: str
+    priority: int
+    params: Dict[str, Any]
+    result: Optional[Dict[str, Any]]
+    error: Optional[str]
+    created_at: datetime
+    started_at: Optional[datetime]
+    finished_at: Optional[datetime]
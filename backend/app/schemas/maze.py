@@ -2,6 +2,8 @@ from pydantic import BaseModel, Field, field_validator
 from typing import List, Tuple, Optional
 from datetime import datetime
 
+from app.config import get_settings
+
 
 class MazeGenerateRequest(BaseModel):
     width: int = Field(ge=5, le=100, description="Ширина лабиринта")
@@ -19,16 +21,82 @@ class MazeGenerateRequest(BaseModel):
 
 class MazeSolveRequest(BaseModel):
     algorithm: str = Field(default="astar", description="Алгоритм поиска")
+    record_steps: bool = Field(
+        default=True, description="Сохранять пошаговую трассу (дорого на больших сетках)"
+    )
+    max_nodes: Optional[int] = Field(
+        default=None, ge=1, description="Остановить поиск после N извлеченных узлов"
+    )
+    max_ms: Optional[float] = Field(
+        default=None, gt=0, description="Остановить поиск через N миллисекунд"
+    )
     
     @field_validator('algorithm')
     @classmethod
     def validate_algorithm(cls, v):
-        valid = ["bfs", "dfs", "astar"]
+        valid = get_settings().PATHFINDING_ALGORITHMS
         if v not in valid:
             raise ValueError(f"Алгоритм должен быть одним из: {', '.join(valid)}")
         return v
 
 
+class MazeCompareRequest(BaseModel):
+    algorithms: List[str] = Field(
+        default_factory=lambda: ["bfs", "dfs", "astar"], min_length=1,
+        max_length=len(get_settings().PATHFINDING_ALGORITHMS),
+        description="Алгоритмы поиска для сравнения"
+    )
+    record_steps: bool = Field(default=False, description="Сохранять пошаговую трассу")
+    
+    @field_validator('algorithms')
+    @classmethod
+    def validate_algorithms(cls, v):
+        valid = get_settings().PATHFINDING_ALGORITHMS
+        for algorithm in v:
+            if algorithm not in valid:
+                raise ValueError(f"Алгоритм должен быть одним из: {', '.join(valid)}")
+        if len(set(v)) != len(v):
+            raise ValueError("Алгоритмы не должны повторяться")
+        return v
+
+
+class EphemeralMazeRequest(MazeGenerateRequest):
+    solve: Optional[str] = Field(default=None, description="Алгоритм поиска; не задан - без решения")
+    record_steps: bool = Field(default=False, description="Вернуть пошаговую трассу")
+    
+    @field_validator('solve')
+    @classmethod
+    def validate_solve(cls, v):
+        valid = get_settings().PATHFINDING_ALGORITHMS
+        if v is not None and v not in valid:
+            raise ValueError(f"Алгоритм должен быть одним из: {', '.join(valid)}")
+        return v
+
+
+class CellEdit(BaseModel):
+    x: int = Field(ge=0)
+    y: int = Field(ge=0)
+    wall: Optional[bool] = Field(default=None, description="Новое значение; не задано - переключить")
+
+
+class PathQuery(BaseModel):
+    start: Tuple[int, int]
+    end: Tuple[int, int]
+
+
+class MazePathsBatchRequest(BaseModel):
+    queries: List[PathQuery] = Field(
+        min_length=1, max_length=10_000, description="Пары (start, end) одного лабиринта"
+    )
+
+
+class MazeCellsPatch(BaseModel):
+    cells: List[CellEdit] = Field(min_length=1, max_length=10_000, description="Правки клеток, применяются по порядку")
+    revision: Optional[int] = Field(
+        default=None, ge=0, description="Ожидаемая ревизия лабиринта; не совпала - 409"
+    )
+
+
 class MazeResponse(BaseModel):
     id: int
     width: int
@@ -37,12 +105,22 @@ class MazeResponse(BaseModel):
     start: Tuple[int, int]
     end: Tuple[int, int]
     algorithm: str
+    revision: int = 0
     created_at: datetime
     
     class Config:
         from_attributes = True
 
 
+class MazeTileResponse(BaseModel):
+    maze_id: int
+    x: int
+    y: int
+    width: int
+    height: int
+    grid: List[List[int]]
+
+
 class PathfindingStep(BaseModel):
     current: Tuple[int, int]
     visited: List[Tuple[int, int]]
@@ -53,6 +131,13 @@ class SolutionStats(BaseModel):
     nodes_explored: int
     path_length: int
     execution_time: float
+    search_time_ns: Optional[int] = Field(default=None, description="Время поиска без трассы, нс")
+    trace_time_ns: Optional[int] = Field(default=None, description="Время построения трассы, нс")
+    heap_pushes: Optional[int] = None
+    heap_pops: Optional[int] = None
+    neighbor_checks: Optional[int] = None
+    peak_frontier: Optional[int] = None
+    peak_memory_bytes: Optional[int] = Field(default=None, description="Оценка пика памяти структур поиска")
 
 
 class SolutionResponse(BaseModel):
@@ -68,6 +153,57 @@ class SolutionResponse(BaseModel):
         from_attributes = True
 
 
+class EphemeralSolution(BaseModel):
+    algorithm: str
+    path: List[Tuple[int, int]]
+    steps: List[PathfindingStep]
+    stats: SolutionStats
+
+
+class EphemeralMazeResponse(BaseModel):
+    width: int
+    height: int
+    grid: List[List[int]]
+    start: Tuple[int, int]
+    end: Tuple[int, int]
+    algorithm: str
+    solution: Optional[EphemeralSolution]
+
+
+class ComparisonEntry(BaseModel):
+    solution_id: int
+    algorithm: str
+    path: List[Tuple[int, int]]
+    stats: SolutionStats
+
+
+class MazeCompareResponse(BaseModel):
+    maze_id: int
+    results: List[ComparisonEntry]
+
+
+class PathQueryResult(BaseModel):
+    start: Tuple[int, int]
+    end: Tuple[int, int]
+    path: List[Tuple[int, int]] = Field(description="Пустой - цель недостижима")
+    path_length: int
+
+
+class MazePathsBatchResponse(BaseModel):
+    maze_id: int
+    searches: int = Field(description="Число волн BFS на весь пакет")
+    execution_time: float
+    results: List[PathQueryResult]
+
+
+class MazeCellsResponse(BaseModel):
+    maze_id: int
+    revision: int
+    changed: int
+    path: List[Tuple[int, int]]
+    stats: SolutionStats
+
+
 class MazeListResponse(BaseModel):
     items: List[MazeResponse]
     total: int
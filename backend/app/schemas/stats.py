@@ -0,0 +1,25 @@
+from pydantic import BaseModel, Field
+from typing import List, Optional
+
+
+class MetricSummary(BaseModel):
+    mean: float
+    min: float
+    max: float
+    p50: Optional[float] = Field(description="Оценка по скетчу, относительная ошибка до 1%")
+    p90: Optional[float]
+    p99: Optional[float]
+
+
+class AlgorithmStats(BaseModel):
+    algorithm: str
+    generator: str = Field(description="Алгоритм генерации лабиринта")
+    size_bucket: str = Field(description="Размер по большей стороне: <=16, <=32, ..., >2048")
+    count: int
+    nodes_explored: MetricSummary
+    path_length: MetricSummary
+    execution_time: MetricSummary
+
+
+class AlgorithmStatsResponse(BaseModel):
+    items: List[AlgorithmStats]
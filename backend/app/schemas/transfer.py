@@ -0,0 +1,6 @@
+from pydantic import BaseModel, Field
+
+
+class ImportResponse(BaseModel):
+    mazes: int = Field(description="Записано лабиринтов (с новыми ID)")
+    solutions: int = Field(description="Записано решений")
@@ -0,0 +1,192 @@
+"""
+Контроль допуска тяжелых запросов (генерация, поиск) по оценке стоимости.
+
+Стоимость - оценка CPU-времени в микросекундах по размеру сетки и алгоритму
+(коэффициенты сняты на benchmarks.suite, порядок величины). Трасса шагов
+копирует visited на каждом шаге, поэтому растет квадратично от числа клеток.
+
+Запрос допускается, если помещается в глобальный бюджет ADMISSION_BUDGET и в
+бюджет клиента, а у клиента меньше ADMISSION_CLIENT_CONCURRENCY запросов в работе.
+Запрос дороже бюджета выполняется, только когда бюджет пуст. Дешевые запросы
+(до ADMISSION_FREE_COST) бюджетом не ограничиваются, поэтому пачка больших
+решений не увеличивает их задержку ожиданием допуска. Не допущенный запрос
+ждет освобождения бюджета до ADMISSION_QUEUE_TIMEOUT (первыми допускаются
+самые дешевые), затем получает 429 с Retry-After.
+
+Учет ведется в памяти процесса: при нескольких воркерах uvicorn бюджет у каждого свой.
+Контроль выключен по умолчанию (ADMISSION_ENABLED): оценки - порядок величины,
+и с бюджетом не по железу сервис отвечал бы 429 там, где раньше справлялся.
+"""
+import asyncio
+import itertools
+import math
+import time
+from typing import Dict, List, Optional
+
+from fastapi import Request
+
+from app.config import get_settings
+from app.services.metrics import ADMISSION_DECISIONS, ADMISSION_IN_FLIGHT, ADMISSION_WAIT_TIME
+
+GENERATION_COST = {"recursive_backtracking": 1.5, "prims": 3.5, "kruskals": 3.0}
+SEARCH_COST = {"bfs": 1.5, "dfs": 1.0, "astar": 2.5, "bfs_bitboard": 1.0}
+TRACE_COST = 0.02  # на квадрат числа клеток
+COST_PER_SECOND = 1_000_000
+
+
+def generation_cost(width: int, height: int, algorithm: str) -> float:
+    return width * height * GENERATION_COST.get(algorithm, 3.5)
+
+
+def solve_cost(
+    width: int,
+    height: int,
+    algorithm: str,
+    record_steps: bool,
+    max_nodes: Optional[int] = None,
+    max_ms: Optional[float] = None
+) -> float:
+    """Бюджет поиска ограничивает и оценку: max_nodes - число клеток, max_ms - время"""
+    cells = width * height
+    if max_nodes is not None:
+        cells = min(cells, max_nodes)
+    cost = cells * SEARCH_COST.get(algorithm, 2.5)
+    if record_steps and algorithm != "bfs_bitboard":
+        cost += TRACE_COST * cells * cells
+    if max_ms is not None:
+        cost = min(cost, max_ms * 1000)
+    return cost
+
+
+def client_id(request: Request) -> str:
+    header = get_settings().ADMISSION_CLIENT_HEADER
+    if header:
+        value = request.headers.get(header)
+        if value:
+            return value.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+
+class AdmissionRejected(Exception):
+
+    def __init__(self, retry_after: int):
+        super().__init__("Сервер перегружен, повторите запрос позже")
+        self.retry_after = retry_after
+
+
+class _Waiter:
+
+    __slots__ = ("client", "cost", "order", "future")
+
+    def __init__(self, client: str, cost: float, order: int):
+        self.client = client
+        self.cost = cost
+        self.order = order
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+
+
+class AdmissionController:
+
+    def __init__(
+        self,
+        budget: float,
+        client_budget: float,
+        client_concurrency: int,
+        free_cost: float = 0.0,
+        queue_timeout: float = 2.0,
+        max_waiters: int = 100
+    ):
+        self.budget = budget
+        self.client_budget = client_budget
+        self.client_concurrency = client_concurrency
+        self.free_cost = free_cost
+        self.queue_timeout = queue_timeout
+        self.max_waiters = max_waiters
+        self.in_flight = 0.0
+        self._clients: Dict[str, List[float]] = {}  # client -> [стоимость, число запросов]
+        self._waiters: List[_Waiter] = []
+        self._order = itertools.count()
+
+    def _fits(self, client: str, cost: float) -> bool:
+        used, count = self._clients.get(client, (0.0, 0))
+        if count >= self.client_concurrency:
+            return False
+        if cost <= self.free_cost:
+            return True
+        if used > 0 and used + cost > self.client_budget:
+            return False
+        return self.in_flight == 0 or self.in_flight + cost <= self.budget
+
+    def _grant(self, client: str, cost: float) -> None:
+        usage = self._clients.setdefault(client, [0.0, 0])
+        usage[0] += cost
+        usage[1] += 1
+        self.in_flight += cost
+        ADMISSION_IN_FLIGHT.set(self.in_flight)
+
+    def retry_after(self) -> int:
+        return max(1, math.ceil(self.in_flight / COST_PER_SECOND))
+
+    async def acquire(self, client: str, cost: float, endpoint: str = "") -> None:
+        if self._fits(client, cost):
+            self._grant(client, cost)
+            ADMISSION_DECISIONS.inc(endpoint=endpoint, result="admitted")
+            return
+        if len(self._waiters) >= self.max_waiters or self.queue_timeout <= 0:
+            ADMISSION_DECISIONS.inc(endpoint=endpoint, result="rejected")
+            raise AdmissionRejected(self.retry_after())
+
+        waiter = _Waiter(client, cost, next(self._order))
+        self._waiters.append(waiter)
+        started = time.perf_counter()
+        try:
+            # Доступ выдает release(): учет стоимости делается до пробуждения
+            await asyncio.wait_for(waiter.future, self.queue_timeout)
+        except asyncio.TimeoutError:
+            ADMISSION_DECISIONS.inc(endpoint=endpoint, result="rejected")
+            raise AdmissionRejected(self.retry_after())
+        except asyncio.CancelledError:
+            # Клиент ушел в момент выдачи доступа: вернуть бюджет
+            if waiter.future.done() and not waiter.future.cancelled():
+                self.release(client, cost)
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+            ADMISSION_WAIT_TIME.observe(time.perf_counter() - started, endpoint=endpoint)
+        ADMISSION_DECISIONS.inc(endpoint=endpoint, result="queued")
+
+    def release(self, client: str, cost: float) -> None:
+        usage = self._clients[client]
+        usage[0] -= cost
+        usage[1] -= 1
+        if usage[1] == 0:
+            del self._clients[client]
+        self.in_flight = max(0.0, self.in_flight - cost)
+        ADMISSION_IN_FLIGHT.set(self.in_flight)
+
+        for waiter in sorted(self._waiters, key=lambda w: (w.cost, w.order)):
+            if not waiter.future.done() and self._fits(waiter.client, waiter.cost):
+                self._grant(waiter.client, waiter.cost)
+                waiter.future.set_result(None)
+                self._waiters.remove(waiter)
+
+
+_controller: Optional[AdmissionController] = None
+
+
+def get_admission_controller() -> Optional[AdmissionController]:
+    global _controller
+    settings = get_settings()
+    if not settings.ADMISSION_ENABLED:
+        return None
+    if _controller is None:
+        _controller = AdmissionController(
+            settings.ADMISSION_BUDGET,
+            settings.ADMISSION_CLIENT_BUDGET,
+            settings.ADMISSION_CLIENT_CONCURRENCY,
+            free_cost=settings.ADMISSION_FREE_COST,
+            queue_timeout=settings.ADMISSION_QUEUE_TIMEOUT,
+            max_waiters=settings.ADMISSION_MAX_WAITERS
+        )
+    return _controller
@@ -0,0 +1,193 @@
+"""
+Структурные метрики сохраненных лабиринтов (таблица maze_metrics).
+
+Сетка разворачивается в булев массив NumPy (битовая плоскость GridStore -
+через unpackbits без списков Python), число открытых соседей каждой клетки
+считается одним проходом сложения четырех сдвигов. По нему:
+    dead_ends   - клетки с одним соседом;
+    junctions   - развилки (3 соседа), crossroads - перекрестки (4);
+    коридоры    - связные цепочки клеток с двумя соседями; компоненты ищутся
+                  векторно (подвешивание к минимальному корню и сжатие путей);
+    solution_length, tortuosity - длина кратчайшего пути (bfs_bitboard) и ее
+                  отношение к манхэттенскому расстоянию старт-выход.
+
+Пакетный пересчет (refresh_metrics) берет лабиринты без метрик или с метриками
+старой ревизии и считает их в CPU-пуле. Запуск из CLI:
+
+    python -m app.services.analytics --workers 4
+    python -m app.services.analytics --force   # пересчитать все
+"""
+import argparse
+import asyncio
+import sys
+from concurrent.futures import Executor
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import orjson
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.config import get_settings
+from app.repositories.analytics_repository import AnalyticsRepository
+from app.services.grid_store import GridStore, MappedGrid
+from app.services.pathfinder import PathFinder
+
+
+def open_cells(grid, width: int, height: int) -> np.ndarray:
+    """Булев массив height x width, True - проход"""
+    if hasattr(grid, "packed"):
+        bits = np.unpackbits(np.frombuffer(grid.packed, dtype=np.uint8), bitorder="little")
+        return bits[:width * height].reshape(height, width) == 0
+    return np.asarray(grid, dtype=np.uint8) == 0
+
+
+def neighbor_counts(cells: np.ndarray) -> np.ndarray:
+    """Число открытых 4-соседей открытой клетки (у стен 0)"""
+    padded = np.pad(cells, 1).astype(np.uint8)
+    counts = padded[:-2, 1:-1] + padded[2:, 1:-1] + padded[1:-1, :-2] + padded[1:-1, 2:]
+    return np.where(cells, counts, 0)
+
+
+def component_sizes(mask: np.ndarray) -> np.ndarray:
+    """Размеры 4-связных компонент mask"""
+    width = mask.shape[1]
+    flat = mask.ravel()
+    right = np.flatnonzero(flat[:-1] & flat[1:])
+    right = right[(right + 1) % width != 0]
+    down = np.flatnonzero(flat[:-width] & flat[width:])
+    u = np.concatenate((right, down))
+    v = np.concatenate((right + 1, down + width))
+
+    parent = np.arange(flat.size)
+    while True:
+        pu, pv = parent[u], parent[v]
+        linked = pu != pv
+        if not linked.any():
+            break
+        np.minimum.at(parent, np.maximum(pu, pv)[linked], np.minimum(pu, pv)[linked])
+        while True:
+            grand = parent[parent]
+            if np.array_equal(grand, parent):
+                break
+            parent = grand
+    sizes = np.bincount(parent[flat])
+    return sizes[sizes > 0]
+
+
+def analyze_grid(grid, width: int, height: int, start: Tuple[int, int], end: Tuple[int, int]) -> Dict:
+    cells = open_cells(grid, width, height)
+    counts = neighbor_counts(cells)
+    degrees = np.bincount(counts[cells], minlength=5)
+
+    corridors = component_sizes(cells & (counts == 2))
+    if corridors.size:
+        buckets = np.bincount(np.log2(corridors).astype(np.int64))
+        corridor_mean, corridor_max = float(corridors.mean()), int(corridors.max())
+    else:
+        buckets = np.zeros(0, dtype=np.int64)
+        corridor_mean, corridor_max = 0.0, 0
+
+    path = PathFinder(grid, start, end).find_path("bfs_bitboard", record_steps=False)["path"]
+    distance = abs(start[0] - end[0]) + abs(start[1] - end[1])
+    solution_length = len(path) or None
+    return {
+        "open_cells": int(cells.sum()),
+        "dead_ends": int(degrees[1]),
+        "junctions": int(degrees[3]),
+        "crossroads": int(degrees[4]),
+        "corridor_count": int(corridors.size),
+        "corridor_mean": corridor_mean,
+        "corridor_max": corridor_max,
+        # corridor_histogram[k] - коридоры длиной [2^k, 2^(k+1))
+        "corridor_histogram": buckets.tolist(),
+        "solution_length": solution_length,
+        "tortuosity": (len(path) - 1) / distance if path and distance else None,
+    }
+
+
+def analyze_stored(
+    grid_json: Optional[str],
+    grid_path: Optional[str],
+    width: int,
+    height: int,
+    start: Tuple[int, int],
+    end: Tuple[int, int]
+) -> Dict:
+    """Выполняется в CPU-пуле; большая сетка открывается из файла по месту"""
+    if grid_path is not None:
+        grid = MappedGrid(grid_path)
+        try:
+            return analyze_grid(grid, width, height, start, end)
+        finally:
+            grid.close()
+    return analyze_grid(orjson.loads(grid_json), width, height, start, end)
+
+
+async def refresh_metrics(
+    session_factory: async_sessionmaker,
+    executor: Executor,
+    grid_store: GridStore,
+    force: bool = False,
+    batch_size: Optional[int] = None
+) -> int:
+    """Пересчитать устаревшие метрики (force - все), вернуть число лабиринтов"""
+    batch_size = batch_size or get_settings().ANALYTICS_BATCH_SIZE
+    loop = asyncio.get_running_loop()
+    analyzed = 0
+    after_id = 0
+    while True:
+        async with session_factory() as db:
+            mazes = await AnalyticsRepository(db).stale_mazes(batch_size, after_id, force)
+        if not mazes:
+            return analyzed
+        after_id = mazes[-1].id
+
+        results = await asyncio.gather(*(
+            loop.run_in_executor(
+                executor, analyze_stored,
+                None if maze.grid_file else maze.grid,
+                grid_store.path(maze.grid_file) if maze.grid_file else None,
+                maze.width, maze.height,
+                (maze.start_x, maze.start_y), (maze.end_x, maze.end_y)
+            )
+            for maze in mazes
+        ))
+        rows: List[Dict] = [
+            {"maze_id": maze.id, "revision": maze.revision or 0, **result}
+            for maze, result in zip(mazes, results)
+        ]
+        async with session_factory() as db:
+            await AnalyticsRepository(db).save_metrics(rows)
+        analyzed += len(rows)
+
+
+async def main_async(args) -> int:
+    from app.database import AsyncSessionLocal, async_engine, init_db
+    from app.services.executor import create_cpu_executor
+    from app.services.grid_store import get_grid_store
+
+    await init_db()
+    executor = create_cpu_executor("process", args.workers)
+    try:
+        return await refresh_metrics(
+            AsyncSessionLocal, executor, get_grid_store(), args.force, args.batch_size
+        )
+    finally:
+        executor.shutdown()
+        await async_engine.dispose()
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Пересчет структурных метрик лабиринтов")
+    parser.add_argument("--workers", type=int, default=None, help="Процессов в пуле (по числу CPU)")
+    parser.add_argument("--batch-size", type=int, default=None)
+    parser.add_argument("--force", action="store_true", help="Пересчитать и актуальные метрики")
+    args = parser.parse_args(argv)
+
+    analyzed = asyncio.run(main_async(args))
+    print(f"Обработано лабиринтов: {analyzed}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,97 @@
+"""
+Пакетные запросы кратчайших путей (POST /api/maze/{id}/paths/batch).
+
+Лабиринт - неориентированный граф с единичными ребрами (в том числе с циклами),
+поэтому путь end -> start - развернутый путь start -> end. Пара достается тому
+концу, который чаще встречается в пакете: запросы многих NPC к одной цели
+считаются одной волной от цели. Из каждого источника идет одна волна
+bitboard BFS до всех его целей, пути восстанавливаются по общим плоскостям
+направлений. Группы делятся между воркерами CPU-пула, сетка передается как в
+compare (shared_memory или файл GridStore), плитки проходов строятся один раз
+на воркер.
+"""
+from collections import Counter
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from app.services.bitboard import bitboard_paths, open_tiles
+from app.services.compare import attached_grid
+
+Point = Tuple[int, int]
+# Группа: источник и цели; путь к цели ищется из источника
+Group = Tuple[Point, List[Point]]
+
+
+def group_queries(queries: Sequence[Tuple[Point, Point]]) -> Tuple[List[Group], List[Tuple[int, bool]]]:
+    """
+    Разбить пары по источникам. Возвращает группы и для каждой пары
+    (номер группы, reversed): reversed - источник группы это end пары.
+    """
+    degree = Counter()
+    for start, end in queries:
+        degree[start] += 1
+        degree[end] += 1
+
+    index: Dict[Point, int] = {}
+    groups: List[Group] = []
+    targets: List[Dict[Point, None]] = []
+    placement = []
+    for start, end in queries:
+        reverse = degree[end] > degree[start] or (
+            # При равенстве - к уже начатой группе
+            degree[end] == degree[start] and end in index and start not in index
+        )
+        source, target = (end, start) if reverse else (start, end)
+        number = index.get(source)
+        if number is None:
+            number = index[source] = len(groups)
+            groups.append((source, []))
+            targets.append({})
+        # Повторные пары не удлиняют группу
+        targets[number][target] = None
+        placement.append((number, reverse))
+    for (source, group_targets), unique in zip(groups, targets):
+        group_targets.extend(unique)
+    return groups, placement
+
+
+def split_groups(groups: Sequence[Group], parts: int) -> List[List[Tuple[int, Group]]]:
+    """
+    Разложить группы (с номерами) на не более parts частей: каждая волна
+    проходит до дальней цели, поэтому части выравниваются по числу групп
+    """
+    parts = max(1, min(parts, len(groups)))
+    chunks: List[List[Tuple[int, Group]]] = [[] for _ in range(parts)]
+    for number, group in enumerate(groups):
+        chunks[number % parts].append((number, group))
+    return chunks
+
+
+def run_path_groups(
+    shm_name: Optional[str],
+    grid_path: Optional[str],
+    width: int,
+    height: int,
+    chunk: List[Tuple[int, Group]]
+) -> List[Tuple[int, Dict[Point, List[Point]]]]:
+    """Выполняется в CPU-пуле: пути всех групп части chunk по одной сетке"""
+    with attached_grid(shm_name, grid_path, width, height) as view:
+        tiles = open_tiles(view, width, height)
+    return [
+        (number, bitboard_paths(tiles, source, targets))
+        for number, (source, targets) in chunk
+    ]
+
+
+def assemble_results(
+    queries: Sequence[Tuple[Point, Point]],
+    placement: Sequence[Tuple[int, bool]],
+    paths: Dict[int, Dict[Point, List[Point]]]
+) -> List[Dict]:
+    """Ответ в порядке запросов; пары, найденные от end, разворачиваются"""
+    results = []
+    for (start, end), (number, reverse) in zip(queries, placement):
+        path = paths[number][start if reverse else end]
+        if reverse:
+            path = path[::-1]
+        results.append({"start": start, "end": end, "path": path, "path_length": len(path)})
+    return results
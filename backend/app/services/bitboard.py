@@ -0,0 +1,269 @@
+"""
+Волновой BFS на битбордах (движок PathFinder "bfs_bitboard").
+
+Сетка режется на плитки TILE x TILE клеток; плитка - целое Python, бит
+ly * TILE + lx которого - клетка (lx, ly) плитки. Волна раскрывается целиком:
+сдвиги на 1 и на TILE с масками дают соседей внутри плитки, краевые столбцы
+и строки переносятся в соседние плитки. Обрабатываются только плитки с
+фронтом, поэтому волна стоит O(плиток фронта), а не O(клеток сетки): на
+длинных коридорах recursive_backtracking фронт занимает одну-две плитки.
+
+Для восстановления пути по каждой плитке хранятся 4 плоскости направлений:
+бит клетки в плоскости - с какой стороны в нее пришла волна.
+"""
+import sys
+import time
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence, Tuple
+
+if TYPE_CHECKING:
+    from app.services.pathfinder import SearchBudget
+
+TILE = 64
+
+_TILE_MASK = (1 << TILE) - 1
+_ROW_STARTS = ((1 << (TILE * TILE)) - 1) // _TILE_MASK
+_NOT_FIRST = _ROW_STARTS * (_TILE_MASK - 1)   # без столбца lx = 0
+_NOT_LAST = _ROW_STARTS * (_TILE_MASK >> 1)   # без столбца lx = TILE - 1
+_FIRST_COLUMN = _ROW_STARTS
+_LAST_COLUMN = _ROW_STARTS << (TILE - 1)
+_LAST_ROW_SHIFT = TILE * (TILE - 1)
+
+# Байты клеток сетки (0 - проход, 1 - стена) в двоичные цифры маски проходов
+_OPEN_DIGITS = bytes.maketrans(b"\x00\x01", b"10")
+
+# Сдвиг к предшественнику для плоскостей from_left, from_right, from_above, from_below
+_PREDECESSOR = ((-1, 0), (1, 0), (0, -1), (0, 1))
+
+Tile = Tuple[int, int]
+
+
+def open_tiles(grid: Sequence[Sequence[int]], width: int, height: int) -> Dict[Tile, int]:
+    """Проходы сетки по плиткам; плитки без проходов не хранятся"""
+    packed = getattr(grid, "packed", None)
+    if packed is None:
+        # Строка 0/1 -> цифры "1" для прохода; разворот делает клетку x битом x
+        rows = [int(bytes(row)[::-1].translate(_OPEN_DIGITS), 2) for row in grid]
+    else:
+        row_mask = (1 << width) - 1
+        rows = []
+        for y in range(height):
+            bit = y * width
+            chunk = packed[bit >> 3:((bit + width + 7) >> 3) + 1]
+            rows.append(~(int.from_bytes(chunk, "little") >> (bit & 7)) & row_mask)
+    
+    tiles = {}
+    for ty in range((height + TILE - 1) // TILE):
+        band = rows[ty * TILE:(ty + 1) * TILE]
+        for tx in range((width + TILE - 1) // TILE):
+            shift = tx * TILE
+            value = 0
+            for ly, row in enumerate(band):
+                value |= ((row >> shift) & _TILE_MASK) << (ly * TILE)
+            if value:
+                tiles[(tx, ty)] = value
+    return tiles
+
+
+def _spread(frontier: Dict[Tile, int]) -> Dict[Tile, List[int]]:
+    """Кандидаты следующей волны по плиткам: [справа, слева, снизу, сверху] от фронта"""
+    incoming: Dict[Tile, List[int]] = {}
+    get = incoming.get
+    for (tx, ty), bits in frontier.items():
+        key = (tx, ty)
+        moves = get(key)
+        if moves is None:
+            moves = incoming[key] = [0, 0, 0, 0]
+        moves[0] |= (bits << 1) & _NOT_FIRST
+        moves[1] |= (bits >> 1) & _NOT_LAST
+        moves[2] |= bits << TILE
+        moves[3] |= bits >> TILE
+        # Краевые столбцы и строки переходят в соседние плитки
+        edge = bits & _LAST_COLUMN
+        if edge:
+            key = (tx + 1, ty)
+            moves = get(key)
+            if moves is None:
+                moves = incoming[key] = [0, 0, 0, 0]
+            moves[0] |= edge >> (TILE - 1)
+        edge = bits & _FIRST_COLUMN
+        if edge:
+            key = (tx - 1, ty)
+            moves = get(key)
+            if moves is None:
+                moves = incoming[key] = [0, 0, 0, 0]
+            moves[1] |= edge << (TILE - 1)
+        edge = bits >> _LAST_ROW_SHIFT
+        if edge:
+            key = (tx, ty + 1)
+            moves = get(key)
+            if moves is None:
+                moves = incoming[key] = [0, 0, 0, 0]
+            moves[2] |= edge
+        edge = bits & _TILE_MASK
+        if edge:
+            key = (tx, ty - 1)
+            moves = get(key)
+            if moves is None:
+                moves = incoming[key] = [0, 0, 0, 0]
+            moves[3] |= edge << _LAST_ROW_SHIFT
+    return incoming
+
+
+def bitboard_bfs(
+    grid: Sequence[Sequence[int]],
+    width: int,
+    height: int,
+    start: Tuple[int, int],
+    end: Tuple[int, int],
+    budget: Optional["SearchBudget"] = None
+) -> Dict:
+    """
+    Кратчайший путь волнами. Возвращает path, reached (достигнутые клетки),
+    waves, peak_frontier, memory_bytes и stopped (причина остановки по budget).
+    """
+    started = time.perf_counter_ns()
+    unvisited = open_tiles(grid, width, height)
+    wave = _Wave(unvisited, start, [end])
+    stopped = wave.run(budget, started)
+    
+    path = []
+    if stopped is None and wave.reached_target(end):
+        path = wave.trace(end)
+    
+    memory = sum(
+        sys.getsizeof(table) + sum(sys.getsizeof(bits) for bits in table.values())
+        for table in (unvisited, *wave.planes)
+    )
+    return {
+        "path": path,
+        "reached": wave.reached,
+        "waves": wave.waves,
+        "peak_frontier": wave.peak_frontier,
+        "memory_bytes": memory,
+        "stopped": stopped
+    }
+
+
+def bitboard_paths(
+    tiles: Dict[Tile, int],
+    source: Tuple[int, int],
+    targets: Sequence[Tuple[int, int]]
+) -> Dict[Tuple[int, int], List[Tuple[int, int]]]:
+    """
+    Кратчайшие пути из source во все targets одной волной. tiles - результат
+    open_tiles, не изменяется. Недостижимые цели получают пустой путь.
+    """
+    wave = _Wave(dict(tiles), source, targets)
+    wave.run()
+    return {
+        target: wave.trace(target) if wave.reached_target(target) else []
+        for target in targets
+    }
+
+
+def _cell(point: Tuple[int, int]) -> Tuple[Tile, int]:
+    x, y = point
+    return (x // TILE, y // TILE), 1 << ((y % TILE) * TILE + x % TILE)
+
+
+class _Wave:
+    """
+    Волна из одной клетки до достижения всех целей. planes - плоскости
+    направлений по плиткам: по ним путь восстанавливается к любой достигнутой клетке.
+    """
+
+    def __init__(self, unvisited: Dict[Tile, int], start: Tuple[int, int], targets: Sequence[Tuple[int, int]]):
+        self.unvisited = unvisited
+        self.start = start
+        self.frontier: Dict[Tile, int] = {}
+        start_key, start_bit = _cell(start)
+        self.start_open = bool(unvisited.get(start_key, 0) & start_bit)
+        if self.start_open:
+            self.frontier[start_key] = start_bit
+            unvisited[start_key] ^= start_bit
+        # Открытые и еще не достигнутые цели по плиткам
+        self.pending: Dict[Tile, int] = {}
+        for target in targets:
+            key, bit = _cell(target)
+            if unvisited.get(key, 0) & bit:
+                self.pending[key] = self.pending.get(key, 0) | bit
+        self.planes: Tuple[Dict[Tile, int], ...] = ({}, {}, {}, {})
+        self.reached = self.peak_frontier = len(self.frontier)
+        self.waves = 0
+
+    def run(self, budget: Optional["SearchBudget"] = None, started: Optional[int] = None) -> Optional[str]:
+        """Раскрывать волну, пока есть фронт и недостигнутые цели; вернуть причину остановки"""
+        from_left, from_right, from_above, from_below = self.planes
+        unvisited = self.unvisited
+        pending = self.pending
+        frontier = self.frontier
+        started = time.perf_counter_ns() if started is None else started
+        stopped = None
+        
+        while frontier and pending:
+            if budget is not None:
+                stopped = budget.exceeded(self.reached, time.perf_counter_ns() - started)
+                if stopped is not None:
+                    break
+            next_frontier = {}
+            count = 0
+            for key, (right, left, down, up) in _spread(frontier).items():
+                free = unvisited.get(key, 0)
+                if not free:
+                    continue
+                right &= free
+                left &= free
+                down &= free
+                up &= free
+                new = right | left | down | up
+                if new:
+                    if right:
+                        from_left[key] = from_left.get(key, 0) | right
+                    if left:
+                        from_right[key] = from_right.get(key, 0) | left
+                    if down:
+                        from_above[key] = from_above.get(key, 0) | down
+                    if up:
+                        from_below[key] = from_below.get(key, 0) | up
+                    unvisited[key] = free ^ new
+                    next_frontier[key] = new
+                    count += new.bit_count()
+                    waiting = pending.get(key)
+                    if waiting is not None and waiting & new:
+                        waiting &= ~new
+                        if waiting:
+                            pending[key] = waiting
+                        else:
+                            del pending[key]
+            frontier = next_frontier
+            self.reached += count
+            if count > self.peak_frontier:
+                self.peak_frontier = count
+            self.waves += 1
+        self.frontier = frontier
+        return stopped
+
+    def reached_target(self, target: Tuple[int, int]) -> bool:
+        """Клетка открыта и достигнута волной"""
+        if target == self.start:
+            return self.start_open
+        key, bit = _cell(target)
+        return any(plane.get(key, 0) & bit for plane in self.planes)
+
+    def trace(self, end: Tuple[int, int]) -> List[Tuple[int, int]]:
+        """Путь от start к достигнутой клетке end по плоскостям направлений"""
+        x, y = end
+        path = [end]
+        key = None
+        while (x, y) != self.start:
+            if (x // TILE, y // TILE) != key:
+                key = (x // TILE, y // TILE)
+                tile_planes = [plane.get(key, 0) for plane in self.planes]
+            bit = (y % TILE) * TILE + x % TILE
+            for bits, (dx, dy) in zip(tile_planes, _PREDECESSOR):
+                if bits >> bit & 1:
+                    x, y = x + dx, y + dy
+                    break
+            path.append((x, y))
+        path.reverse()
+        return path
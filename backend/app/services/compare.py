@@ -0,0 +1,63 @@
+"""
+Сравнение алгоритмов поиска на одном лабиринте (POST /api/maze/{id}/compare).
+
+Сетка декодируется один раз в битовую плоскость в shared_memory (или уже лежит
+в файле GridStore), воркеры CPU-пула подключаются к ней по имени без pickle
+сетки. Небольшие сетки воркер распаковывает в список: чтение списка быстрее
+побитового доступа, распаковка 10^4 клеток занимает доли миллисекунды.
+"""
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+from typing import Dict, Iterator, Optional, Sequence, Tuple
+
+from app.services.grid_codec import pack_grid, unpack_grid
+from app.services.grid_store import MappedGrid, PackedGrid
+from app.services.pathfinder import PathFinder
+
+# До этого размера воркер распаковывает сетку в List[List[int]]
+UNPACK_MAX_CELLS = 1 << 20
+
+
+def share_grid(grid: Sequence[Sequence[int]]) -> shared_memory.SharedMemory:
+    """Упаковать сетку в новый блок shared_memory; владелец вызывает close() и unlink()"""
+    # Сетка из общего кеша уже упакована
+    packed = grid.packed if hasattr(grid, "packed") else pack_grid(grid)
+    shm = shared_memory.SharedMemory(create=True, size=max(len(packed), 1))
+    shm.buf[:len(packed)] = packed
+    return shm
+
+
+@contextmanager
+def attached_grid(
+    shm_name: Optional[str],
+    grid_path: Optional[str],
+    width: int,
+    height: int
+) -> Iterator[PackedGrid]:
+    """Сетка в воркере: блок share_grid по имени либо файл GridStore"""
+    shm = shared_memory.SharedMemory(name=shm_name) if shm_name is not None else None
+    view = PackedGrid(shm.buf, width, height) if shm is not None else MappedGrid(grid_path)
+    try:
+        yield view
+    finally:
+        view.close()
+        if shm is not None:
+            shm.close()
+
+
+def run_compare_solve(
+    shm_name: Optional[str],
+    grid_path: Optional[str],
+    width: int,
+    height: int,
+    start: Tuple[int, int],
+    end: Tuple[int, int],
+    algorithm: str,
+    record_steps: bool
+) -> Dict:
+    """Выполняется в CPU-пуле: сетка из shared_memory shm_name или файла grid_path"""
+    with attached_grid(shm_name, grid_path, width, height) as view:
+        grid = view
+        if width * height <= UNPACK_MAX_CELLS:
+            grid = unpack_grid(bytes(view.packed), width, height)
+        return PathFinder(grid, start, end).find_path(algorithm, record_steps=record_steps)
@@ -0,0 +1,60 @@
+"""
+Генерация и решение без сохранения (POST /api/maze/ephemeral).
+
+Вся работа, включая сериализацию ответа, выполняется в CPU-пуле запросов
+(app.services.executor.get_request_executor): event loop получает готовые
+байты тела и только отправляет их. БД не используется.
+"""
+import time
+from typing import Dict, Optional, Tuple
+
+import msgpack
+import orjson
+
+from app.services.grid_codec import pack_grid, pack_points, pack_steps
+from app.services.maze_generator import MazeGenerator
+from app.services.pathfinder import PathFinder
+
+
+def generate_and_solve(
+    width: int,
+    height: int,
+    algorithm: str,
+    solve: Optional[str],
+    record_steps: bool,
+    binary: bool
+) -> Tuple[bytes, float, Optional[Dict]]:
+    """
+    Выполняется в CPU-пуле. Возвращает тело ответа (JSON или MessagePack),
+    время генерации в секундах и статистику поиска для метрик процесса API.
+    """
+    started = time.perf_counter()
+    grid, start, end = MazeGenerator(width, height).generate(algorithm)
+    generation_time = time.perf_counter() - started
+    
+    solution = None
+    stats = None
+    if solve is not None:
+        result = PathFinder(grid, start, end).find_path(solve, record_steps=record_steps)
+        stats = result["stats"]
+        solution = {
+            "algorithm": solve,
+            "path": pack_points(result["path"]) if binary else result["path"],
+            "steps": pack_steps(result["steps"]) if binary else result["steps"],
+            "stats": stats
+        }
+    
+    content = {
+        "width": width,
+        "height": height,
+        "grid": pack_grid(grid) if binary else grid,
+        "start": start,
+        "end": end,
+        "algorithm": algorithm,
+        "solution": solution
+    }
+    if binary:
+        body = msgpack.packb(content, use_bin_type=True)
+    else:
+        body = orjson.dumps(content)
+    return body, generation_time, stats
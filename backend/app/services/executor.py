@@ -0,0 +1,57 @@
+"""
+Пул для CPU-задач (генерация, поиск) вне event loop.
+
+JOB_EXECUTOR=process - ProcessPoolExecutor: вычисления не делят GIL с event loop,
+аргументы и результат передаются через pickle, поэтому большие сетки
+передаются путем к файлу GridStore, а не списком.
+JOB_EXECUTOR=thread - ThreadPoolExecutor: без pickle, но под общим GIL.
+
+Фоновые задачи и синхронные запросы (POST /api/maze/ephemeral) используют
+разные пулы, чтобы долгие задачи не занимали воркеры коротких запросов.
+"""
+import multiprocessing
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional
+
+from app.config import get_settings
+
+_executor: Optional[Executor] = None
+_request_executor: Optional[Executor] = None
+
+
+def create_cpu_executor(kind: str, workers: int) -> Executor:
+    if kind == "process":
+        # spawn: fork процесса с потоками aiosqlite и event loop небезопасен
+        return ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"))
+    if kind == "thread":
+        return ThreadPoolExecutor(workers, thread_name_prefix="cpu")
+    raise ValueError(f"Неизвестный тип пула: {kind}")
+
+
+def get_cpu_executor() -> Executor:
+    global _executor
+    if _executor is None:
+        settings = get_settings()
+        _executor = create_cpu_executor(settings.JOB_EXECUTOR, settings.JOB_WORKERS)
+    return _executor
+
+
+def request_workers() -> int:
+    """Число воркеров пула синхронных запросов"""
+    return get_settings().EPHEMERAL_WORKERS or os.cpu_count() or 1
+
+
+def get_request_executor() -> Executor:
+    global _request_executor
+    if _request_executor is None:
+        _request_executor = create_cpu_executor(get_settings().EPHEMERAL_EXECUTOR, request_workers())
+    return _request_executor
+
+
+def shutdown_cpu_executor() -> None:
+    global _executor, _request_executor
+    for executor in (_executor, _request_executor):
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+    _executor = _request_executor = None
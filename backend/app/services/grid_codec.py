@@ -0,0 +1,148 @@
+"""
+Компактные бинарные представления лабиринта и результатов поиска.
+
+Сетка (bit-packed):
+    клетки в порядке строк, индекс i = y * width + x;
+    бит i лежит в байте i // 8, позиция i % 8 (младший бит первый);
+    1 - стена, 0 - проход; длина ceil(width * height / 8) байт.
+
+Точки (int32):
+    little-endian int32, пары подряд: x0, y0, x1, y1, ...
+
+Трасса шагов (delta):
+    current          - точки, по одной на шаг;
+    visited_offsets  - int32[count + 1], границы среза visited для шага i;
+    visited          - точки, добавленные в visited на шаге i (а не весь набор);
+    frontier_offsets - int32[count + 1];
+    frontier         - содержимое frontier на шаге i целиком.
+"""
+from array import array
+from sys import byteorder
+from typing import Dict, Iterable, List, Sequence, Tuple, Union
+
+import numpy as np
+import orjson
+
+
+def pack_grid(grid: Sequence[Sequence[int]]) -> bytes:
+    """Упаковать сетку по 1 биту на клетку"""
+    bits = "".join("1" if cell else "0" for row in grid for cell in row)
+    if not bits:
+        return b""
+    nbytes = (len(bits) + 7) // 8
+    # Разворот строки делает клетку i битом i целого числа
+    return int(bits[::-1], 2).to_bytes(nbytes, "little")
+
+
+def pack_grid_json(text: Union[str, bytes]) -> bytes:
+    """
+    pack_grid для JSON-текста сетки (колонка mazes.grid) без разбора в списки:
+    символы 0 и 1 идут в порядке клеток, остальное - скобки и запятые.
+    """
+    if isinstance(text, str):
+        text = text.encode()
+    chars = np.frombuffer(text, dtype=np.uint8)
+    bits = chars[(chars == ord("0")) | (chars == ord("1"))] - ord("0")
+    return np.packbits(bits, bitorder="little").tobytes()
+
+
+def unpack_grid_json(data: bytes, width: int, height: int) -> bytes:
+    """Битовая плоскость -> JSON-текст сетки, как orjson.dumps(unpack_grid(...))"""
+    bits = np.unpackbits(np.frombuffer(data, dtype=np.uint8), bitorder="little")
+    return orjson.dumps(
+        bits[:width * height].reshape(height, width), option=orjson.OPT_SERIALIZE_NUMPY
+    )
+
+
+def unpack_grid(data: bytes, width: int, height: int) -> List[List[int]]:
+    """Распаковать bit-packed сетку обратно в список строк"""
+    total = width * height
+    if total == 0:
+        return []
+    bits = format(int.from_bytes(data, "little"), f"0{len(data) * 8}b")[::-1]
+    flat = [1 if bit == "1" else 0 for bit in bits[:total]]
+    return [flat[y * width:(y + 1) * width] for y in range(height)]
+
+
+def pack_points(points: Iterable[Sequence[int]]) -> bytes:
+    """Список (x, y) -> little-endian int32 x0, y0, x1, y1, ..."""
+    values = array("i")
+    for x, y in points:
+        values.append(x)
+        values.append(y)
+    return _to_le_bytes(values)
+
+
+def unpack_points(data: bytes) -> List[Tuple[int, int]]:
+    values = _from_le_bytes(data)
+    return [(values[i], values[i + 1]) for i in range(0, len(values), 2)]
+
+
+def pack_steps(steps: List[Dict]) -> Dict:
+    """Трасса шагов -> delta-массивы (см. описание модуля)"""
+    current = array("i")
+    visited_offsets = array("i", [0])
+    visited = array("i")
+    frontier_offsets = array("i", [0])
+    frontier = array("i")
+
+    seen = set()
+    for step in steps:
+        x, y = step["current"]
+        current.append(x)
+        current.append(y)
+
+        for cell in step["visited"]:
+            cell = tuple(cell)
+            if cell not in seen:
+                seen.add(cell)
+                visited.append(cell[0])
+                visited.append(cell[1])
+        visited_offsets.append(len(visited) // 2)
+
+        for cx, cy in step["frontier"]:
+            frontier.append(cx)
+            frontier.append(cy)
+        frontier_offsets.append(len(frontier) // 2)
+
+    return {
+        "count": len(steps),
+        "current": _to_le_bytes(current),
+        "visited_offsets": _to_le_bytes(visited_offsets),
+        "visited": _to_le_bytes(visited),
+        "frontier_offsets": _to_le_bytes(frontier_offsets),
+        "frontier": _to_le_bytes(frontier),
+    }
+
+
+def unpack_steps(packed: Dict) -> List[Dict]:
+    """Обратное преобразование pack_steps (visited снова накопительный)"""
+    current = unpack_points(packed["current"])
+    visited_offsets = _from_le_bytes(packed["visited_offsets"])
+    visited = unpack_points(packed["visited"])
+    frontier_offsets = _from_le_bytes(packed["frontier_offsets"])
+    frontier = unpack_points(packed["frontier"])
+
+    steps = []
+    for i in range(packed["count"]):
+        steps.append({
+            "current": current[i],
+            "visited": visited[:visited_offsets[i + 1]],
+            "frontier": frontier[frontier_offsets[i]:frontier_offsets[i + 1]],
+        })
+    return steps
+
+
+def _to_le_bytes(values: array) -> bytes:
+    if byteorder != "little":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _from_le_bytes(data: bytes) -> array:
+    values = array("i")
+    values.frombytes(data)
+    if byteorder != "little":
+        values.byteswap()
+    return values
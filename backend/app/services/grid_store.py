@@ -0,0 +1,210 @@
+"""
+Хранилище больших сеток в файлах фиксированного формата.
+
+Формат файла (little-endian):
+    заголовок HEADER (32 байта):
+        magic     4s   b"MAZG"
+        version   u16  FORMAT_VERSION
+        header    u16  размер заголовка в байтах
+        width     u32
+        height    u32
+        start_x   u32, start_y u32
+        end_x     u32, end_y   u32
+    битовая плоскость ceil(width * height / 8) байт, раскладка как в
+    grid_codec.pack_grid (клетка i = y * width + x, младший бит первый, 1 - стена).
+
+Файлы неизменяемы: запись идет во временный файл того же каталога и атомарно
+подменяется через os.replace, поэтому процессы uvicorn читают их через mmap
+без блокировок. Удаление файла не ломает уже открытые отображения.
+"""
+import mmap
+import os
+import struct
+import uuid
+from collections import OrderedDict
+from threading import Lock
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+from app.config import get_settings
+from app.services.grid_codec import pack_grid
+from app.services.metrics import record_cache
+
+MAGIC = b"MAZG"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<4sHHIIIIII")
+
+
+class PackedGrid:
+    """
+    Сетка поверх битовой плоскости pack_grid (mmap, shared_memory, bytes).
+    Поддерживает grid[y][x] и len(), поэтому передается в PathFinder вместо
+    List[List[int]] без распаковки.
+    """
+
+    def __init__(self, packed, width: int, height: int):
+        self.width = width
+        self.height = height
+        self.packed = memoryview(packed)[:(width * height + 7) // 8]
+
+    def is_wall(self, x: int, y: int) -> int:
+        i = y * self.width + x
+        return (self.packed[i >> 3] >> (i & 7)) & 1
+
+    def __len__(self) -> int:
+        return self.height
+
+    def __getitem__(self, y: int) -> "_RowView":
+        if not 0 <= y < self.height:
+            raise IndexError(y)
+        return _RowView(self, y)
+
+    def __iter__(self) -> Iterator["_RowView"]:
+        for y in range(self.height):
+            yield _RowView(self, y)
+
+    def tile(self, x: int, y: int, width: int, height: int) -> List[List[int]]:
+        """Прямоугольный фрагмент, обрезанный по границам сетки"""
+        x_end = min(x + width, self.width)
+        y_end = min(y + height, self.height)
+        return [
+            [self.is_wall(cx, cy) for cx in range(x, x_end)]
+            for cy in range(y, y_end)
+        ]
+
+    def to_list(self) -> List[List[int]]:
+        return self.tile(0, 0, self.width, self.height)
+
+    def close(self) -> None:
+        """Освободить ссылку на буфер (нужно до закрытия shared_memory)"""
+        self.packed.release()
+
+
+class MappedGrid(PackedGrid):
+    """Файл GridStore, отображенный в память"""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        header = HEADER.unpack_from(self._mmap, 0)
+        magic, version, header_size, width, height, sx, sy, ex, ey = header
+        if magic != MAGIC or version != FORMAT_VERSION:
+            self._mmap.close()
+            raise ValueError(f"Неподдерживаемый файл сетки: {path}")
+
+        super().__init__(memoryview(self._mmap)[header_size:], width, height)
+        self.start = (sx, sy)
+        self.end = (ex, ey)
+
+    def close(self) -> None:
+        super().close()
+        self._mmap.close()
+
+
+class _RowView:
+
+    __slots__ = ("_grid", "_offset", "_width")
+
+    def __init__(self, grid: PackedGrid, y: int):
+        self._grid = grid
+        self._offset = y * grid.width
+        self._width = grid.width
+
+    def __len__(self) -> int:
+        return self._width
+
+    def __getitem__(self, x: int) -> int:
+        if not 0 <= x < self._width:
+            raise IndexError(x)
+        i = self._offset + x
+        return (self._grid.packed[i >> 3] >> (i & 7)) & 1
+
+    def __iter__(self):
+        for x in range(self._width):
+            yield self[x]
+
+
+class GridStore:
+    """Каталог с файлами сеток и LRU открытых отображений процесса"""
+
+    def __init__(self, root: str, max_open: int = 64):
+        self.root = root
+        self.max_open = max_open
+        self._open: "OrderedDict[str, MappedGrid]" = OrderedDict()
+        self._lock = Lock()
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.root, name)
+
+    def write(
+        self,
+        grid: Sequence[Sequence[int]],
+        start: Tuple[int, int],
+        end: Tuple[int, int]
+    ) -> str:
+        """Сохранить сетку, вернуть имя файла относительно root"""
+        height = len(grid)
+        width = len(grid[0]) if grid else 0
+        return self.write_packed(pack_grid(grid), width, height, start, end)
+
+    def write_packed(
+        self,
+        packed: bytes,
+        width: int,
+        height: int,
+        start: Tuple[int, int],
+        end: Tuple[int, int]
+    ) -> str:
+        """То же для уже упакованной битовой плоскости (формат pack_grid)"""
+        name = uuid.uuid4().hex
+        relative = os.path.join(name[:2], f"{name}.grid")
+        path = self.path(relative)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        header = HEADER.pack(
+            MAGIC, FORMAT_VERSION, HEADER.size,
+            width, height, start[0], start[1], end[0], end[1]
+        )
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(header)
+            f.write(packed)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        return relative
+
+    def open(self, name: str) -> MappedGrid:
+        with self._lock:
+            grid = self._open.get(name)
+            record_cache("grid_store", grid is not None)
+            if grid is not None:
+                self._open.move_to_end(name)
+                return grid
+
+        grid = MappedGrid(self.path(name))
+        with self._lock:
+            self._open[name] = grid
+            while len(self._open) > self.max_open:
+                # Старые отображения не закрываются явно: ими может пользоваться
+                # идущий поиск, mmap освободится вместе с последней ссылкой
+                self._open.popitem(last=False)
+        return grid
+
+    def delete(self, name: str) -> None:
+        with self._lock:
+            self._open.pop(name, None)
+        try:
+            os.remove(self.path(name))
+        except FileNotFoundError:
+            pass
+
+
+_store: Optional[GridStore] = None
+
+
+def get_grid_store() -> GridStore:
+    global _store
+    if _store is None:
+        settings = get_settings()
+        _store = GridStore(settings.GRID_STORE_DIR, settings.GRID_STORE_MAX_OPEN)
+    return _store
@@ -0,0 +1,378 @@
+"""
+Очередь фоновых задач генерации, поиска и пересчета метрик для больших лабиринтов.
+
+Источник истины - таблица jobs: воркер забирает задачу одним UPDATE ... RETURNING
+(queued -> running, порядок priority DESC, id), поэтому очередь переживает
+перезапуск и может разделяться несколькими процессами uvicorn. Новая задача
+будит воркеры своего процесса сразу, задачи других процессов подхватываются
+по таймеру JOB_POLL_INTERVAL.
+
+Вычисления идут в CPU-пуле (app.services.executor), запись результата - через
+MazeRepository в event loop. Отмена выполняемой задачи не прерывает вычисление:
+результат отбрасывается до записи в БД.
+
+Забранная задача арендуется процессом (owner) на lease секунд, воркер продлевает
+аренду, пока задача выполняется. Задачи с истекшей арендой (процесс упал или
+завис) возвращаются в очередь при старте и затем по таймеру продления, поэтому
+процесс, запущенный рядом с живыми соседями, не трогает их задачи. Процесс,
+потерявший аренду, отбрасывает результат до записи в БД.
+"""
+import asyncio
+import logging
+import os
+import socket
+import time
+import uuid
+from concurrent.futures import Executor
+from typing import Dict, List, Optional, Set, Tuple
+
+import orjson
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.config import get_settings
+from app.database import AsyncSessionLocal
+from app.models.job import Job
+from app.repositories.job_repository import TERMINAL_STATUSES, JobRepository
+from app.repositories.maze_repository import MazeRepository
+from app.services.analytics import refresh_metrics
+from app.services.executor import get_cpu_executor
+from app.services.grid_store import GridStore, MappedGrid, get_grid_store
+from app.services.maze_generator import MazeGenerator
+from app.services.metrics import (
+    GENERATION_TIME,
+    JOB_QUEUE_DEPTH,
+    JOB_RUN_TIME,
+    JOB_WAIT_TIME,
+    JOBS_FINISHED,
+    NODES_EXPLORED,
+    SOLVE_TIME,
+    SOLVES_STOPPED,
+    size_bucket
+)
+from app.services.pathfinder import PathFinder, SearchBudget
+from app.services.write_behind import WriteBehindBuffer, get_write_behind
+
+logger = logging.getLogger(__name__)
+
+JOB_KINDS = ("generate", "solve", "analyze")
+
+
+class QueueFullError(Exception):
+    pass
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class BudgetExceeded(Exception):
+    """Поиск остановлен по max_nodes/max_ms; частичная статистика идет в result задачи"""
+    
+    def __init__(self, reason: str, stats: dict):
+        super().__init__(f"Бюджет поиска исчерпан: {reason}")
+        self.result = {"stopped": reason, "stats": stats}
+
+
+def run_generate(width: int, height: int, algorithm: str) -> Tuple[list, tuple, tuple, float]:
+    """Выполняется в CPU-пуле; возвращает сетку и время генерации"""
+    started = time.perf_counter()
+    grid, start, end = MazeGenerator(width, height).generate(algorithm)
+    return grid, start, end, time.perf_counter() - started
+
+
+def run_solve(
+    grid: Optional[list],
+    grid_path: Optional[str],
+    start: tuple,
+    end: tuple,
+    algorithm: str,
+    record_steps: bool,
+    max_nodes: Optional[int] = None,
+    max_ms: Optional[float] = None
+) -> Dict:
+    """Выполняется в CPU-пуле; большая сетка открывается из файла по месту"""
+    if grid_path is not None:
+        grid = MappedGrid(grid_path)
+    return PathFinder(grid, start, end).find_path(
+        algorithm, record_steps=record_steps, budget=SearchBudget(max_nodes, max_ms)
+    )
+
+
+class JobQueue:
+    
+    def __init__(
+        self,
+        session_factory: async_sessionmaker,
+        grid_store: GridStore,
+        executor: Executor,
+        write_behind: Optional[WriteBehindBuffer] = None,
+        workers: int = 2,
+        max_queued: int = 1000,
+        poll_interval: float = 0.5,
+        lease: float = 30.0
+    ):
+        self.session_factory = session_factory
+        self.grid_store = grid_store
+        self.executor = executor
+        self.write_behind = write_behind
+        self.workers = workers
+        self.max_queued = max_queued
+        self.poll_interval = poll_interval
+        self.lease = lease
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        
+        self._wakeup = asyncio.Event()
+        self._waiters: Dict[int, asyncio.Event] = {}
+        self._active: Set[int] = set()
+        self._tasks: List[asyncio.Task] = []
+    
+    async def submit(self, kind: str, params: dict, priority: int = 0) -> Job:
+        if kind not in JOB_KINDS:
+            raise ValueError(f"Неизвестный тип задачи: {kind}")
+        async with self.session_factory() as db:
+            repo = JobRepository(db)
+            if await repo.count_queued() >= self.max_queued:
+                raise QueueFullError("Очередь задач переполнена")
+            job = await repo.create(kind, params, priority)
+            await self._update_depth(repo)
+        self._wakeup.set()
+        return job
+    
+    async def get(self, job_id: int) -> Optional[Job]:
+        async with self.session_factory() as db:
+            return await JobRepository(db).get(job_id)
+    
+    async def wait(self, job_id: int, timeout: float) -> Optional[Job]:
+        """Long-poll: вернуть задачу, как только она завершится, или по таймауту"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            job = await self.get(job_id)
+            if job is None or job.status in TERMINAL_STATUSES:
+                self._waiters.pop(job_id, None)
+                return job
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return job
+            # Событие ставит воркер этого процесса; чужие процессы видны по опросу БД
+            event = self._waiters.setdefault(job_id, asyncio.Event())
+            try:
+                await asyncio.wait_for(event.wait(), min(remaining, self.poll_interval))
+            except asyncio.TimeoutError:
+                pass
+    
+    async def cancel(self, job_id: int) -> Optional[Job]:
+        async with self.session_factory() as db:
+            repo = JobRepository(db)
+            cancelled = await repo.cancel(job_id)
+            job = await repo.get(job_id)
+            if cancelled:
+                JOBS_FINISHED.inc(kind=job.kind, status="cancelled")
+                await self._update_depth(repo)
+        if cancelled:
+            self._notify(job_id)
+        return job
+    
+    async def start(self) -> None:
+        if self._tasks:
+            return
+        async with self.session_factory() as db:
+            repo = JobRepository(db)
+            recovered = await repo.requeue_expired()
+            if recovered:
+                logger.warning("Возвращено в очередь задач с истекшей арендой: %d", recovered)
+            await self._update_depth(repo)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._heartbeat()))
+    
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._active:
+            # Прерванные задачи выполнит следующий запуск
+            async with self.session_factory() as db:
+                await JobRepository(db).requeue(self._active, self.owner)
+            self._active.clear()
+    
+    async def _heartbeat(self) -> None:
+        """Продлевать аренду своих задач и возвращать в очередь брошенные чужие"""
+        while True:
+            await asyncio.sleep(self.lease / 3)
+            try:
+                async with self.session_factory() as db:
+                    repo = JobRepository(db)
+                    if self._active:
+                        await repo.renew(self.owner, self._active, self.lease)
+                    recovered = await repo.requeue_expired()
+                    if recovered:
+                        logger.warning("Возвращено в очередь задач с истекшей арендой: %d", recovered)
+                        await self._update_depth(repo)
+                        self._wakeup.set()
+            except Exception:
+                logger.exception("Ошибка продления аренды задач")
+    
+    async def _worker(self) -> None:
+        while True:
+            try:
+                job = await self._claim()
+            except Exception:
+                logger.exception("Ошибка выборки задачи")
+                job = None
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+                continue
+            await self._execute(job)
+    
+    async def _claim(self) -> Optional[Job]:
+        async with self.session_factory() as db:
+            repo = JobRepository(db)
+            job = await repo.claim_next(self.owner, self.lease)
+            if job is not None:
+                self._active.add(job.id)
+                await self._update_depth(repo)
+            return job
+    
+    async def _execute(self, job: Job) -> None:
+        if job.created_at is not None and job.started_at is not None:
+            waited = (job.started_at - job.created_at).total_seconds()
+            JOB_WAIT_TIME.observe(max(waited, 0.0), kind=job.kind)
+        started = time.perf_counter()
+        result, error = None, None
+        try:
+            params = orjson.loads(job.params)
+            if job.kind == "generate":
+                result = await self._generate(job.id, params)
+            elif job.kind == "analyze":
+                result = await self._analyze(params)
+            else:
+                result = await self._solve(job.id, params)
+            status = "succeeded"
+        except JobCancelled:
+            status = "cancelled"
+        except BudgetExceeded as e:
+            status, result, error = "failed", e.result, str(e)
+        except Exception as e:
+            logger.exception("Ошибка выполнения задачи %s", job.id)
+            status, error = "failed", str(e)
+        finally:
+            self._active.discard(job.id)
+        
+        JOB_RUN_TIME.observe(time.perf_counter() - started, kind=job.kind)
+        if status != "cancelled":
+            async with self.session_factory() as db:
+                repo = JobRepository(db)
+                # False - задачу отменили во время записи результата, отмена уже учтена
+                if await repo.finish(job.id, status, result, error, self.owner):
+                    JOBS_FINISHED.inc(kind=job.kind, status=status)
+                await self._update_depth(repo)
+        self._notify(job.id)
+    
+    async def _check_cancelled(self, job_id: int) -> None:
+        """Задачу отменили или ее аренду забрал другой процесс - результат не пишется"""
+        async with self.session_factory() as db:
+            if not await JobRepository(db).is_owned(job_id, self.owner):
+                raise JobCancelled()
+    
+    async def _generate(self, job_id: int, params: dict) -> dict:
+        width, height, algorithm = params["width"], params["height"], params["algorithm"]
+        loop = asyncio.get_running_loop()
+        grid, start, end, elapsed = await loop.run_in_executor(
+            self.executor, run_generate, width, height, algorithm
+        )
+        GENERATION_TIME.observe(elapsed, algorithm=algorithm, size_bucket=size_bucket(width, height))
+        await self._check_cancelled(job_id)
+        
+        async with self.session_factory() as db:
+            repo = MazeRepository(db, self.write_behind, self.grid_store)
+            maze = await repo.create_maze(
+                width=width,
+                height=height,
+                grid=grid,
+                start=start,
+                end=end,
+                algorithm=algorithm
+            )
+        return {"maze_id": maze.id}
+    
+    async def _solve(self, job_id: int, params: dict) -> dict:
+        maze_id, algorithm = params["maze_id"], params["algorithm"]
+        async with self.session_factory() as db:
+            maze = await MazeRepository(db, self.write_behind, self.grid_store).get_maze(maze_id)
+        if maze is None:
+            raise ValueError("Лабиринт не найден")
+        
+        if maze.grid_file:
+            grid, grid_path = None, self.grid_store.path(maze.grid_file)
+        else:
+            grid, grid_path = orjson.loads(maze.grid), None
+        loop = asyncio.get_running_loop()
+        result = await loop.run_in_executor(
+            self.executor, run_solve, grid, grid_path,
+            (maze.start_x, maze.start_y), (maze.end_x, maze.end_y),
+            algorithm, params.get("record_steps", False),
+            params.get("max_nodes"), params.get("max_ms")
+        )
+        if result["stopped"] is not None:
+            SOLVES_STOPPED.inc(algorithm=algorithm, reason=result["stopped"])
+            raise BudgetExceeded(result["stopped"], result["stats"])
+        
+        bucket = size_bucket(maze.width, maze.height)
+        SOLVE_TIME.observe(result["stats"]["search_time_ns"] / 1e9, algorithm=algorithm, size_bucket=bucket)
+        NODES_EXPLORED.observe(result["stats"]["nodes_explored"], algorithm=algorithm, size_bucket=bucket)
+        await self._check_cancelled(job_id)
+        
+        async with self.session_factory() as db:
+            solution = await MazeRepository(db, self.write_behind, self.grid_store).create_solution(
+                maze_id=maze_id,
+                algorithm=algorithm,
+                path=result["path"],
+                steps=result["steps"],
+                **result["stats"]
+            )
+        return {"maze_id": maze_id, "solution_id": solution.id}
+    
+    async def _analyze(self, params: dict) -> dict:
+        if self.write_behind is not None:
+            # Лабиринты из очереди записи тоже должны попасть в выборку
+            await self.write_behind.flush()
+        analyzed = await refresh_metrics(
+            self.session_factory, self.executor, self.grid_store, params.get("force", False)
+        )
+        return {"analyzed": analyzed}
+    
+    async def _update_depth(self, repo: JobRepository) -> None:
+        counts = await repo.count_active()
+        for kind in JOB_KINDS:
+            for status in ("queued", "running"):
+                JOB_QUEUE_DEPTH.set(counts.get((kind, status), 0), kind=kind, status=status)
+    
+    def _notify(self, job_id: int) -> None:
+        event = self._waiters.pop(job_id, None)
+        if event is not None:
+            event.set()
+
+
+_queue: Optional[JobQueue] = None
+
+
+def get_job_queue() -> JobQueue:
+    global _queue
+    if _queue is None:
+        settings = get_settings()
+        _queue = JobQueue(
+            AsyncSessionLocal,
+            get_grid_store(),
+            get_cpu_executor(),
+            get_write_behind(),
+            workers=settings.JOB_WORKERS,
+            max_queued=settings.JOB_MAX_QUEUED,
+            poll_interval=settings.JOB_POLL_INTERVAL,
+            lease=settings.JOB_LEASE_SECONDS
+        )
+    return _queue
@@ -0,0 +1,179 @@
+"""
+Пошаговое решение для WebSocket-канала /ws/maze/{maze_id}/solve.
+
+Поиск продвигается по таймеру: каждые 1/fps секунды раскрывается
+steps_per_frame узлов, но не дольше tick_budget_ms (поиск идет в event loop),
+изменения копятся в одном ожидающем кадре. Кадр уходит,
+только если неподтвержденных (ack) кадров меньше window; иначе следующие тики
+сливаются с ожидающим. Трасса целиком не хранится: в памяти только клетки,
+раскрытые с последнего отправленного кадра.
+
+Протокол (JSON-сообщения):
+  сервер -> {"type": "start", "maze_id", "algorithm", "fps", "steps_per_frame", "window"}
+            {"type": "frame", "seq", "steps", "current", "expanded", "frontier"}
+            {"type": "done", "path", "stats", "step_count", "solution_id"}
+            {"type": "aborted", "step_count"}
+  клиент -> {"type": "ack", "seq"}          кадр seq отрисован
+            {"type": "fps", "value"}        целевая частота кадров
+            {"type": "steps_per_frame", "value"}
+            {"type": "pause"} / {"type": "resume"} / {"type": "step"} / {"type": "abort"}
+
+Клиент, не присылающий ack, получает только первые window кадров и итог.
+"""
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from app.services.metrics import LIVE_FRAMES
+from app.services.pathfinder import PathFinder
+
+
+class LiveControl:
+    """Управление воспроизведением, которое меняют сообщения клиента"""
+    
+    def __init__(self, fps: float, steps_per_frame: int, max_fps: float, max_steps_per_frame: int):
+        self.max_fps = max_fps
+        self.max_steps_per_frame = max_steps_per_frame
+        self.fps = self._clamp(fps, 1.0, max_fps)
+        self.steps_per_frame = int(self._clamp(steps_per_frame, 1, max_steps_per_frame))
+        self.paused = False
+        self.aborted = False
+        self.disconnected = False
+        self.manual_steps = 0
+        self.acked = 0
+        self.changed = asyncio.Event()
+    
+    @staticmethod
+    def _clamp(value, low, high):
+        return max(low, min(high, value))
+    
+    def apply(self, message: Dict) -> None:
+        kind = message.get("type")
+        try:
+            if kind == "ack":
+                self.acked = max(self.acked, int(message.get("seq", 0)))
+            elif kind == "fps":
+                self.fps = self._clamp(float(message["value"]), 1.0, self.max_fps)
+            elif kind == "steps_per_frame":
+                self.steps_per_frame = int(self._clamp(int(message["value"]), 1, self.max_steps_per_frame))
+            elif kind == "pause":
+                self.paused = True
+            elif kind == "resume":
+                self.paused = False
+            elif kind == "step":
+                self.manual_steps += 1
+            elif kind == "abort":
+                self.aborted = True
+            else:
+                return
+        except (KeyError, TypeError, ValueError):
+            return
+        self.changed.set()
+    
+    def disconnect(self) -> None:
+        """Клиент ушел: остановить поиск и больше ничего не отправлять"""
+        self.disconnected = True
+        self.aborted = True
+        self.changed.set()
+    
+    async def wait_changed(self, timeout: Optional[float] = None) -> None:
+        try:
+            await asyncio.wait_for(self.changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        self.changed.clear()
+
+
+class LiveSolveSession:
+    
+    def __init__(
+        self,
+        finder: PathFinder,
+        algorithm: str,
+        control: LiveControl,
+        send: Callable[[Dict], Awaitable[None]],
+        window: int = 4,
+        tick_budget_ms: float = 2.0
+    ):
+        self.finder = finder
+        self.algorithm = algorithm
+        self.control = control
+        self.send = send
+        self.window = window
+        self.tick_budget_ns = int(tick_budget_ms * 1_000_000)
+        self.seq = 0
+        self.step_count = 0
+        self._expanded: List[Tuple[int, int]] = []
+    
+    async def run(self) -> Optional[Dict]:
+        """Провести поиск; итог {"path", "stats", "step_count"} или None при отмене"""
+        state, search = self.finder.search(self.algorithm)
+        control = self.control
+        loop = asyncio.get_running_loop()
+        search_ns = 0
+        next_tick = loop.time()
+        current = None
+        
+        while True:
+            if control.aborted:
+                if not control.disconnected:
+                    await self.send({"type": "aborted", "step_count": self.step_count})
+                return None
+            if control.paused and not control.manual_steps:
+                await control.wait_changed()
+                next_tick = loop.time()
+                continue
+            if control.paused:
+                control.manual_steps -= 1
+            
+            started = time.perf_counter_ns()
+            deadline = started + self.tick_budget_ns
+            exhausted = False
+            for _ in range(control.steps_per_frame):
+                cell = next(search, None)
+                if cell is None:
+                    exhausted = True
+                    break
+                current = cell
+                self._expanded.append(cell)
+                self.step_count += 1
+                if time.perf_counter_ns() >= deadline:
+                    # Тик не держит event loop дольше бюджета, остаток шагов - в следующих тиках
+                    break
+            search_ns += time.perf_counter_ns() - started
+            
+            if exhausted or self.seq - control.acked < self.window:
+                if self._expanded:
+                    await self._send_frame(current, state.frontier_nodes())
+            else:
+                # Клиент не успевает: тик сливается со следующим кадром
+                LIVE_FRAMES.inc(result="merged")
+            
+            if exhausted:
+                return {
+                    "path": state.path,
+                    "stats": self.finder.stats(state, search_ns),
+                    "step_count": self.step_count
+                }
+            
+            next_tick += 1.0 / control.fps
+            delay = next_tick - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            else:
+                # Отстали от расписания (медленная отправка) - не догоняем пачкой тиков
+                next_tick = loop.time()
+    
+    async def _send_frame(self, current: Tuple[int, int], frontier: List[Tuple[int, int]]) -> None:
+        self.seq += 1
+        message = {
+            "type": "frame",
+            "seq": self.seq,
+            "steps": len(self._expanded),
+            "current": current,
+            "expanded": self._expanded,
+            "frontier": frontier
+        }
+        self._expanded = []
+        LIVE_FRAMES.inc(result="sent")
+        await self.send(message)
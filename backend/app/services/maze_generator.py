@@ -87,14 +87,17 @@ class MazeGenerator:
         start_x, start_y = 0, 0
         self.grid[start_y][start_x] = self.PATH
         
+        # Список для random.choice + множество для проверки принадлежности:
+        # list.remove / "in list" делали алгоритм квадратичным
         walls = []
-        self._add_walls(start_x, start_y, walls)
-        
-        directions = [(0, 2), (2, 0), (0, -2), (-2, 0)]
+        wall_set = set()
+        self._add_walls(start_x, start_y, walls, wall_set)
         
         while walls:
-            wall_x, wall_y = random.choice(walls)
-            walls.remove((wall_x, wall_y))
+            index = random.randrange(len(walls))
+            walls[index], walls[-1] = walls[-1], walls[index]
+            wall_x, wall_y = walls.pop()
+            wall_set.discard((wall_x, wall_y))
             
             cells = []
             for dx, dy in [(0, 1), (1, 0), (0, -1), (-1, 0)]:
@@ -111,7 +114,7 @@ class MazeGenerator:
                 for wx, wy in wall_cells:
                     if self.grid[wy][wx] == self.WALL:
                         self.grid[wy][wx] = self.PATH
-                        self._add_walls(wx, wy, walls)
+                        self._add_walls(wx, wy, walls, wall_set)
                         break
         
         end_x, end_y = self.width - 1, self.height - 1
@@ -126,15 +129,22 @@ class MazeGenerator:
         
         return self.grid, (start_x, start_y), (end_x, end_y)
     
-    def _add_walls(self, x: int, y: int, walls: List[Tuple[int, int]]) -> None:
+    def _add_walls(
+        self,
+        x: int,
+        y: int,
+        walls: List[Tuple[int, int]],
+        wall_set: Set[Tuple[int, int]]
+    ) -> None:
         """Добавить стены вокруг клетки"""
         for dx, dy in [(0, 2), (2, 0), (0, -2), (-2, 0)]:
             wall_x, wall_y = x + dx // 2, y + dy // 2
             nx, ny = x + dx, y + dy
             
             if 0 <= nx < self.width and 0 <= ny < self.height:
-                if self.grid[ny][nx] == self.WALL and (wall_x, wall_y) not in walls:
+                if self.grid[ny][nx] == self.WALL and (wall_x, wall_y) not in wall_set:
                     walls.append((wall_x, wall_y))
+                    wall_set.add((wall_x, wall_y))
     
     def _kruskals_algorithm(self) -> Tuple[List[List[int]], Tuple[int, int], Tuple[int, int]]:
         """
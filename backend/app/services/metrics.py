@@ -0,0 +1,307 @@
+"""
+Метрики в текстовом формате Prometheus (exposition format 0.0.4) без внешних зависимостей.
+
+Значения хранятся в памяти процесса: при нескольких воркерах uvicorn каждый
+отдает свои счетчики, агрегация выполняется на стороне Prometheus.
+"""
+import time
+from bisect import bisect_left
+from threading import Lock
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+BYTES_BUCKETS = tuple(256 * 4 ** i for i in range(10))
+NODES_BUCKETS = tuple(10 ** i for i in range(1, 8))
+REPLAN_BUCKETS = (0.0001, 0.00025, 0.0005) + LATENCY_BUCKETS
+SIZE_BUCKETS = (16, 32, 64, 128, 256, 512, 1024, 2048)
+
+LabelValues = Tuple[str, ...]
+
+
+def size_bucket(width: int, height: int) -> str:
+    """Метка размера по большей стороне: <=16, <=32, ..., >2048"""
+    side = max(width, height)
+    for limit in SIZE_BUCKETS:
+        if side <= limit:
+            return f"<={limit}"
+    return f">{SIZE_BUCKETS[-1]}"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def header(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type_name}",
+        ]
+
+    def samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def items(self) -> List[Tuple[LabelValues, float]]:
+        with self._lock:
+            return list(self._values.items())
+
+    def samples(self):
+        for key, value in sorted(self.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Gauge(_Metric):
+    """Gauge со значениями по меткам либо с функцией, вычисляемой при выдаче"""
+
+    type_name = "gauge"
+
+    def __init__(self, name, documentation, labelnames=(), callback: Optional[Callable] = None):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self._callback = callback
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def samples(self):
+        if self._callback is not None:
+            values = self._callback()
+        else:
+            with self._lock:
+                values = dict(self._values)
+        for key, value in sorted(values.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Для каждого набора меток: [счетчики по корзинам..., +Inf], сумма
+        self._values: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.setdefault(key, ([0] * (len(self.buckets) + 1), [0.0]))
+            counts[index] += 1
+            total[0] += value
+
+    def time(self, **labels) -> "_Timer":
+        return _Timer(self, labels)
+
+    def samples(self):
+        with self._lock:
+            snapshot = {key: (list(c), t[0]) for key, (c, t) in self._values.items()}
+        for key, (counts, total) in sorted(snapshot.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, f'le="{_format_value(bound)}"')
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _format_labels(self.labelnames, key)
+            yield f"{self.name}_sum{labels} {_format_value(total)}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+
+class _Timer:
+
+    def __init__(self, histogram: Histogram, labels: Dict[str, str]):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.started, **self.labels)
+
+
+class MetricsRegistry:
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Метрика уже зарегистрирована: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.header())
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+REQUEST_LATENCY = REGISTRY.register(Histogram(
+    "http_request_duration_seconds", "Время обработки HTTP-запроса",
+    ("method", "route", "status")
+))
+RESPONSE_SIZE = REGISTRY.register(Histogram(
+    "http_response_size_bytes", "Размер тела ответа",
+    ("method", "route"), buckets=BYTES_BUCKETS
+))
+GENERATION_TIME = REGISTRY.register(Histogram(
+    "maze_generation_seconds", "Время генерации лабиринта",
+    ("algorithm", "size_bucket")
+))
+SOLVE_TIME = REGISTRY.register(Histogram(
+    "maze_solve_seconds", "Время поиска пути без построения трассы",
+    ("algorithm", "size_bucket")
+))
+NODES_EXPLORED = REGISTRY.register(Histogram(
+    "maze_solve_nodes_explored", "Число исследованных узлов",
+    ("algorithm", "size_bucket"), buckets=NODES_BUCKETS
+))
+DB_QUERY_TIME = REGISTRY.register(Histogram(
+    "db_query_duration_seconds", "Время выполнения SQL-запроса",
+    ("statement",)
+))
+CACHE_REQUESTS = REGISTRY.register(Counter(
+    "cache_requests_total", "Обращения к кешам",
+    ("cache", "result")
+))
+
+
+def _cache_hit_ratios() -> Dict[LabelValues, float]:
+    totals: Dict[str, List[float]] = {}
+    for (cache, result), value in CACHE_REQUESTS.items():
+        hits_total = totals.setdefault(cache, [0.0, 0.0])
+        if result == "hit":
+            hits_total[0] += value
+        hits_total[1] += value
+    return {(cache,): hits / total for cache, (hits, total) in totals.items() if total}
+
+
+CACHE_HIT_RATIO = REGISTRY.register(Gauge(
+    "cache_hit_ratio", "Доля попаданий в кеш с момента старта процесса",
+    ("cache",), callback=_cache_hit_ratios
+))
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    CACHE_REQUESTS.inc(cache=cache, result="hit" if hit else "miss")
+
+
+def install_query_metrics(sync_engine) -> None:
+    """Замер времени каждого SQL-запроса через события движка"""
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_started"].pop()
+        kind = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "OTHER"
+        DB_QUERY_TIME.observe(time.perf_counter() - started, statement=kind)
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _error(context):
+        if context.connection is not None:
+            started = context.connection.info.get("query_started")
+            if started:
+                started.pop()
+
+
+JOB_QUEUE_DEPTH = REGISTRY.register(Gauge(
+    "maze_jobs_active", "Фоновые задачи в очереди и в работе",
+    ("kind", "status")
+))
+JOBS_FINISHED = REGISTRY.register(Counter(
+    "maze_jobs_finished_total", "Завершенные фоновые задачи",
+    ("kind", "status")
+))
+JOB_WAIT_TIME = REGISTRY.register(Histogram(
+    "maze_job_wait_seconds", "Время ожидания задачи в очереди",
+    ("kind",)
+))
+JOB_RUN_TIME = REGISTRY.register(Histogram(
+    "maze_job_run_seconds", "Время выполнения задачи",
+    ("kind",)
+))
+LIVE_FRAMES = REGISTRY.register(Counter(
+    "maze_live_frames_total", "Тики live-решения: отправленные кадры и слитые с ожидающим",
+    ("result",)
+))
+ADMISSION_DECISIONS = REGISTRY.register(Counter(
+    "maze_admission_decisions_total", "Решения контроля допуска",
+    ("endpoint", "result")
+))
+ADMISSION_IN_FLIGHT = REGISTRY.register(Gauge(
+    "maze_admission_in_flight_cost", "Оценочная стоимость выполняемых запросов, мкс CPU"
+))
+ADMISSION_WAIT_TIME = REGISTRY.register(Histogram(
+    "maze_admission_wait_seconds", "Ожидание допуска в очереди",
+    ("endpoint",)
+))
+SOLVES_STOPPED = REGISTRY.register(Counter(
+    "maze_solves_stopped_total", "Поиски, остановленные по бюджету или разрыву соединения",
+    ("algorithm", "reason")
+))
+REPLAN_TIME = REGISTRY.register(Histogram(
+    "maze_replan_seconds", "Досчет пути LPA* после правки клеток",
+    ("size_bucket",), buckets=REPLAN_BUCKETS
+))
@@ -1,8 +1,75 @@
+import sys
 import time
-from typing import List, Tuple, Dict, Set, Optional
+from typing import Dict, Iterator, List, Optional, Set, Tuple
 from collections import deque
 import heapq
 
+from app.services.bitboard import bitboard_bfs
+
+# Размер ссылки в очереди/стеке/куче для оценки памяти фронтира
+_SLOT_BYTES = 8
+
+# Через сколько извлеченных узлов проверять время и отмену
+CHECKPOINT_INTERVAL = 256
+
+
+class SearchBudget:
+    """
+    Ограничения поиска: max_nodes - извлеченных из фронтира узлов, max_ms -
+    времени. cancel() можно вызвать из другого потока (разрыв соединения),
+    поиск остановится на ближайшей контрольной точке.
+    """
+    
+    def __init__(self, max_nodes: Optional[int] = None, max_ms: Optional[float] = None):
+        self.max_nodes = max_nodes
+        self.max_ns = int(max_ms * 1e6) if max_ms is not None else None
+        self.cancelled = False
+    
+    def cancel(self) -> None:
+        self.cancelled = True
+    
+    def exceeded(self, nodes: int, elapsed_ns: int) -> Optional[str]:
+        """Причина остановки или None"""
+        if self.cancelled:
+            return "cancelled"
+        if self.max_nodes is not None and nodes > self.max_nodes:
+            return "max_nodes"
+        if self.max_ns is not None and elapsed_ns >= self.max_ns:
+            return "max_ms"
+        return None
+
+
+class SearchState:
+    """
+    Структуры и счетчики поиска. Итератор PathFinder.search() обновляет их по
+    мере продвижения, поэтому состояние можно читать между шагами.
+    """
+    
+    def __init__(self, algorithm: str):
+        self.algorithm = algorithm
+        self.visited: Set[Tuple[int, int]] = set()
+        self.came_from: Dict[Tuple[int, int], Tuple[int, int]] = {}
+        self.frontier = None  # deque (BFS), list (DFS) или куча (f, counter, node) (A*)
+        self.tables: List[dict] = [self.came_from]
+        self.path: List[Tuple[int, int]] = []
+        self.finished = False
+        self.pushes = 0
+        self.pops = 0
+        self.peak_frontier = 0
+    
+    def frontier_nodes(self) -> List[Tuple[int, int]]:
+        if self.algorithm == "astar":
+            return [node for _, _, node in self.frontier]
+        return list(self.frontier)
+    
+    def peak_memory(self) -> int:
+        """
+        Оценка пика структур поиска. visited и таблицы (came_from, g_score...)
+        только растут, поэтому их итоговый размер и есть пиковый.
+        """
+        memory = sys.getsizeof(self.visited) + self.peak_frontier * _SLOT_BYTES
+        return memory + sum(sys.getsizeof(table) for table in self.tables)
+
 
 class PathFinder:
     """Сервис поиска пути в лабиринте"""
@@ -15,35 +82,106 @@ class PathFinder:
         self.end = end
         self.PATH = 0
         self.WALL = 1
+        self.neighbor_checks = 0
     
-    def find_path(self, algorithm: str) -> Dict:
+    def find_path(
+        self,
+        algorithm: str,
+        record_steps: bool = True,
+        budget: Optional[SearchBudget] = None
+    ) -> Dict:
         """
         Найти путь в лабиринте
         
+        Args:
+            algorithm: bfs, dfs, astar или bfs_bitboard (без трассы, см. _bfs_bitboard)
+            record_steps: записывать пошаговую трассу (O(n^2) памяти на больших сетках)
+            budget: ограничения и отмена; проверяются каждые CHECKPOINT_INTERVAL узлов
+                (max_nodes - на каждом узле)
+        
         Returns:
-            Dict с path, steps и stats
+            Dict с path, steps, stats и stopped - причиной остановки по budget
+            ("max_nodes", "max_ms", "cancelled") или None. У остановленного
+            поиска path и steps пусты, stats частичные. Помимо execution_time (полное время, с)
+            stats содержит:
+                search_time_ns   - время поиска без построения трассы
+                trace_time_ns    - время построения трассы steps
+                heap_pushes      - добавления во фронтир (куча A*, очередь BFS, стек DFS)
+                heap_pops        - извлечения из фронтира
+                neighbor_checks  - проверенные соседние клетки внутри сетки
+                peak_frontier    - максимальный размер фронтира
+                peak_memory_bytes - оценка пика структур поиска (без трассы)
         """
-        start_time = time.time()
+        if algorithm == "bfs_bitboard":
+            return self._bfs_bitboard(budget)
+        
+        start_ns = time.perf_counter_ns()
+        state, search = self.search(algorithm)
+        steps = []
+        trace_ns = 0
+        stopped = None
+        max_nodes = budget.max_nodes if budget is not None and budget.max_nodes else None
+        checkpoint = CHECKPOINT_INTERVAL
+        
+        for current in search:
+            if budget is not None and (
+                state.pops >= checkpoint or (max_nodes is not None and state.pops > max_nodes)
+            ):
+                checkpoint = state.pops + CHECKPOINT_INTERVAL
+                stopped = budget.exceeded(state.pops, time.perf_counter_ns() - start_ns)
+                if stopped is not None:
+                    search.close()
+                    break
+            
+            # Записать шаг
+            if record_steps:
+                trace_started = time.perf_counter_ns()
+                steps.append({
+                    "current": current,
+                    "visited": list(state.visited),
+                    "frontier": state.frontier_nodes()
+                })
+                trace_ns += time.perf_counter_ns() - trace_started
         
+        elapsed_ns = time.perf_counter_ns() - start_ns
+        if stopped is not None:
+            steps = []
+        
+        return {
+            "path": state.path,
+            "steps": steps,
+            "stats": self.stats(state, elapsed_ns, trace_ns),
+            "stopped": stopped
+        }
+    
+    def search(self, algorithm: str) -> Tuple[SearchState, Iterator[Tuple[int, int]]]:
+        """
+        Пошаговый поиск: итератор отдает клетку, извлеченную из фронтира, до ее
+        раскрытия. Путь появляется в state.path после исчерпания итератора.
+        """
+        state = SearchState(algorithm)
+        self.neighbor_checks = 0
         if algorithm == "bfs":
-            result = self._bfs()
+            return state, self._bfs(state)
         elif algorithm == "dfs":
-            result = self._dfs()
+            return state, self._dfs(state)
         elif algorithm == "astar":
-            result = self._astar()
+            return state, self._astar(state)
         else:
             raise ValueError(f"Неизвестный алгоритм: {algorithm}")
-        
-        execution_time = time.time() - start_time
-        
+    
+    def stats(self, state: SearchState, elapsed_ns: int, trace_ns: int = 0) -> Dict:
         return {
-            "path": result["path"],
-            "steps": result["steps"],
-            "stats": {
-                "nodes_explored": result["nodes_explored"],
-                "path_length": len(result["path"]),
-                "execution_time": execution_time
-            }
+            "nodes_explored": len(state.visited),
+            "path_length": len(state.path),
+            "execution_time": elapsed_ns / 1e9,
+            "search_time_ns": elapsed_ns - trace_ns,
+            "trace_time_ns": trace_ns,
+            "heap_pushes": state.pushes,
+            "heap_pops": state.pops,
+            "neighbor_checks": self.neighbor_checks,
+            "peak_frontier": state.peak_frontier,
+            "peak_memory_bytes": state.peak_memory()
         }
     
     def _get_neighbors(self, x: int, y: int) -> List[Tuple[int, int]]:
@@ -52,6 +190,7 @@ class PathFinder:
         for dx, dy in [(0, 1), (1, 0), (0, -1), (-1, 0)]:
             nx, ny = x + dx, y + dy
             if 0 <= nx < self.width and 0 <= ny < self.height:
+                self.neighbor_checks += 1
                 if self.grid[ny][nx] == self.PATH:
                     neighbors.append((nx, ny))
         return neighbors
@@ -65,88 +204,98 @@ class PathFinder:
         path.reverse()
         return path
     
-    def _bfs(self) -> Dict:
+    def _bfs(self, state: SearchState) -> Iterator[Tuple[int, int]]:
         """
         Breadth-First Search (поиск в ширину)
         Гарантирует кратчайший путь
         """
         queue = deque([self.start])
-        visited = {self.start}
-        came_from = {}
-        steps = []
+        visited = state.visited
+        came_from = state.came_from
+        visited.add(self.start)
+        state.frontier = queue
+        state.pushes = state.peak_frontier = 1
         
         while queue:
             current = queue.popleft()
-            
-            # Записать шаг
-            steps.append({
-                "current": current,
-                "visited": list(visited),
-                "frontier": list(queue)
-            })
+            state.pops += 1
+            yield current
             
             if current == self.end:
-                path = self._reconstruct_path(came_from, current)
-                return {
-                    "path": path,
-                    "steps": steps,
-                    "nodes_explored": len(visited)
-                }
+                state.path = self._reconstruct_path(came_from, current)
+                break
             
             for neighbor in self._get_neighbors(*current):
                 if neighbor not in visited:
                     visited.add(neighbor)
                     came_from[neighbor] = current
                     queue.append(neighbor)
+                    state.pushes += 1
+            if len(queue) > state.peak_frontier:
+                state.peak_frontier = len(queue)
         
-        # Путь не найден
+        # Путь не найден - state.path остается пустым
+        state.finished = True
+    
+    def _bfs_bitboard(self, budget: Optional[SearchBudget] = None) -> Dict:
+        """
+        Волновой BFS на битбордах (app.services.bitboard): волна раскрывается
+        сдвигами и масками по плиткам фронта, а не по клетке. Трасса steps не пишется.
+        """
+        start_ns = time.perf_counter_ns()
+        result = bitboard_bfs(self.grid, self.width, self.height, self.start, self.end, budget)
+        elapsed_ns = time.perf_counter_ns() - start_ns
         return {
-            "path": [],
-            "steps": steps,
-            "nodes_explored": len(visited)
+            "path": result["path"],
+            "steps": [],
+            "stats": {
+                "nodes_explored": result["reached"],
+                "path_length": len(result["path"]),
+                "execution_time": elapsed_ns / 1e9,
+                "search_time_ns": elapsed_ns,
+                "trace_time_ns": 0,
+                "heap_pushes": None,
+                "heap_pops": None,
+                "neighbor_checks": None,
+                "peak_frontier": result["peak_frontier"],
+                "peak_memory_bytes": result["memory_bytes"]
+            },
+            "stopped": result["stopped"]
         }
     
-    def _dfs(self) -> Dict:
+    def _dfs(self, state: SearchState) -> Iterator[Tuple[int, int]]:
         """
         Depth-First Search (поиск в глубину)
         Быстрый, но не гарантирует кратчайший путь
         """
         stack = [self.start]
-        visited = {self.start}
-        came_from = {}
-        steps = []
+        visited = state.visited
+        came_from = state.came_from
+        visited.add(self.start)
+        state.frontier = stack
+        state.pushes = state.peak_frontier = 1
         
         while stack:
             current = stack.pop()
-            
-            # Записать шаг
-            steps.append({
-                "current": current,
-                "visited": list(visited),
-                "frontier": list(stack)
-            })
+            state.pops += 1
+            yield current
             
             if current == self.end:
-                path = self._reconstruct_path(came_from, current)
-                return {
-                    "path": path,
-                    "steps": steps,
-                    "nodes_explored": len(visited)
-                }
+                state.path = self._reconstruct_path(came_from, current)
+                break
             
             for neighbor in self._get_neighbors(*current):
                 if neighbor not in visited:
                     visited.add(neighbor)
                     came_from[neighbor] = current
                     stack.append(neighbor)
+                    state.pushes += 1
+            if len(stack) > state.peak_frontier:
+                state.peak_frontier = len(stack)
         
-        return {
-            "path": [],
-            "steps": steps,
-            "nodes_explored": len(visited)
-        }
+        state.finished = True
     
-    def _astar(self) -> Dict:
+    def _astar(self, state: SearchState) -> Iterator[Tuple[int, int]]:
         """
         A* алгоритм с Manhattan distance эвристикой
         Оптимальный и эффективный
@@ -158,7 +307,7 @@ class PathFinder:
         # Приоритетная очередь: (f_score, counter, node)
         counter = 0
         open_set = [(0, counter, self.start)]
-        came_from = {}
+        came_from = state.came_from
         
         # g_score: стоимость пути от start до узла
         g_score = {self.start: 0}
@@ -166,32 +315,24 @@ class PathFinder:
         # f_score: g_score + heuristic
         f_score = {self.start: heuristic(self.start, self.end)}
         
-        visited = set()
-        steps = []
+        visited = state.visited
+        state.frontier = open_set
+        state.tables.extend((g_score, f_score))
+        state.pushes = state.peak_frontier = 1
         
         while open_set:
             _, _, current = heapq.heappop(open_set)
+            state.pops += 1
             
             if current in visited:
                 continue
             
             visited.add(current)
-            
-            # Записать шаг
-            frontier = [node for _, _, node in open_set]
-            steps.append({
-                "current": current,
-                "visited": list(visited),
-                "frontier": frontier
-            })
+            yield current
             
             if current == self.end:
-                path = self._reconstruct_path(came_from, current)
-                return {
-                    "path": path,
-                    "steps": steps,
-                    "nodes_explored": len(visited)
-                }
+                state.path = self._reconstruct_path(came_from, current)
+                break
             
             for neighbor in self._get_neighbors(*current):
                 tentative_g_score = g_score[current] + 1
@@ -204,9 +345,8 @@ class PathFinder:
                     if neighbor not in visited:
                         counter += 1
                         heapq.heappush(open_set, (f_score[neighbor], counter, neighbor))
+                        state.pushes += 1
+            if len(open_set) > state.peak_frontier:
+                state.peak_frontier = len(open_set)
         
-        return {
-            "path": [],
-            "steps": steps,
-            "nodes_explored": len(visited)
-        }
\ No newline at end of file
+        state.finished = True
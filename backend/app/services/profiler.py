@@ -0,0 +1,126 @@
+"""
+Профилирование отдельных запросов через cProfile.
+
+Запрос профилируется, если:
+  - пришел заголовок PROFILE_HEADER и PROFILE_HEADER_ENABLED=True (отладка), или
+  - он попал в выборку PROFILE_SAMPLE_RATE (доля трафика, 0 - выключено).
+
+cProfile видит весь поток event loop, поэтому в профиль попадают и другие
+запросы, выполнявшиеся параллельно. Работа, вынесенная в пул потоков
+(run_in_threadpool), профилируется отдельным cProfile в потоке через
+profiled() и сливается с профилем запроса. Одновременно активен только один
+профиль, остальные запросы в это время не профилируются. В PROFILE_DIR
+хранятся последние PROFILE_MAX_FILES профилей.
+"""
+import asyncio
+import cProfile
+import io
+import os
+import pstats
+import random
+import re
+import uuid
+from contextvars import ContextVar
+from threading import Lock
+from typing import Callable, List, Optional
+
+from app.config import get_settings
+
+_active = Lock()
+# Профиль запроса, который обрабатывается в текущем контексте
+_current: ContextVar[Optional["RequestProfiler"]] = ContextVar("request_profiler", default=None)
+_PROFILE_ID = re.compile(r"^[0-9a-f]{32}$")
+
+
+def wants_profile(header_value: Optional[str]) -> bool:
+    settings = get_settings()
+    if header_value and settings.PROFILE_HEADER_ENABLED:
+        return True
+    rate = settings.PROFILE_SAMPLE_RATE
+    return rate > 0 and random.random() < rate
+
+
+class RequestProfiler:
+
+    def __init__(self):
+        self.profile: Optional[cProfile.Profile] = None
+        self.profile_id: Optional[str] = None
+        self.threads: List[cProfile.Profile] = []
+
+    def start(self) -> bool:
+        if not _active.acquire(blocking=False):
+            return False
+        self.profile = cProfile.Profile()
+        self.profile.enable()
+        _current.set(self)
+        return True
+
+    async def stop(self) -> Optional[str]:
+        """Остановить профиль, записать .prof в потоке (не в event loop) и вернуть его ID"""
+        profile, self.profile = self.profile, None
+        if profile is None:
+            return None
+        # profile сброшен до записи: повторный stop() после ошибки диска не освободит _active дважды
+        try:
+            profile.disable()
+        finally:
+            _active.release()
+
+        profile_id = uuid.uuid4().hex
+        await asyncio.to_thread(_dump, [profile, *self.threads], profile_id)
+        self.profile_id = profile_id
+        return profile_id
+
+
+def _dump(profiles: List[cProfile.Profile], profile_id: str) -> None:
+    """Записать слитый профиль и удалить самые старые сверх PROFILE_MAX_FILES"""
+    settings = get_settings()
+    directory = settings.PROFILE_DIR
+    os.makedirs(directory, exist_ok=True)
+    stats = pstats.Stats(profiles[0])
+    for profile in profiles[1:]:
+        stats.add(profile)
+    stats.dump_stats(os.path.join(directory, f"{profile_id}.prof"))
+
+    saved = [entry for entry in os.scandir(directory) if entry.name.endswith(".prof")]
+    if len(saved) <= settings.PROFILE_MAX_FILES:
+        return
+    saved.sort(key=lambda entry: entry.stat().st_mtime_ns)
+    for entry in saved[:len(saved) - settings.PROFILE_MAX_FILES]:
+        try:
+            os.remove(entry.path)
+        except FileNotFoundError:
+            pass
+
+
+def profiled(func: Callable) -> Callable:
+    """
+    func для run_in_threadpool: если текущий запрос профилируется, вызов в потоке
+    пула пишется в свой cProfile и добавляется к профилю запроса
+    """
+    profiler = _current.get()
+    if profiler is None or profiler.profile is None:
+        return func
+
+    def run(*args, **kwargs):
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profile.disable()
+            profiler.threads.append(profile)
+
+    return run
+
+
+def profile_summary(profile_id: str, limit: int = 40) -> Optional[str]:
+    """Текстовый отчет pstats по сохраненному профилю (сортировка по cumulative)"""
+    if not _PROFILE_ID.match(profile_id):
+        return None
+    path = os.path.join(get_settings().PROFILE_DIR, f"{profile_id}.prof")
+    if not os.path.exists(path):
+        return None
+    out = io.StringIO()
+    pstats.Stats(path, stream=out).sort_stats("cumulative").print_stats(limit)
+    return out.getvalue()
@@ -0,0 +1,262 @@
+"""
+Инкрементальный поиск пути (LPA*) для редактируемых лабиринтов.
+
+Планировщик хранит для клеток расстояние от старта g, его оценку по соседям
+rhs и очередь несогласованных клеток (g != rhs). После переключения стен
+пересчитываются только клетки, чьи расстояния действительно изменились:
+правка одной клетки обходится в единицы-сотни раскрытий вместо полного поиска.
+Согласованные g - это поле расстояний от старта, путь восстанавливается по
+нему от выхода к старту.
+
+Состояние живет в памяти процесса (ReplannerCache) и привязано к ревизии
+лабиринта: если лабиринт изменил другой процесс, планировщик строится заново.
+"""
+import asyncio
+import heapq
+import time
+import weakref
+from collections import OrderedDict
+from itertools import chain
+from threading import Lock
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from app.config import get_settings
+from app.services.metrics import record_cache
+
+INF = float("inf")
+
+
+class IncrementalPlanner:
+    """LPA* на 4-связной сетке с единичной стоимостью шага"""
+
+    def __init__(self, grid, width: int, height: int, start: Tuple[int, int], end: Tuple[int, int]):
+        self.width = width
+        self.height = height
+        if hasattr(grid, "packed"):
+            self.walls = bytearray(grid.is_wall(x, y) for y in range(height) for x in range(width))
+        else:
+            self.walls = bytearray(chain.from_iterable(grid))
+        self.start = start[1] * width + start[0]
+        self.goal = end[1] * width + end[0]
+        self._goal_x, self._goal_y = end
+
+        cells = width * height
+        self.g = [INF] * cells
+        self.rhs = [INF] * cells
+        self._queue: List[Tuple[float, float, int]] = []
+        self._queued: Dict[int, Tuple[float, float]] = {}
+        self.rhs[self.start] = 0
+        self._push(self.start)
+        self.expanded = 0
+        self.compute()
+
+    def _neighbors(self, cell: int) -> List[int]:
+        width = self.width
+        x = cell % width
+        result = []
+        if x > 0:
+            result.append(cell - 1)
+        if x < width - 1:
+            result.append(cell + 1)
+        if cell >= width:
+            result.append(cell - width)
+        if cell + width < len(self.walls):
+            result.append(cell + width)
+        return result
+
+    def _key(self, cell: int) -> Tuple[float, float]:
+        best = min(self.g[cell], self.rhs[cell])
+        y, x = divmod(cell, self.width)
+        return best + abs(x - self._goal_x) + abs(y - self._goal_y), best
+
+    def _push(self, cell: int) -> None:
+        key = self._key(cell)
+        self._queued[cell] = key
+        heapq.heappush(self._queue, (key[0], key[1], cell))
+
+    def _top(self) -> Optional[Tuple[float, float, int]]:
+        """Верх очереди; устаревшие записи (ленивое удаление) выбрасываются"""
+        queue = self._queue
+        while queue:
+            k1, k2, cell = queue[0]
+            if self._queued.get(cell) == (k1, k2):
+                return queue[0]
+            heapq.heappop(queue)
+        return None
+
+    def _update(self, cell: int) -> None:
+        g, walls = self.g, self.walls
+        if cell != self.start:
+            if walls[cell]:
+                self.rhs[cell] = INF
+            else:
+                best = INF
+                for n in self._neighbors(cell):
+                    if not walls[n] and g[n] < best:
+                        best = g[n]
+                self.rhs[cell] = best + 1
+        self._queued.pop(cell, None)
+        if g[cell] != self.rhs[cell]:
+            self._push(cell)
+
+    def compute(self) -> int:
+        """Довести очередь до согласованности пути к выходу, вернуть число раскрытий"""
+        g, rhs, goal = self.g, self.rhs, self.goal
+        expanded = 0
+        while True:
+            top = self._top()
+            if top is None:
+                break
+            if top[:2] >= self._key(goal) and rhs[goal] == g[goal]:
+                break
+            heapq.heappop(self._queue)
+            cell = top[2]
+            del self._queued[cell]
+            expanded += 1
+            if g[cell] > rhs[cell]:
+                g[cell] = rhs[cell]
+                for n in self._neighbors(cell):
+                    self._update(n)
+            else:
+                g[cell] = INF
+                self._update(cell)
+                for n in self._neighbors(cell):
+                    self._update(n)
+        self.expanded += expanded
+        return expanded
+
+    def set_walls(self, cells: Iterable[Tuple[int, int, Optional[bool]]]) -> int:
+        """
+        Применить правки (x, y, wall); wall=None переключает клетку.
+        Возвращает число клеток, которые действительно изменились.
+        """
+        changed = 0
+        for x, y, wall in cells:
+            cell = y * self.width + x
+            value = (not self.walls[cell]) if wall is None else bool(wall)
+            if self.walls[cell] == value:
+                continue
+            self.walls[cell] = value
+            changed += 1
+            self._update(cell)
+            for n in self._neighbors(cell):
+                self._update(n)
+        return changed
+
+    def distance(self, x: int, y: int) -> Optional[int]:
+        """Расстояние от старта, если клетка согласована и достижима"""
+        cell = y * self.width + x
+        g = self.g[cell]
+        return int(g) if g != INF and g == self.rhs[cell] else None
+
+    def path(self) -> List[Tuple[int, int]]:
+        """Кратчайший путь: от выхода к соседу с минимальным g до старта"""
+        g, walls, width = self.g, self.walls, self.width
+        if g[self.goal] == INF:
+            return []
+        cell = self.goal
+        cells = [cell]
+        for _ in range(len(walls)):
+            if cell == self.start:
+                break
+            cell = min(
+                (n for n in self._neighbors(cell) if not walls[n]),
+                key=g.__getitem__
+            )
+            cells.append(cell)
+        return [(cell % width, cell // width) for cell in reversed(cells)]
+
+    def apply(self, cells: Iterable[Tuple[int, int, Optional[bool]]]) -> Dict:
+        """Правки + досчет LPA*: {"changed", "path", "stats"} в формате PathFinder"""
+        started = time.perf_counter_ns()
+        changed = self.set_walls(cells)
+        expanded = self.compute() if changed else 0
+        path = self.path()
+        elapsed_ns = time.perf_counter_ns() - started
+        return {
+            "changed": changed,
+            "path": path,
+            "stats": {
+                "nodes_explored": expanded,
+                "path_length": len(path),
+                "execution_time": elapsed_ns / 1e9,
+                "search_time_ns": elapsed_ns,
+                "heap_pushes": None,
+                "heap_pops": None,
+                "neighbor_checks": None,
+                "peak_frontier": None,
+                "peak_memory_bytes": None,
+            },
+        }
+
+    def rows(self) -> List[List[int]]:
+        width = self.width
+        return [list(self.walls[y * width:(y + 1) * width]) for y in range(self.height)]
+
+    @property
+    def cells(self) -> int:
+        return len(self.walls)
+
+
+class ReplannerCache:
+    """
+    LRU планировщиков процесса с ограничением по числу клеток (g и rhs
+    занимают ~16 байт на клетку). Запись действительна для одной ревизии.
+    """
+
+    def __init__(self, max_cells: int):
+        self.max_cells = max_cells
+        self.size = 0
+        self._entries: "OrderedDict[int, Tuple[int, IncrementalPlanner]]" = OrderedDict()
+        self._lock = Lock()
+        self._maze_locks: "weakref.WeakValueDictionary[int, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+    def lock(self, maze_id: int) -> asyncio.Lock:
+        """Правки одного лабиринта в процессе выполняются по очереди"""
+        lock = self._maze_locks.get(maze_id)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._maze_locks[maze_id] = lock
+        return lock
+
+    def get(self, maze_id: int, revision: int) -> Optional[IncrementalPlanner]:
+        with self._lock:
+            entry = self._entries.get(maze_id)
+            planner = entry[1] if entry is not None and entry[0] == revision else None
+            if planner is not None:
+                self._entries.move_to_end(maze_id)
+        record_cache("replanner", planner is not None)
+        return planner
+
+    def put(self, maze_id: int, revision: int, planner: IncrementalPlanner) -> None:
+        if planner.cells > self.max_cells:
+            self.discard(maze_id)
+            return
+        with self._lock:
+            previous = self._entries.pop(maze_id, None)
+            if previous is not None:
+                self.size -= previous[1].cells
+            self._entries[maze_id] = (revision, planner)
+            self.size += planner.cells
+            while self.size > self.max_cells:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.size -= evicted.cells
+
+    def discard(self, maze_id: int) -> None:
+        with self._lock:
+            entry = self._entries.pop(maze_id, None)
+            if entry is not None:
+                self.size -= entry[1].cells
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+_cache: Optional[ReplannerCache] = None
+
+
+def get_replanner_cache() -> ReplannerCache:
+    global _cache
+    if _cache is None:
+        _cache = ReplannerCache(get_settings().REPLAN_CACHE_MAX_CELLS)
+    return _cache
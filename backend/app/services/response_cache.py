@@ -0,0 +1,66 @@
+"""
+Кеш сериализованных тел ответов процесса (LRU с ограничением по байтам).
+
+Ключ - ETag ресурса, поэтому устаревшие записи не нужно инвалидировать:
+новое содержимое получает новый ETag. Удаленный лабиринт не отдается из кеша,
+потому что маршрут сначала проверяет существование строки.
+"""
+from collections import OrderedDict
+from threading import Lock
+from typing import Optional
+
+from app.config import get_settings
+from app.services.metrics import record_cache
+
+
+class ResponseCache:
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            body = self._entries.get(key)
+            if body is not None:
+                self._entries.move_to_end(key)
+        record_cache("response", body is not None)
+        return body
+
+    def put(self, key: str, body: bytes) -> None:
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size -= len(previous)
+            self._entries[key] = body
+            self.size += len(body)
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    def discard(self, key: str) -> None:
+        with self._lock:
+            body = self._entries.pop(key, None)
+            if body is not None:
+                self.size -= len(body)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+_cache: Optional[ResponseCache] = None
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """Общий кеш процесса или None, если RESPONSE_CACHE_MAX_BYTES=0"""
+    global _cache
+    max_bytes = get_settings().RESPONSE_CACHE_MAX_BYTES
+    if max_bytes <= 0:
+        return None
+    if _cache is None:
+        _cache = ResponseCache(max_bytes)
+    return _cache
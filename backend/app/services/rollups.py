@@ -0,0 +1,210 @@
+"""
+Накопительные агрегаты решений по (algorithm, generator, size_bucket).
+
+Каждое сохраненное решение в той же транзакции добавляется в две таблицы:
+    solution_rollups        - count, сумма, минимум и максимум nodes_explored,
+                              path_length и execution_time;
+    solution_rollup_buckets - логарифмический скетч (как DDSketch) каждой
+                              метрики: бакет i хранит число значений из
+                              (gamma^(i-1), gamma^i], оценка перцентиля
+                              отличается от точной не больше чем на
+                              SKETCH_ACCURACY относительно.
+Обе обновляются через UPSERT (count = count + excluded.count), поэтому
+параллельные запросы и процессы не теряют обновлений, а отчет
+GET /api/stats/algorithms читает только строки нужных ключей.
+
+Агрегаты накопительные: удаление лабиринта не вычитает его решения. Решения,
+сохраненные до появления таблиц, переносятся пересборкой:
+
+    python -m app.services.rollups --rebuild
+"""
+import argparse
+import asyncio
+import math
+import sys
+from collections import defaultdict
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+from sqlalchemy import case, delete, select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.models.maze import Maze, Solution, SolutionRollup, SolutionRollupBucket
+from app.services.metrics import size_bucket
+
+ROLLUP_METRICS = ("nodes_explored", "path_length", "execution_time")
+SKETCH_ACCURACY = 0.01
+QUANTILES = (0.5, 0.9, 0.99)
+
+_GAMMA = (1 + SKETCH_ACCURACY) / (1 - SKETCH_ACCURACY)
+_LOG_GAMMA = math.log(_GAMMA)
+# Значения не больше MIN_VALUE (нулевой путь, 0 узлов) попадают в отдельный бакет
+MIN_VALUE = 1e-9
+ZERO_BUCKET = -(1 << 20)
+
+RollupKey = Tuple[str, str, str]
+
+
+def sketch_bucket(value: float) -> int:
+    if value <= MIN_VALUE:
+        return ZERO_BUCKET
+    return math.ceil(math.log(value) / _LOG_GAMMA)
+
+
+def bucket_value(index: int) -> float:
+    """Середина бакета с относительной ошибкой не больше SKETCH_ACCURACY"""
+    if index == ZERO_BUCKET:
+        return 0.0
+    return 2 * _GAMMA ** index / (_GAMMA + 1)
+
+
+def sketch_quantiles(buckets: Iterable[Tuple[int, int]], quantiles: Sequence[float] = QUANTILES) -> Dict[float, float]:
+    """{q: оценка} по парам (бакет, число значений)"""
+    ordered = sorted(buckets)
+    total = sum(count for _, count in ordered)
+    result = {}
+    if not total:
+        return {q: None for q in quantiles}
+    for q in quantiles:
+        rank = q * (total - 1)
+        seen = 0
+        for index, count in ordered:
+            seen += count
+            if seen > rank:
+                result[q] = bucket_value(index)
+                break
+    return result
+
+
+def aggregate(rows: Iterable[Tuple]) -> Tuple[Dict[RollupKey, Dict], Dict[Tuple, int]]:
+    """
+    rows - (algorithm, generator, width, height, nodes_explored, path_length,
+    execution_time). Возвращает строки solution_rollups и счетчики бакетов.
+    """
+    rollups: Dict[RollupKey, Dict] = {}
+    buckets: Dict[Tuple, int] = defaultdict(int)
+    for algorithm, generator, width, height, *values in rows:
+        key = (algorithm, generator, size_bucket(width, height))
+        rollup = rollups.get(key)
+        if rollup is None:
+            rollup = rollups[key] = {"count": 0}
+            for metric, value in zip(ROLLUP_METRICS, values):
+                rollup.update({f"{metric}_sum": 0, f"{metric}_min": value, f"{metric}_max": value})
+        rollup["count"] += 1
+        for metric, value in zip(ROLLUP_METRICS, values):
+            rollup[f"{metric}_sum"] += value
+            rollup[f"{metric}_min"] = min(rollup[f"{metric}_min"], value)
+            rollup[f"{metric}_max"] = max(rollup[f"{metric}_max"], value)
+            buckets[key + (metric, sketch_bucket(value))] += 1
+    return rollups, buckets
+
+
+async def write_rollups(db: AsyncSession, rollups: Dict[RollupKey, Dict], buckets: Dict[Tuple, int]) -> None:
+    """Прибавить агрегаты к таблицам (без commit)"""
+    if not rollups:
+        return
+    table = SolutionRollup
+    for (algorithm, generator, bucket), values in rollups.items():
+        stmt = insert(table).values(
+            algorithm=algorithm, generator=generator, size_bucket=bucket, **values
+        )
+        excluded = stmt.excluded
+        updates = {"count": table.count + excluded.count}
+        for metric in ROLLUP_METRICS:
+            total, low, high = f"{metric}_sum", f"{metric}_min", f"{metric}_max"
+            updates[total] = getattr(table, total) + getattr(excluded, total)
+            updates[low] = case(
+                (getattr(excluded, low) < getattr(table, low), getattr(excluded, low)),
+                else_=getattr(table, low)
+            )
+            updates[high] = case(
+                (getattr(excluded, high) > getattr(table, high), getattr(excluded, high)),
+                else_=getattr(table, high)
+            )
+        await db.execute(stmt.on_conflict_do_update(
+            index_elements=["algorithm", "generator", "size_bucket"], set_=updates
+        ))
+
+    stmt = insert(SolutionRollupBucket)
+    await db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=["algorithm", "generator", "size_bucket", "metric", "bucket"],
+            set_={"count": SolutionRollupBucket.count + stmt.excluded.count}
+        ),
+        [
+            {
+                "algorithm": algorithm, "generator": generator, "size_bucket": bucket,
+                "metric": metric, "bucket": index, "count": count
+            }
+            for (algorithm, generator, bucket, metric, index), count in buckets.items()
+        ]
+    )
+
+
+async def apply_rollups(db: AsyncSession, solutions: List[Solution]) -> None:
+    """Учесть новые решения в агрегатах в текущей транзакции"""
+    maze_ids = {solution.maze_id for solution in solutions}
+    result = await db.execute(
+        select(Maze.id, Maze.algorithm, Maze.width, Maze.height).where(Maze.id.in_(maze_ids))
+    )
+    mazes = {row.id: row for row in result.all()}
+    rows = [
+        (
+            solution.algorithm, maze.algorithm, maze.width, maze.height,
+            solution.nodes_explored, solution.path_length, solution.execution_time
+        )
+        for solution in solutions
+        if (maze := mazes.get(solution.maze_id)) is not None
+    ]
+    await write_rollups(db, *aggregate(rows))
+
+
+async def rebuild_rollups(session_factory: async_sessionmaker, batch_size: int = 5000) -> int:
+    """Пересобрать агрегаты по всей таблице solutions, вернуть число решений"""
+    query = (
+        select(
+            Solution.id, Solution.algorithm, Maze.algorithm, Maze.width, Maze.height,
+            Solution.nodes_explored, Solution.path_length, Solution.execution_time
+        )
+        .join(Maze, Maze.id == Solution.maze_id)
+        .order_by(Solution.id)
+        .limit(batch_size)
+    )
+    async with session_factory() as db:
+        async with db.begin():
+            await db.execute(delete(SolutionRollupBucket))
+            await db.execute(delete(SolutionRollup))
+            processed = 0
+            after_id = 0
+            while True:
+                rows = (await db.execute(query.where(Solution.id > after_id))).all()
+                if not rows:
+                    return processed
+                after_id = rows[-1][0]
+                await write_rollups(db, *aggregate(row[1:] for row in rows))
+                processed += len(rows)
+
+
+async def main_async(args) -> int:
+    from app.database import AsyncSessionLocal, async_engine, init_db
+
+    await init_db()
+    try:
+        return await rebuild_rollups(AsyncSessionLocal, args.batch_size)
+    finally:
+        await async_engine.dispose()
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Агрегаты решений по алгоритмам")
+    parser.add_argument("--rebuild", action="store_true", required=True, help="Пересобрать по таблице solutions")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    args = parser.parse_args(argv)
+
+    processed = asyncio.run(main_async(args))
+    print(f"Учтено решений: {processed}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
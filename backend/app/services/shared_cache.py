@@ -0,0 +1,362 @@
+"""
+Общий для процессов uvicorn кеш декодированных сеток в multiprocessing.shared_memory.
+
+Сетка (maze_id, revision, tag) публикуется один раз отдельным сегментом
+{name}_{seq}:
+    битовая плоскость  ceil(width * height / 8) байт, формат grid_codec.pack_grid
+                       (ее читают bfs_bitboard, analytics и replanner);
+    индекс решателя    width * height байт, клетка y * width + x, 1 - стена
+                       (строки отдаются срезами memoryview, grid[y][x] без
+                       битовых операций).
+Остальные процессы подключают сегмент по имени и читают его через memoryview
+только для чтения. tag - crc32 источника сетки (JSON-текста или имени файла
+GridStore): ID лабиринтов повторяются после пересоздания БД, а сегменты
+переживают перезапуск сервера.
+
+Индекс - сегмент {name}_index, структурный массив NumPy на slots записей:
+maze_id, revision, tag, размеры, refs (число процессов, подключивших сегмент),
+seq (0 - слот свободен), size и last_used (CLOCK_MONOTONIC, общий для
+процессов хоста). Изменения индекса идут под flock файла блокировки, поиск и
+вытеснение векторные. Вытесняется давно не использованная запись, в первую
+очередь без подключений; unlink подключенного сегмента безопасен - память
+освобождается с последним отображением. Последний закрывший кеш процесс
+удаляет все сегменты.
+"""
+import fcntl
+import os
+import tempfile
+import time
+import zlib
+from collections import OrderedDict
+from contextlib import contextmanager
+from multiprocessing import resource_tracker, shared_memory
+from threading import Lock
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from app.config import get_settings
+from app.services.grid_store import PackedGrid
+from app.services.metrics import record_cache
+
+MAGIC = b"MZSC"
+FORMAT_VERSION = 1
+HEADER = np.dtype([
+    ("magic", "S4"),
+    ("version", "<u2"),
+    ("users", "<u2"),  # процессы, открывшие кеш
+    ("slots", "<u4"),
+    ("next_seq", "<u8"),
+])
+HEADER_SIZE = 32
+SLOT = np.dtype([
+    ("maze_id", "<i8"),
+    ("revision", "<i8"),
+    ("tag", "<u4"),
+    ("width", "<u4"),
+    ("height", "<u4"),
+    ("refs", "<i4"),
+    ("seq", "<u8"),
+    ("size", "<u8"),
+    ("last_used", "<u8"),
+])
+
+GridKey = Tuple[int, int, int]
+
+
+def grid_tag(source: str) -> int:
+    """tag записи: crc32 JSON-текста сетки или имени файла GridStore"""
+    return zlib.crc32(source.encode())
+
+
+def entry_size(width: int, height: int) -> int:
+    return (width * height + 7) // 8 + width * height
+
+
+class _Segment(shared_memory.SharedMemory):
+    """
+    Сегмент без закрытия при сборке мусора: отображение живет, пока на него
+    ссылаются memoryview сеток, и освобождается вместе с последним из них.
+    """
+
+    def __init__(self, name: str, create: bool = False, size: int = 0):
+        super().__init__(name=name, create=create, size=size)
+        # mmap не нужен дескриптор
+        os.close(self._fd)
+        self._fd = -1
+
+    def __del__(self):
+        pass
+
+
+def _attach(name: str, create: bool = False, size: int = 0) -> _Segment:
+    segment = _Segment(name, create, size)
+    # Иначе resource_tracker удалит сегмент при выходе процесса
+    resource_tracker.unregister(segment._name, "shared_memory")
+    return segment
+
+
+def _unlink(name: str) -> None:
+    try:
+        # unlink снимает регистрацию, сделанную при подключении
+        _Segment(name).unlink()
+    except FileNotFoundError:
+        pass
+
+
+class SharedGrid(PackedGrid):
+    """Сетка из сегмента кеша; строки - срезы индекса решателя"""
+
+    def __init__(self, segment: _Segment, width: int, height: int):
+        view = segment.buf.toreadonly()
+        super().__init__(view, width, height)
+        cells = view[len(self.packed):len(self.packed) + width * height]
+        self.rows = [cells[y * width:(y + 1) * width] for y in range(height)]
+        self.segment = segment.name
+
+    def is_wall(self, x: int, y: int) -> int:
+        return self.rows[y][x]
+
+    def __getitem__(self, y: int) -> memoryview:
+        if not 0 <= y < self.height:
+            raise IndexError(y)
+        return self.rows[y]
+
+    def __iter__(self) -> Iterator[memoryview]:
+        return iter(self.rows)
+
+    def tile(self, x: int, y: int, width: int, height: int) -> List[List[int]]:
+        return [row[x:x + width].tolist() for row in self.rows[y:y + height]]
+
+    def close(self) -> None:
+        """Сегмент освобождает кеш"""
+
+
+class SharedGridCache:
+    """
+    Кеш сеток одного хоста. Процесс держит подключенные сегменты в словаре
+    key -> (slot, seq, SharedGrid); запись действительна, пока slot индекса
+    хранит тот же seq.
+    """
+
+    def __init__(self, name: str, max_bytes: int, slots: int = 256):
+        self.name = name
+        self.max_bytes = max_bytes
+        self._attached: "OrderedDict[GridKey, Tuple[int, int, SharedGrid]]" = OrderedDict()
+        self._lock = Lock()
+        self._lock_file = os.open(
+            os.path.join(tempfile.gettempdir(), f"{name}.lock"), os.O_RDWR | os.O_CREAT, 0o600
+        )
+        with self._locked():
+            try:
+                self._index = _attach(f"{name}_index")
+                created = False
+            except FileNotFoundError:
+                self._index = _attach(
+                    f"{name}_index", create=True, size=HEADER_SIZE + slots * SLOT.itemsize
+                )
+                created = True
+            self._header = np.ndarray((), HEADER, buffer=self._index.buf)
+            if created:
+                self._header["magic"] = MAGIC
+                self._header["version"] = FORMAT_VERSION
+                self._header["slots"] = slots
+                self._header["next_seq"] = 1
+            elif self._header["magic"] != MAGIC or self._header["version"] != FORMAT_VERSION:
+                raise ValueError(f"Неподдерживаемый индекс кеша сеток: {name}")
+            self._slots = np.ndarray(
+                int(self._header["slots"]), SLOT, buffer=self._index.buf, offset=HEADER_SIZE
+            )
+            self._header["users"] += 1
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        """Блокировка индекса между потоками и процессами"""
+        with self._lock:
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    def get(self, maze_id: int, revision: int, tag: int) -> Optional[SharedGrid]:
+        key = (maze_id, revision, tag)
+        with self._lock:
+            entry = self._attached.get(key)
+            if entry is not None:
+                slot, seq, grid = entry
+                if self._slots["seq"][slot] == seq:
+                    # Без flock: гонка портит только порядок вытеснения
+                    self._slots["last_used"][slot] = time.monotonic_ns()
+                    self._attached.move_to_end(key)
+                    record_cache("shared_grid", True)
+                    return grid
+
+        with self._locked():
+            self._sweep()
+            grid = self._attach_entry(key)
+        record_cache("shared_grid", grid is not None)
+        return grid
+
+    def put(
+        self,
+        maze_id: int,
+        revision: int,
+        tag: int,
+        packed: bytes,
+        width: int,
+        height: int
+    ) -> Optional[SharedGrid]:
+        """Опубликовать сетку; None - сетка больше max_bytes"""
+        size = entry_size(width, height)
+        if size > self.max_bytes:
+            return None
+        key = (maze_id, revision, tag)
+        nbytes = (width * height + 7) // 8
+        bits = np.unpackbits(np.frombuffer(packed, dtype=np.uint8, count=nbytes), bitorder="little")
+
+        with self._locked():
+            seq = int(self._header["next_seq"])
+            self._header["next_seq"] = seq + 1
+        # Сегмент заполняется вне блокировки: имя с новым seq еще никому не известно
+        segment = _attach(f"{self.name}_{seq}", create=True, size=max(size, 1))
+        segment.buf[:nbytes] = packed[:nbytes]
+        np.ndarray(width * height, np.uint8, buffer=segment.buf, offset=nbytes)[:] = bits[:width * height]
+
+        with self._locked():
+            self._sweep()
+            grid = self._attach_entry(key)
+            if grid is not None:
+                # Другой процесс успел опубликовать ту же сетку
+                _unlink(segment.name)
+                return grid
+            slot = self._reserve(size)
+            self._slots[slot] = (
+                maze_id, revision, tag, width, height, 1, seq, size, time.monotonic_ns()
+            )
+            grid = SharedGrid(segment, width, height)
+            self._attached[key] = (slot, seq, grid)
+        return grid
+
+    def load(
+        self,
+        maze_id: int,
+        revision: int,
+        tag: int,
+        width: int,
+        height: int,
+        packed: Callable[[], bytes]
+    ) -> Optional[SharedGrid]:
+        """get, при промахе - put битовой плоскости packed()"""
+        if entry_size(width, height) > self.max_bytes:
+            return None
+        grid = self.get(maze_id, revision, tag)
+        if grid is None:
+            grid = self.put(maze_id, revision, tag, packed(), width, height)
+        return grid
+
+    def _attach_entry(self, key: GridKey) -> Optional[SharedGrid]:
+        """Подключить сегмент записи key из индекса (под блокировкой)"""
+        slots = self._slots
+        found = np.flatnonzero(
+            (slots["seq"] != 0)
+            & (slots["maze_id"] == key[0])
+            & (slots["revision"] == key[1])
+            & (slots["tag"] == key[2])
+        )
+        if not found.size:
+            return None
+        slot = int(found[0])
+        seq = int(slots["seq"][slot])
+        local = self._attached.get(key)
+        if local is not None and local[1] == seq:
+            grid = local[2]
+        else:
+            try:
+                segment = _attach(f"{self.name}_{seq}")
+            except FileNotFoundError:
+                slots["seq"][slot] = 0
+                return None
+            grid = SharedGrid(segment, int(slots["width"][slot]), int(slots["height"][slot]))
+            slots["refs"][slot] += 1
+        slots["last_used"][slot] = time.monotonic_ns()
+        self._attached[key] = (slot, seq, grid)
+        self._attached.move_to_end(key)
+        return grid
+
+    def _reserve(self, size: int) -> int:
+        """Свободный слот под запись size байт, при нехватке - вытеснение LRU"""
+        slots = self._slots
+        while True:
+            used = slots["seq"] != 0
+            free = np.flatnonzero(~used)
+            if free.size and int(slots["size"][used].sum()) + size <= self.max_bytes:
+                return int(free[0])
+            idle = used & (slots["refs"] <= 0)
+            candidates = np.flatnonzero(idle if idle.any() else used)
+            victim = int(candidates[np.argmin(slots["last_used"][candidates])])
+            self._evict(victim)
+
+    def _evict(self, slot: int) -> None:
+        seq = int(self._slots["seq"][slot])
+        self._slots["seq"][slot] = 0
+        _unlink(f"{self.name}_{seq}")
+
+    def _sweep(self) -> None:
+        """Отключить сегменты, вытесненные другими процессами"""
+        stale = [
+            key for key, (slot, seq, _) in self._attached.items()
+            if self._slots["seq"][slot] != seq
+        ]
+        for key in stale:
+            del self._attached[key]
+
+    def stats(self) -> Dict[str, int]:
+        with self._locked():
+            self._sweep()
+            used = self._slots["seq"] != 0
+            return {
+                "entries": int(used.sum()),
+                "bytes": int(self._slots["size"][used].sum()),
+                "attached": len(self._attached),
+                "users": int(self._header["users"]),
+            }
+
+    def close(self) -> None:
+        """Отключиться; последний процесс удаляет сегменты и индекс"""
+        with self._locked():
+            self._sweep()
+            for slot, seq, _ in self._attached.values():
+                self._slots["refs"][slot] -= 1
+            self._attached.clear()
+            self._header["users"] -= 1
+            if self._header["users"] <= 0:
+                for slot in np.flatnonzero(self._slots["seq"] != 0):
+                    self._evict(int(slot))
+                _unlink(f"{self.name}_index")
+        os.close(self._lock_file)
+
+
+_cache: Optional[SharedGridCache] = None
+
+
+def get_shared_grid_cache() -> Optional[SharedGridCache]:
+    """Кеш процесса или None, если SHARED_GRID_CACHE_MAX_BYTES=0"""
+    global _cache
+    settings = get_settings()
+    if settings.SHARED_GRID_CACHE_MAX_BYTES <= 0:
+        return None
+    if _cache is None:
+        _cache = SharedGridCache(
+            settings.SHARED_GRID_CACHE_NAME,
+            settings.SHARED_GRID_CACHE_MAX_BYTES,
+            settings.SHARED_GRID_CACHE_SLOTS
+        )
+    return _cache
+
+
+def close_shared_grid_cache() -> None:
+    global _cache
+    if _cache is not None:
+        _cache.close()
+        _cache = None
@@ -0,0 +1,57 @@
+"""
+Замер фаз обработки запроса для заголовка Server-Timing.
+
+Middleware создает PhaseTimer и кладет его в contextvar; код сервисов и
+репозитория отмечает фазы через `with phase("search"):`. Вне запроса phase()
+ничего не делает, поэтому сервисы можно вызывать из CLI и тестов как обычно.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, Optional
+
+
+class PhaseTimer:
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases: Dict[str, float] = {}
+
+    def add(self, name: str, seconds: float) -> None:
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def header_value(self) -> str:
+        """decode;dur=1.203, search;dur=10.5, total;dur=12.1 (миллисекунды)"""
+        parts = [f"{name};dur={seconds * 1000:.3f}" for name, seconds in self.phases.items()]
+        parts.append(f"total;dur={(time.perf_counter() - self.started) * 1000:.3f}")
+        return ", ".join(parts)
+
+
+_current: ContextVar[Optional[PhaseTimer]] = ContextVar("phase_timer", default=None)
+
+
+def start_timer() -> PhaseTimer:
+    timer = PhaseTimer()
+    _current.set(timer)
+    return timer
+
+
+def clear_timer() -> None:
+    _current.set(None)
+
+
+def current_timer() -> Optional[PhaseTimer]:
+    return _current.get()
+
+
+@contextmanager
+def phase(name: str) -> Iterator[None]:
+    timer = _current.get()
+    if timer is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timer.add(name, time.perf_counter() - started)
@@ -0,0 +1,494 @@
+"""
+Потоковый перенос лабиринтов с решениями между окружениями.
+
+Поток - последовательность записей. Первая - заголовок
+{"type": "header", "format": "maze-export", "version": 1}, дальше каждый
+лабиринт и сразу за ним его решения:
+    {"type": "maze", "id", "width", "height", "start", "end", "algorithm",
+     "revision", "created_at", "grid"}
+    {"type": "solution", "id", "maze_id", "algorithm", "path", "steps",
+     "stats", "created_at"}
+
+Форматы:
+    NDJSON (application/x-ndjson) - запись на строку; JSON-колонки БД
+        вставляются в строку без декодирования;
+    MessagePack (application/x-msgpack) - записи подряд без разделителей:
+        grid - битовая плоскость pack_grid (у файлов GridStore - как есть),
+        path - int32-пары pack_points, steps - JSON-текст колонки
+        (pack_steps не сохраняет порядок visited).
+Поверх любого формата - gzip (Content-Encoding).
+
+Экспорт держит в памяти только текущий лабиринт с решениями и буфер ответа.
+Импорт разбирает тело по мере поступления и пишет пачками; лабиринты получают
+новые ID, решение привязывается к последнему прочитанному лабиринту, поэтому
+соответствие старых и новых ID не накапливается. Пачки коммитятся по мере
+записи: при ошибке в середине потока уже записанные пачки остаются.
+"""
+import asyncio
+import zlib
+from datetime import datetime, timezone
+from itertools import chain
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+import msgpack
+import numpy as np
+import orjson
+
+from app.config import get_settings
+from app.api.responses import RawJSON
+from app.repositories.transfer_repository import TransferRepository
+from app.services.grid_codec import pack_grid, unpack_grid_json
+from app.services.grid_store import GridStore
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+FORMAT_NAME = "maze-export"
+FORMAT_VERSION = 1
+
+# Поля stats, без которых решение не импортируется
+REQUIRED_STATS = ("nodes_explored", "path_length", "execution_time")
+OPTIONAL_STATS = (
+    "search_time_ns",
+    "trace_time_ns",
+    "heap_pushes",
+    "heap_pops",
+    "neighbor_checks",
+    "peak_frontier",
+    "peak_memory_bytes",
+)
+
+
+class TransferError(ValueError):
+    """Некорректная запись потока импорта"""
+
+
+def header_record() -> Dict:
+    return {"type": "header", "format": FORMAT_NAME, "version": FORMAT_VERSION}
+
+
+class _Encoder:
+    """Записи -> куски ответа не меньше chunk_bytes, опционально через gzip"""
+
+    def __init__(self, binary: bool, gzip: bool, chunk_bytes: int):
+        self.binary = binary
+        self.chunk_bytes = chunk_bytes
+        self._packer = msgpack.Packer(use_bin_type=True)
+        self._buffer = bytearray()
+        self._compressor = (
+            zlib.compressobj(get_settings().TRANSFER_GZIP_LEVEL, wbits=31) if gzip else None
+        )
+
+    def add(self, record: Dict) -> Optional[bytes]:
+        if self.binary:
+            self._buffer += self._packer.pack(record)
+        else:
+            _append_json_line(self._buffer, record)
+        if len(self._buffer) < self.chunk_bytes:
+            return None
+        return self._take()
+
+    def _take(self) -> bytes:
+        data, self._buffer = bytes(self._buffer), bytearray()
+        if self._compressor is not None:
+            data = self._compressor.compress(data)
+        return data
+
+    def finish(self) -> bytes:
+        data = self._take()
+        if self._compressor is not None:
+            data += self._compressor.flush()
+        return data
+
+
+def _append_json_line(buffer: bytearray, record: Dict) -> None:
+    """
+    Строка NDJSON. В записях экспорта RawJSON бывает только на верхнем уровне,
+    поэтому он дописывается после остальных полей без обхода и замены заглушек
+    (responses.dumps для мелких записей в разы медленнее).
+    """
+    plain = {}
+    raw = []
+    for key, value in record.items():
+        if isinstance(value, RawJSON):
+            raw.append((key, value.value))
+        else:
+            plain[key] = value
+    buffer += orjson.dumps(plain)
+    if raw:
+        buffer.pop()  # закрывающая }
+        for key, value in raw:
+            buffer += b',"' + key.encode() + b'":'
+            buffer += value
+        buffer += b"}"
+    buffer += b"\n"
+
+
+async def export_stream(
+    session_factory,
+    grid_store: GridStore,
+    write_behind=None,
+    binary: bool = False,
+    gzip: bool = False,
+    after_id: int = 0,
+    with_solutions: bool = True,
+    with_steps: bool = True
+) -> AsyncIterator[bytes]:
+    """Тело GET /api/export"""
+    settings = get_settings()
+    encoder = _Encoder(binary, gzip, settings.TRANSFER_CHUNK_BYTES)
+    encoder.add(header_record())
+    async with session_factory() as db:
+        repo = TransferRepository(db, write_behind, grid_store)
+        async for maze, solutions in repo.stream(
+            after_id, with_solutions, with_steps, settings.TRANSFER_BATCH_SIZE
+        ):
+            if maze.grid_file:
+                record = await asyncio.to_thread(repo.maze_record, maze, binary)
+            else:
+                record = repo.maze_record(maze, binary)
+            chunk = encoder.add(record)
+            if chunk:
+                yield chunk
+            for solution in solutions:
+                chunk = encoder.add(repo.solution_record(solution, binary))
+                if chunk:
+                    yield chunk
+    chunk = encoder.finish()
+    if chunk:
+        yield chunk
+
+
+async def decompressed(chunks: AsyncIterator[bytes], chunk_bytes: int) -> AsyncIterator[bytes]:
+    """gzip/deflate-тело по кускам; выход каждого шага ограничен chunk_bytes"""
+    decompressor = zlib.decompressobj(wbits=47)  # 32 + 15: gzip или zlib по заголовку
+    try:
+        async for chunk in chunks:
+            data = chunk
+            while data:
+                out = decompressor.decompress(data, chunk_bytes)
+                if out:
+                    yield out
+                data = decompressor.unconsumed_tail
+        tail = decompressor.flush()
+    except zlib.error as e:
+        raise TransferError(f"Поврежденное сжатое тело: {e}")
+    if tail:
+        yield tail
+
+
+async def read_records(
+    chunks: AsyncIterator[bytes],
+    binary: bool,
+    max_record_bytes: int
+) -> AsyncIterator[Dict]:
+    """Записи из потока байтов; запись длиннее max_record_bytes - ошибка"""
+    if binary:
+        unpacker = msgpack.Unpacker(raw=False, max_buffer_size=max_record_bytes)
+        fed = 0
+        async for chunk in chunks:
+            try:
+                unpacker.feed(chunk)
+                fed += len(chunk)
+                for record in unpacker:
+                    yield record
+            except msgpack.BufferFull:
+                raise TransferError(f"Запись длиннее {max_record_bytes} байт")
+            except ValueError as e:
+                raise TransferError(f"Некорректный MessagePack: {e}")
+        if unpacker.tell() != fed:
+            raise TransferError("Поток оборвался посреди записи")
+        return
+
+    # Хвост без перевода строки копится кусками: склейка только по концу строки
+    parts: List[bytes] = []
+    size = 0
+    async for chunk in chunks:
+        position = 0
+        while True:
+            end = chunk.find(b"\n", position)
+            if end < 0:
+                break
+            line = chunk[position:end]
+            if parts:
+                line = b"".join(parts) + line
+                parts, size = [], 0
+            if line.strip():
+                yield _parse_line(line)
+            position = end + 1
+        if position < len(chunk):
+            parts.append(chunk[position:])
+            size += len(chunk) - position
+            if size > max_record_bytes:
+                raise TransferError(f"Запись длиннее {max_record_bytes} байт")
+    line = b"".join(parts)
+    if line.strip():
+        yield _parse_line(line)
+
+
+def _parse_line(line: bytes) -> Dict:
+    try:
+        return orjson.loads(line)
+    except orjson.JSONDecodeError as e:
+        raise TransferError(f"Некорректный JSON: {e}")
+
+
+class _Batch:
+    """Накопленные строки одной транзакции импорта"""
+
+    def __init__(self):
+        self.mazes: List[Dict] = []
+        self.solutions: List[Dict] = []
+        self.refs: List[Optional[int]] = []
+        self.rollup_rows: List[Tuple] = []
+        self.files: List[str] = []
+        self.bytes = 0
+
+    def __len__(self) -> int:
+        return len(self.mazes) + len(self.solutions)
+
+
+async def import_records(
+    records: AsyncIterator[Dict],
+    repo: TransferRepository,
+    grid_store: GridStore,
+    counts: Dict[str, int]
+) -> Dict[str, int]:
+    """
+    Записать лабиринты и решения потока. counts ({"mazes", "solutions"})
+    обновляется после каждой пачки - по нему видно, что записано до ошибки.
+    """
+    settings = get_settings()
+    batch = _Batch()
+    number = 0
+    # Последний прочитанный лабиринт: старый ID, новый ID (если уже записан)
+    # или индекс в текущей пачке, (generator, width, height) для агрегатов
+    current_old_id = current_new_id = current_index = None
+    current_meta = None
+    try:
+        async for record in records:
+            number += 1
+            kind = record.get("type") if isinstance(record, dict) else None
+            if kind == "header":
+                if record.get("format") != FORMAT_NAME or record.get("version") != FORMAT_VERSION:
+                    raise TransferError(
+                        f"Неподдерживаемый формат: {record.get('format')} v{record.get('version')}"
+                    )
+            elif kind == "maze":
+                values, size = await _maze_values(record, grid_store, batch.files, settings)
+                current_old_id = record.get("id")
+                current_new_id = None
+                current_index = len(batch.mazes)
+                current_meta = (values["algorithm"], values["width"], values["height"])
+                batch.mazes.append(values)
+                batch.bytes += size
+            elif kind == "solution":
+                if current_meta is None or record.get("maze_id") != current_old_id:
+                    raise TransferError("решение должно идти сразу за своим лабиринтом")
+                values, size = _solution_values(record)
+                if current_index is None:
+                    values["maze_id"] = current_new_id
+                batch.solutions.append(values)
+                batch.refs.append(current_index)
+                batch.rollup_rows.append((
+                    values["algorithm"], *current_meta,
+                    values["nodes_explored"], values["path_length"], values["execution_time"]
+                ))
+                batch.bytes += size
+            else:
+                raise TransferError(f"неизвестный тип записи: {kind!r}")
+
+            if len(batch) >= settings.TRANSFER_BATCH_SIZE or batch.bytes >= settings.TRANSFER_BATCH_BYTES:
+                ids = await _write_batch(repo, grid_store, batch, counts)
+                if current_index is not None:
+                    current_new_id = ids[current_index]
+                    current_index = None
+                batch = _Batch()
+
+        await _write_batch(repo, grid_store, batch, counts)
+    except TransferError as e:
+        _discard_files(grid_store, batch.files)
+        raise TransferError(f"Запись {number}: {e}")
+    except BaseException:
+        _discard_files(grid_store, batch.files)
+        raise
+    return counts
+
+
+async def _write_batch(
+    repo: TransferRepository,
+    grid_store: GridStore,
+    batch: _Batch,
+    counts: Dict[str, int]
+) -> List[int]:
+    if not len(batch):
+        return []
+    try:
+        ids = await repo.insert_batch(batch.mazes, batch.solutions, batch.refs, batch.rollup_rows)
+    except BaseException:
+        await repo.rollback()
+        raise
+    # Файлы пачки теперь принадлежат записанным лабиринтам
+    batch.files = []
+    counts["mazes"] += len(batch.mazes)
+    counts["solutions"] += len(batch.solutions)
+    return ids
+
+
+def _discard_files(grid_store: GridStore, files: List[str]) -> None:
+    for name in files:
+        grid_store.delete(name)
+
+
+async def _maze_values(record: Dict, grid_store: GridStore, files: List[str], settings) -> Tuple[Dict, int]:
+    """Колонки mazes из записи и ее примерный размер; большая сетка сразу пишется в GridStore"""
+    width = _integer(record, "width", settings.MIN_MAZE_SIZE, settings.JOB_MAX_MAZE_SIZE)
+    height = _integer(record, "height", settings.MIN_MAZE_SIZE, settings.JOB_MAX_MAZE_SIZE)
+    start = _point(record, "start", width, height)
+    end = _point(record, "end", width, height)
+    algorithm = _string(record, "algorithm")
+    revision = record.get("revision") or 0
+    if not isinstance(revision, int) or revision < 0:
+        raise TransferError("revision должен быть неотрицательным целым")
+
+    packed = rows = None
+    grid = record.get("grid")
+    if isinstance(grid, (bytes, bytearray)):
+        if len(grid) != (width * height + 7) // 8:
+            raise TransferError("размер упакованной сетки не совпадает с width * height")
+        packed = bytes(grid)
+    elif isinstance(grid, list):
+        if len(grid) != height or any(
+            not isinstance(row, list) or len(row) != width for row in grid
+        ):
+            raise TransferError("размер сетки не совпадает с width и height")
+        if not set(chain.from_iterable(grid)) <= {0, 1}:
+            raise TransferError("клетки сетки должны быть 0 или 1")
+        rows = grid
+    else:
+        raise TransferError("нет сетки grid")
+
+    grid_file = None
+    grid_json = ""
+    if width * height >= settings.GRID_STORE_MIN_CELLS:
+        if packed is None:
+            packed = await asyncio.to_thread(pack_grid, rows)
+        grid_file = await asyncio.to_thread(grid_store.write_packed, packed, width, height, start, end)
+        files.append(grid_file)
+        size = len(packed)
+    else:
+        if rows is not None:
+            grid_json = orjson.dumps(rows).decode()
+        else:
+            grid_json = unpack_grid_json(packed, width, height).decode()
+        size = len(grid_json)
+
+    return {
+        "width": width,
+        "height": height,
+        "grid": grid_json,
+        "grid_file": grid_file,
+        "start_x": start[0],
+        "start_y": start[1],
+        "end_x": end[0],
+        "end_y": end[1],
+        "algorithm": algorithm,
+        "revision": revision,
+        "created_at": _timestamp(record.get("created_at")),
+    }, size
+
+
+def _solution_values(record: Dict) -> Tuple[Dict, int]:
+    """Колонки solutions без maze_id и размер JSON-колонок"""
+    algorithm = _string(record, "algorithm")
+
+    path = record.get("path")
+    if isinstance(path, (bytes, bytearray)):
+        if len(path) % 8:
+            raise TransferError("длина упакованного пути не кратна 8 байтам")
+        points = np.frombuffer(path, dtype="<i4").reshape(-1, 2)
+    else:
+        try:
+            points = np.asarray(path) if isinstance(path, list) else None
+        except ValueError:
+            points = None
+        if points is not None and points.size == 0:
+            points = np.empty((0, 2), dtype=np.int64)
+        if (
+            points is None or points.dtype.kind not in "iu"
+            or points.ndim != 2 or points.shape[1] != 2
+        ):
+            raise TransferError("path должен быть списком пар [x, y]")
+    path_json = orjson.dumps(points, option=orjson.OPT_SERIALIZE_NUMPY).decode()
+
+    steps = record.get("steps", [])
+    if isinstance(steps, (str, bytes)):
+        # Трасса из MessagePack приходит JSON-текстом - проверяется, но не перекодируется
+        try:
+            parsed = orjson.loads(steps)
+        except orjson.JSONDecodeError as e:
+            raise TransferError(f"steps не является JSON: {e}")
+        if not isinstance(parsed, list):
+            raise TransferError("steps должен быть списком")
+        steps_json = steps if isinstance(steps, str) else steps.decode()
+    elif isinstance(steps, list):
+        steps_json = orjson.dumps(steps).decode()
+    else:
+        raise TransferError("steps должен быть списком")
+
+    stats = record.get("stats")
+    if not isinstance(stats, dict):
+        raise TransferError("нет stats")
+    values = {
+        "algorithm": algorithm,
+        "path": path_json,
+        "steps": steps_json,
+        "created_at": _timestamp(record.get("created_at")),
+    }
+    for name in REQUIRED_STATS:
+        value = stats.get(name)
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or value < 0:
+            raise TransferError(f"stats.{name} должен быть неотрицательным числом")
+        values[name] = value
+    for name in OPTIONAL_STATS:
+        value = stats.get(name)
+        if value is not None and (isinstance(value, bool) or not isinstance(value, int)):
+            raise TransferError(f"stats.{name} должен быть целым")
+        values[name] = value
+    return values, len(path_json) + len(steps_json)
+
+
+def _integer(record: Dict, name: str, low: int, high: int) -> int:
+    value = record.get(name)
+    if isinstance(value, bool) or not isinstance(value, int) or not low <= value <= high:
+        raise TransferError(f"{name} должен быть целым от {low} до {high}")
+    return value
+
+
+def _string(record: Dict, name: str) -> str:
+    value = record.get(name)
+    if not isinstance(value, str) or not 0 < len(value) <= 50:
+        raise TransferError(f"{name} должен быть непустой строкой до 50 символов")
+    return value
+
+
+def _point(record: Dict, name: str, width: int, height: int) -> Tuple[int, int]:
+    value = record.get(name)
+    if (
+        not isinstance(value, (list, tuple)) or len(value) != 2
+        or not all(isinstance(v, int) and not isinstance(v, bool) for v in value)
+        or not (0 <= value[0] < width and 0 <= value[1] < height)
+    ):
+        raise TransferError(f"{name} должен быть клеткой [x, y] внутри сетки")
+    return value[0], value[1]
+
+
+def _timestamp(value) -> datetime:
+    """ISO-время записи -> наивное UTC, как server_default; без времени - сейчас"""
+    if value is None:
+        return datetime.now(timezone.utc).replace(tzinfo=None)
+    try:
+        parsed = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise TransferError(f"некорректное время: {value!r}")
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
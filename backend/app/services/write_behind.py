@@ -0,0 +1,302 @@
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import column, func, select, table, update
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.config import get_settings
+from app.database import AsyncSessionLocal
+from app.models.maze import IdSequence, Maze, Solution
+from app.services.rollups import apply_rollups
+
+logger = logging.getLogger(__name__)
+
+# Служебная таблица SQLite: последний выданный AUTOINCREMENT ID каждой таблицы
+_sqlite_sequence = table("sqlite_sequence", column("name"), column("seq"))
+
+
+class IdAllocator:
+    """
+    Выдача ID из заранее зарезервированных диапазонов.
+
+    Диапазон резервируется в одной транзакции: INSERT ... ON CONFLICT DO NOTHING
+    заводит счетчик в id_sequences, UPDATE ... RETURNING сдвигает его, поэтому
+    несколько процессов uvicorn получают непересекающиеся блоки и не спорят
+    за первую строку. Блок начинается выше уже занятых ID, а sqlite_sequence
+    таблицы сдвигается на конец блока: обычный INSERT с AUTOINCREMENT в обход
+    буфера получает ID за блоком.
+    Неиспользованный остаток блока теряется при перезапуске (дыры в ID допустимы).
+    """
+
+    def __init__(self, session_factory: async_sessionmaker, block_size: int):
+        self.session_factory = session_factory
+        self.block_size = block_size
+        self._ranges: Dict[str, Tuple[int, int]] = {}
+        self._lock = asyncio.Lock()
+
+    async def next_id(self, model) -> int:
+        name = model.__tablename__
+        async with self._lock:
+            current, end = self._ranges.get(name, (0, 0))
+            if current >= end:
+                current, end = await self._reserve(model)
+            self._ranges[name] = (current + 1, end)
+            return current
+
+    async def _reserve(self, model) -> Tuple[int, int]:
+        name = model.__tablename__
+        size = self.block_size
+        autoincrement = model.__table__.dialect_options["sqlite"]["autoincrement"]
+        async with self.session_factory() as db:
+            async with db.begin():
+                await db.execute(
+                    insert(IdSequence)
+                    .values(name=name, next_id=1)
+                    .on_conflict_do_nothing(index_elements=[IdSequence.name])
+                )
+                # Не ниже ID, выданных в обход буфера
+                floor = select(func.coalesce(func.max(model.id), 0) + 1).scalar_subquery()
+                if autoincrement:
+                    issued = select(_sqlite_sequence.c.seq).where(_sqlite_sequence.c.name == name)
+                    floor = func.max(floor, func.coalesce(issued.scalar_subquery(), 0) + 1)
+                end = (await db.execute(
+                    update(IdSequence)
+                    .where(IdSequence.name == name)
+                    .values(next_id=func.max(IdSequence.next_id, floor) + size)
+                    .returning(IdSequence.next_id)
+                )).scalar_one()
+                if autoincrement:
+                    await _advance_sqlite_sequence(db, name, end - 1)
+                return end - size, end
+
+
+class WriteBehindBuffer:
+    """
+    Отложенная запись Maze и Solution пачками.
+
+    ID выдаются сразу из IdAllocator, строки попадают в очередь и пишутся одной
+    транзакцией при достижении batch_size или по таймеру flush_interval.
+    До записи строки доступны через overlay (read-your-writes в пределах процесса).
+    Пачка, которая max_attempts раз подряд нарушила ограничения БД, пишется
+    построчно; строки, которые не записываются и так, отбрасываются с ошибкой в лог.
+    """
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker,
+        batch_size: int = 200,
+        flush_interval: float = 0.05,
+        id_block_size: int = 1000,
+        max_attempts: int = 3
+    ):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.ids = IdAllocator(session_factory, id_block_size)
+        self.max_attempts = max_attempts
+        self.dropped = 0
+
+        self._mazes: Dict[int, Maze] = {}
+        self._solutions: Dict[int, Solution] = {}
+        self._queue: List = []
+        self._flush_lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._failures = 0
+
+    @property
+    def pending(self) -> int:
+        return len(self._queue)
+
+    async def add_maze(self, maze: Maze) -> Maze:
+        maze.id = await self.ids.next_id(Maze)
+        maze.created_at = _utcnow()
+        self._mazes[maze.id] = maze
+        self._enqueue(maze)
+        return maze
+
+    async def add_solution(self, solution: Solution) -> Solution:
+        solution.id = await self.ids.next_id(Solution)
+        solution.created_at = _utcnow()
+        self._solutions[solution.id] = solution
+        self._enqueue(solution)
+        return solution
+
+    async def add_solutions(self, solutions: List[Solution]) -> List[Solution]:
+        """ID выдаются до постановки в очередь, поэтому все строки попадают в одну пачку"""
+        for solution in solutions:
+            solution.id = await self.ids.next_id(Solution)
+            solution.created_at = _utcnow()
+        for solution in solutions:
+            self._solutions[solution.id] = solution
+            self._enqueue(solution)
+        return solutions
+
+    def get_maze(self, maze_id: int) -> Optional[Maze]:
+        return self._mazes.get(maze_id)
+
+    def get_solution(self, solution_id: int) -> Optional[Solution]:
+        return self._solutions.get(solution_id)
+
+    def get_solutions_for_maze(self, maze_id: int) -> List[Solution]:
+        return [s for s in self._solutions.values() if s.maze_id == maze_id]
+
+    async def discard_maze(self, maze_id: int) -> bool:
+        """
+        Убрать из очереди еще не записанный лабиринт вместе с его решениями.
+        Ждет пишущуюся пачку: flush уже забрал ее из очереди, и без ожидания
+        ее строки появились бы в БД после DELETE вызывающего.
+        """
+        async with self._flush_lock:
+            return self._discard(maze_id)
+
+    def _discard(self, maze_id: int) -> bool:
+        removed = self._mazes.pop(maze_id, None) is not None
+        for solution in self.get_solutions_for_maze(maze_id):
+            del self._solutions[solution.id]
+        self._queue = [
+            row for row in self._queue
+            if not (isinstance(row, Maze) and row.id == maze_id)
+            and not (isinstance(row, Solution) and row.maze_id == maze_id)
+        ]
+        return removed
+
+    def _enqueue(self, row) -> None:
+        self._queue.append(row)
+        if len(self._queue) >= self.batch_size:
+            self._wakeup.set()
+
+    async def flush(self) -> int:
+        """Записать накопленные строки одной транзакцией"""
+        async with self._flush_lock:
+            batch, self._queue = self._queue, []
+            if not batch:
+                return 0
+
+            try:
+                await self._write(batch)
+            except IntegrityError:
+                self._failures += 1
+                if self._failures < self.max_attempts:
+                    self._queue = batch + self._queue
+                    raise
+                batch = await self._write_rows(batch)
+            except Exception:
+                # Вернуть строки в начало очереди, overlay продолжает их отдавать
+                self._queue = batch + self._queue
+                raise
+            self._failures = 0
+
+            for row in batch:
+                self._forget(row)
+            return len(batch)
+
+    async def _write(self, rows: List) -> None:
+        mazes = [_row_values(row) for row in rows if isinstance(row, Maze)]
+        solutions = [row for row in rows if isinstance(row, Solution)]
+        async with self.session_factory() as db:
+            async with db.begin():
+                if mazes:
+                    await db.execute(insert(Maze), mazes)
+                if solutions:
+                    await db.execute(insert(Solution), [_row_values(row) for row in solutions])
+                    await apply_rollups(db, solutions)
+
+    async def _write_rows(self, batch: List) -> List:
+        """Записать пачку по строке, отбросив строки с нарушением ограничений"""
+        written = []
+        for index, row in enumerate(batch):
+            try:
+                await self._write([row])
+            except IntegrityError as e:
+                self.dropped += 1
+                self._forget(row)
+                logger.error(
+                    "write-behind: строка %s id=%s отброшена: %s",
+                    row.__tablename__, row.id, e.orig
+                )
+            except Exception:
+                for done in written:
+                    self._forget(done)
+                self._queue = batch[index:] + self._queue
+                raise
+            else:
+                written.append(row)
+        return written
+
+    def _forget(self, row) -> None:
+        if isinstance(row, Maze):
+            self._mazes.pop(row.id, None)
+        else:
+            self._solutions.pop(row.id, None)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Ошибка записи write-behind пачки")
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+
+def _utcnow() -> datetime:
+    # SQLite хранит server_default func.now() как наивное UTC-время
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+async def _advance_sqlite_sequence(db, name: str, last_id: int) -> None:
+    """Поднять счетчик AUTOINCREMENT таблицы name не ниже last_id"""
+    updated = await db.execute(
+        update(_sqlite_sequence)
+        .where(_sqlite_sequence.c.name == name)
+        .values(seq=func.max(_sqlite_sequence.c.seq, last_id))
+    )
+    if updated.rowcount == 0:
+        # Строка появляется при первой вставке в таблицу
+        await db.execute(_sqlite_sequence.insert().values(name=name, seq=last_id))
+
+
+def _row_values(row) -> dict:
+    return {column.key: getattr(row, column.key) for column in row.__table__.columns}
+
+
+_buffer: Optional[WriteBehindBuffer] = None
+
+
+def get_write_behind() -> Optional[WriteBehindBuffer]:
+    """Общий буфер процесса или None, если режим выключен"""
+    global _buffer
+    settings = get_settings()
+    if not settings.WRITE_BEHIND_ENABLED:
+        return None
+    if _buffer is None:
+        _buffer = WriteBehindBuffer(
+            AsyncSessionLocal,
+            batch_size=settings.WRITE_BEHIND_BATCH_SIZE,
+            flush_interval=settings.WRITE_BEHIND_FLUSH_INTERVAL,
+            id_block_size=settings.ID_BLOCK_SIZE,
+            max_attempts=settings.WRITE_BEHIND_MAX_ATTEMPTS
+        )
+    return _buffer
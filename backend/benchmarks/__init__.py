@@ -0,0 +1 @@
+"""Бенчмарки backend-а. Запуск: python -m benchmarks.<модуль> из каталога backend/"""
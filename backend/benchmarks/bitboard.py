@@ -0,0 +1,76 @@
+"""
+Сравнение волнового BFS на битбордах (bfs_bitboard) с обычным _bfs.
+
+Для каждого алгоритма генерации и seed строится лабиринт size x size, оба
+движка решают его без трассы; проверяется совпадение длины пути.
+
+    python -m benchmarks.bitboard --sizes 2001 --seeds 1,2 --max-ms 60000
+
+--max-ms ограничивает каждый прогон через SearchBudget (остановленный прогон
+выводится с path=None). Время bfs_bitboard включает нарезку сетки на плитки.
+"""
+import argparse
+import json
+import random
+import sys
+import time
+from typing import Dict, List, Optional
+
+from app.config import get_settings
+from app.services.maze_generator import MazeGenerator
+from app.services.pathfinder import PathFinder, SearchBudget
+
+ENGINES = ("bfs", "bfs_bitboard")
+
+
+def bench(size: int, seed: int, max_ms: Optional[float] = None) -> List[Dict]:
+    records = []
+    for generator in get_settings().GENERATION_ALGORITHMS:
+        random.seed(seed)
+        grid, start, end = MazeGenerator(size, size).generate(generator)
+        row = {"generator": generator, "size": size, "seed": seed}
+        for engine in ENGINES:
+            started = time.perf_counter()
+            result = PathFinder(grid, start, end).find_path(
+                engine, record_steps=False, budget=SearchBudget(max_ms=max_ms)
+            )
+            row[f"{engine}_s"] = round(time.perf_counter() - started, 4)
+            row[f"{engine}_path"] = result["stats"]["path_length"] if not result["stopped"] else None
+        if row["bfs_path"] is not None and row["bfs_bitboard_path"] is not None:
+            assert row["bfs_path"] == row["bfs_bitboard_path"], row
+            row["speedup"] = round(row["bfs_s"] / row["bfs_bitboard_s"], 2)
+        else:
+            row["speedup"] = None
+        records.append(row)
+    return records
+
+
+def _format_table(records: List[Dict]) -> str:
+    lines = [f"{'generator':<24}{'size':>6}{'seed':>6}{'path':>9}{'bfs s':>10}{'bitboard s':>12}{'speedup':>9}"]
+    for r in records:
+        lines.append(
+            f"{r['generator']:<24}{r['size']:>6}{r['seed']:>6}{str(r['bfs_path']):>9}"
+            f"{r['bfs_s']:>10}{r['bfs_bitboard_s']:>12}{str(r['speedup']):>9}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="bfs_bitboard против bfs")
+    parser.add_argument("--sizes", type=lambda v: [int(s) for s in v.split(",")], default=[2001])
+    parser.add_argument("--seeds", type=lambda v: [int(s) for s in v.split(",")], default=[1])
+    parser.add_argument("--max-ms", type=float, default=60000, help="Ограничение прогона, мс")
+    parser.add_argument("--json", action="store_true", help="Вывести результат в JSON")
+    args = parser.parse_args(argv)
+
+    records = []
+    for size in args.sizes:
+        for seed in args.seeds:
+            print(f"size={size} seed={seed}", file=sys.stderr)
+            records.extend(bench(size, seed, args.max_ms))
+    print(json.dumps(records, indent=2) if args.json else _format_table(records))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,139 @@
+"""
+Сравнение пропускной способности слоя БД при конкурентных запросах.
+
+before - синхронная Session внутри корутин (как в исходных async-обработчиках),
+         движок с настройками SQLite по умолчанию;
+after  - AsyncSession + aiosqlite, WAL / synchronous=NORMAL / mmap / busy_timeout.
+
+Каждый "запрос" - создание лабиринта и чтение его обратно. Параллельно работает
+тикер, который измеряет максимальную задержку event loop.
+
+    python -m benchmarks.db_concurrency --concurrency 32 --requests 20
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+from typing import Awaitable, Callable, Dict
+
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base, create_async_db_engine
+from app.models.maze import Maze
+from app.repositories.maze_repository import MazeRepository
+from app.services.maze_generator import MazeGenerator
+
+
+async def _loop_lag_probe(stop: asyncio.Event, interval: float = 0.005) -> float:
+    worst = 0.0
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        worst = max(worst, time.perf_counter() - started - interval)
+    return worst
+
+
+async def _drive(
+    request: Callable[[], Awaitable[None]],
+    concurrency: int,
+    requests_per_worker: int
+) -> Dict:
+    stop = asyncio.Event()
+    probe = asyncio.create_task(_loop_lag_probe(stop))
+
+    async def worker():
+        for _ in range(requests_per_worker):
+            await request()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    max_lag = await probe
+    total = concurrency * requests_per_worker
+    return {
+        "requests": total,
+        "elapsed_s": round(elapsed, 4),
+        "rps": round(total / elapsed, 1),
+        "max_loop_lag_ms": round(max_lag * 1000, 2),
+    }
+
+
+async def run_before(db_path: str, grid, start, end, concurrency: int, requests: int) -> Dict:
+    engine = create_engine(f"sqlite:///{db_path}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    payload = json.dumps(grid)
+
+    async def request():
+        db = session_factory()
+        try:
+            maze = Maze(
+                width=len(grid[0]), height=len(grid), grid=payload,
+                start_x=start[0], start_y=start[1], end_x=end[0], end_y=end[1],
+                algorithm="recursive_backtracking"
+            )
+            db.add(maze)
+            db.commit()
+            db.refresh(maze)
+            db.query(Maze).filter(Maze.id == maze.id).first()
+        finally:
+            db.close()
+
+    try:
+        return await _drive(request, concurrency, requests)
+    finally:
+        engine.dispose()
+
+
+async def run_after(db_path: str, grid, start, end, concurrency: int, requests: int) -> Dict:
+    engine = create_async_db_engine(f"sqlite:///{db_path}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    session_factory = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+
+    async def request():
+        async with session_factory() as db:
+            repo = MazeRepository(db)
+            maze = await repo.create_maze(
+                width=len(grid[0]), height=len(grid), grid=grid,
+                start=start, end=end, algorithm="recursive_backtracking"
+            )
+            await repo.get_maze(maze.id)
+
+    try:
+        return await _drive(request, concurrency, requests)
+    finally:
+        await engine.dispose()
+
+
+async def main_async(args) -> Dict:
+    grid, start, end = MazeGenerator(args.size, args.size).generate("recursive_backtracking")
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        results["before"] = await run_before(
+            os.path.join(tmp, "before.db"), grid, start, end, args.concurrency, args.requests
+        )
+        results["after"] = await run_after(
+            os.path.join(tmp, "after.db"), grid, start, end, args.concurrency, args.requests
+        )
+    results["speedup"] = round(results["after"]["rps"] / results["before"]["rps"], 2)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Бенчмарк конкурентного доступа к БД")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=20, help="Запросов на одного воркера")
+    parser.add_argument("--size", type=int, default=50, help="Размер лабиринта")
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(main_async(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
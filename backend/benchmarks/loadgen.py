@@ -0,0 +1,243 @@
+"""
+Нагрузочный генератор для API лабиринтов.
+
+Гоняет смесь запросов generate / get / list / solve с заданной конкурентностью
+и печатает пропускную способность, p50/p95/p99 и долю ошибок по эндпоинтам.
+
+    # против запущенного uvicorn
+    python -m benchmarks.loadgen --url http://127.0.0.1:8000 --concurrency 32 --duration 30
+    # в том же процессе через ASGI (без сети); БД берется из DATABASE_URL
+    python -m benchmarks.loadgen --in-process --database-url sqlite:///./loadtest.db
+
+Смесь задается весами: --mix generate=1,get=6,list=2,solve=1
+get и solve, пока нет ни одного лабиринта, не отправляются и считаются в skipped.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import sys
+import time
+from typing import Dict, List, Optional
+
+import httpx
+
+DEFAULT_MIX = {"generate": 1, "get": 6, "list": 2, "solve": 1}
+GENERATION_ALGORITHMS = ["recursive_backtracking", "prims", "kruskals"]
+PATHFINDING_ALGORITHMS = ["bfs", "dfs", "astar"]
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    """Перцентиль по методу ближайшего ранга"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = math.ceil(q / 100 * len(ordered))
+    return ordered[max(0, min(len(ordered), rank) - 1)]
+
+
+class LoadRunner:
+
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        mix: Dict[str, int],
+        sizes: List[int],
+        seed: int = 0
+    ):
+        self.client = client
+        self.mix = {name: weight for name, weight in mix.items() if weight > 0}
+        self.sizes = sizes
+        self.random = random.Random(seed)
+        self.maze_ids: List[int] = []
+        self.latencies: Dict[str, List[float]] = {name: [] for name in self.mix}
+        self.errors: Dict[str, int] = {name: 0 for name in self.mix}
+        self.skipped: Dict[str, int] = {name: 0 for name in self.mix}
+
+    async def _generate(self) -> httpx.Response:
+        size = self.random.choice(self.sizes)
+        response = await self.client.post("/api/maze/generate", json={
+            "width": size,
+            "height": size,
+            "algorithm": self.random.choice(GENERATION_ALGORITHMS),
+        })
+        if response.status_code == 200:
+            self.maze_ids.append(response.json()["id"])
+        return response
+
+    def _maze_id(self) -> Optional[int]:
+        return self.random.choice(self.maze_ids) if self.maze_ids else None
+
+    async def _get(self) -> Optional[httpx.Response]:
+        maze_id = self._maze_id()
+        if maze_id is None:
+            return None
+        return await self.client.get(f"/api/maze/{maze_id}")
+
+    async def _list(self) -> httpx.Response:
+        return await self.client.get("/api/maze/", params={"page": 1, "size": 10})
+
+    async def _solve(self) -> Optional[httpx.Response]:
+        maze_id = self._maze_id()
+        if maze_id is None:
+            return None
+        return await self.client.post(
+            f"/api/maze/{maze_id}/solve",
+            json={"algorithm": self.random.choice(PATHFINDING_ALGORITHMS)}
+        )
+
+    async def seed(self, count: int) -> None:
+        for _ in range(count):
+            response = await self._generate()
+            response.raise_for_status()
+
+    async def _one(self) -> None:
+        names = list(self.mix)
+        name = self.random.choices(names, weights=[self.mix[n] for n in names])[0]
+        started = time.perf_counter()
+        try:
+            response = await getattr(self, f"_{name}")()
+            if response is None:
+                # Лабиринтов еще нет (без прогрева и до первого generate)
+                self.skipped[name] += 1
+                return
+            ok = response.status_code < 400
+        except httpx.HTTPError:
+            ok = False
+        self.latencies[name].append(time.perf_counter() - started)
+        if not ok:
+            self.errors[name] += 1
+
+    async def run(
+        self,
+        concurrency: int,
+        duration: Optional[float] = None,
+        requests: Optional[int] = None
+    ) -> Dict:
+        deadline = time.perf_counter() + duration if duration else None
+        remaining = [requests] if requests else None
+
+        async def worker():
+            while True:
+                if deadline is not None and time.perf_counter() >= deadline:
+                    return
+                if remaining is not None:
+                    if remaining[0] <= 0:
+                        return
+                    remaining[0] -= 1
+                await self._one()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return self.report(time.perf_counter() - started, concurrency)
+
+    def report(self, elapsed: float, concurrency: int) -> Dict:
+        endpoints = {}
+        all_latencies: List[float] = []
+        total_errors = 0
+        for name, latencies in self.latencies.items():
+            all_latencies.extend(latencies)
+            total_errors += self.errors[name]
+            endpoints[name] = _summary(latencies, self.errors[name], self.skipped[name], elapsed)
+        return {
+            "elapsed_s": round(elapsed, 3),
+            "concurrency": concurrency,
+            "total": _summary(all_latencies, total_errors, sum(self.skipped.values()), elapsed),
+            "endpoints": endpoints,
+        }
+
+
+def _summary(latencies: List[float], errors: int, skipped: int, elapsed: float) -> Dict:
+    count = len(latencies)
+
+    def ms(q):
+        value = percentile(latencies, q)
+        return round(value * 1000, 3) if value is not None else None
+
+    return {
+        "requests": count,
+        "rps": round(count / elapsed, 2) if elapsed > 0 else 0.0,
+        "errors": errors,
+        "error_rate": round(errors / count, 4) if count else 0.0,
+        "skipped": skipped,
+        "p50_ms": ms(50),
+        "p95_ms": ms(95),
+        "p99_ms": ms(99),
+    }
+
+
+def _parse_mix(value: str) -> Dict[str, int]:
+    mix = {}
+    for item in value.split(","):
+        name, _, weight = item.partition("=")
+        if name.strip() not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(f"Неизвестный тип запроса: {name}")
+        mix[name.strip()] = int(weight or 1)
+    return mix
+
+
+def _format_table(report: Dict) -> str:
+    lines = [f"{'endpoint':<10}{'req':>8}{'rps':>10}{'err%':>8}{'skip':>6}{'p50ms':>10}{'p95ms':>10}{'p99ms':>10}"]
+    rows = list(report["endpoints"].items()) + [("total", report["total"])]
+    for name, row in rows:
+        lines.append(
+            f"{name:<10}{row['requests']:>8}{row['rps']:>10}{row['error_rate'] * 100:>8.2f}{row['skipped']:>6}"
+            f"{str(row['p50_ms']):>10}{str(row['p95_ms']):>10}{str(row['p99_ms']):>10}"
+        )
+    return "\n".join(lines)
+
+
+async def main_async(args) -> Dict:
+    if args.in_process:
+        if args.database_url:
+            os.environ["DATABASE_URL"] = args.database_url
+        from app.database import init_db
+        from app.main import app
+
+        await init_db()
+        transport = httpx.ASGITransport(app=app)
+        client = httpx.AsyncClient(transport=transport, base_url="http://loadgen")
+    else:
+        limits = httpx.Limits(max_connections=args.concurrency)
+        client = httpx.AsyncClient(base_url=args.url, limits=limits, timeout=args.timeout)
+
+    try:
+        async with client:
+            runner = LoadRunner(client, args.mix, args.sizes, args.seed)
+            await runner.seed(args.warmup_mazes)
+            return await runner.run(args.concurrency, args.duration, args.requests)
+    finally:
+        if args.in_process:
+            # Потоки aiosqlite держат процесс, пока пул не закрыт
+            from app.database import async_engine
+            await async_engine.dispose()
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Нагрузочный тест API лабиринтов")
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--url", default="http://127.0.0.1:8000")
+    target.add_argument("--in-process", action="store_true", help="Вызывать ASGI-приложение напрямую")
+    parser.add_argument("--database-url", help="DATABASE_URL для режима --in-process")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=None, help="Длительность, с")
+    parser.add_argument("--requests", type=int, default=None, help="Всего запросов")
+    parser.add_argument("--mix", type=_parse_mix, default=DEFAULT_MIX)
+    parser.add_argument("--sizes", type=lambda v: [int(s) for s in v.split(",")], default=[11, 25, 51])
+    parser.add_argument("--warmup-mazes", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="Вывести отчет в JSON")
+    args = parser.parse_args(argv)
+    if args.duration is None and args.requests is None:
+        args.duration = 10.0
+
+    report = asyncio.run(main_async(args))
+    print(json.dumps(report, indent=2) if args.json else _format_table(report))
+    return 1 if report["total"]["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,223 @@
+"""
+Бенчмарки алгоритмов генерации и поиска пути с проверкой регрессий.
+
+Для каждой пары (размер, seed) замеряются все алгоритмы MazeGenerator и все
+алгоритмы PathFinder (на лабиринте recursive_backtracking того же seed):
+    wall_time_s        - лучшее время из --repeat прогонов (perf_counter);
+    peak_memory_bytes  - пик tracemalloc в отдельном прогоне;
+    nodes_explored     - только для поиска;
+    output_bytes       - размер результата в JSON (сетка или путь).
+
+    python -m benchmarks.suite run --sizes 11,101,1001 --seeds 1,2,3 --out current.json
+    python -m benchmarks.suite compare baseline.json current.json --threshold 0.2
+
+compare завершается с кодом 1, если медиана по seed-ам у какого-либо
+(kind, algorithm, size) хуже базовой больше чем на threshold.
+"""
+import argparse
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Tuple
+
+import orjson
+
+from app.config import get_settings
+from app.services.maze_generator import MazeGenerator
+from app.services.pathfinder import PathFinder
+
+DEFAULT_SIZES = [11, 51, 101, 501, 1001, 2001]
+DEFAULT_SEEDS = [1, 2, 3]
+METRICS = ("wall_time_s", "peak_memory_bytes")
+
+
+def _measure(func: Callable[[], object], repeat: int) -> Tuple[object, float, int]:
+    """Вернуть (результат, лучшее время, пик памяти)"""
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - started)
+
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, best, peak
+
+
+def _generate(algorithm: str, size: int, seed: int):
+    random.seed(seed)
+    return MazeGenerator(size, size).generate(algorithm)
+
+
+def bench_generators(size: int, seed: int, repeat: int) -> List[Dict]:
+    records = []
+    for algorithm in get_settings().GENERATION_ALGORITHMS:
+        (grid, _, _), wall_time, peak = _measure(
+            lambda: _generate(algorithm, size, seed), repeat
+        )
+        records.append({
+            "kind": "generator",
+            "algorithm": algorithm,
+            "size": size,
+            "seed": seed,
+            "wall_time_s": wall_time,
+            "peak_memory_bytes": peak,
+            "nodes_explored": None,
+            "output_bytes": len(orjson.dumps(grid)),
+        })
+    return records
+
+
+def bench_solvers(size: int, seed: int, repeat: int, record_steps: bool) -> List[Dict]:
+    grid, start, end = _generate("recursive_backtracking", size, seed)
+    records = []
+    for algorithm in get_settings().PATHFINDING_ALGORITHMS:
+        finder = PathFinder(grid, start, end)
+        result, wall_time, peak = _measure(
+            lambda: finder.find_path(algorithm, record_steps=record_steps), repeat
+        )
+        records.append({
+            "kind": "solver",
+            "algorithm": algorithm,
+            "size": size,
+            "seed": seed,
+            "wall_time_s": wall_time,
+            "peak_memory_bytes": peak,
+            "nodes_explored": result["stats"]["nodes_explored"],
+            "output_bytes": len(orjson.dumps(result["path"])),
+        })
+    return records
+
+
+def run(
+    sizes: List[int],
+    seeds: List[int],
+    repeat: int = 3,
+    record_steps: bool = False,
+    progress: Callable[[str], None] = lambda message: None
+) -> Dict:
+    results = []
+    for size in sizes:
+        for seed in seeds:
+            progress(f"size={size} seed={seed}")
+            results.extend(bench_generators(size, seed, repeat))
+            results.extend(bench_solvers(size, seed, repeat, record_steps))
+    return {
+        "meta": {
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "sizes": sizes,
+            "seeds": seeds,
+            "repeat": repeat,
+            "record_steps": record_steps,
+        },
+        "results": results,
+    }
+
+
+def _medians(report: Dict) -> Dict[Tuple[str, str, int], Dict[str, float]]:
+    groups: Dict[Tuple[str, str, int], List[Dict]] = {}
+    for record in report["results"]:
+        key = (record["kind"], record["algorithm"], record["size"])
+        groups.setdefault(key, []).append(record)
+    return {
+        key: {metric: statistics.median(r[metric] for r in records) for metric in METRICS}
+        for key, records in groups.items()
+    }
+
+
+def compare(
+    baseline: Dict,
+    current: Dict,
+    threshold: float = 0.2,
+    min_time: float = 0.001
+) -> List[Dict]:
+    """
+    Список регрессий: метрика выросла больше чем на threshold (доля).
+    Времена короче min_time секунд не сравниваются - это шум таймера.
+    """
+    base, cur = _medians(baseline), _medians(current)
+    regressions = []
+    for key in sorted(base.keys() & cur.keys()):
+        for metric in METRICS:
+            before, after = base[key][metric], cur[key][metric]
+            if metric == "wall_time_s" and max(before, after) < min_time:
+                continue
+            if before > 0 and after > before * (1 + threshold):
+                kind, algorithm, size = key
+                regressions.append({
+                    "kind": kind,
+                    "algorithm": algorithm,
+                    "size": size,
+                    "metric": metric,
+                    "baseline": before,
+                    "current": after,
+                    "change": after / before - 1,
+                })
+    return regressions
+
+
+def _int_list(value: str) -> List[int]:
+    return [int(item) for item in value.split(",") if item]
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Бенчмарки генерации и поиска пути")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="Прогнать матрицу размеров и seed-ов")
+    run_parser.add_argument("--sizes", type=_int_list, default=DEFAULT_SIZES)
+    run_parser.add_argument("--seeds", type=_int_list, default=DEFAULT_SEEDS)
+    run_parser.add_argument("--repeat", type=int, default=3)
+    run_parser.add_argument("--steps", action="store_true", help="Записывать трассу шагов")
+    run_parser.add_argument("--out", default="-", help="Файл результата (- для stdout)")
+
+    compare_parser = commands.add_parser("compare", help="Сравнить с базовым результатом")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=0.2)
+    compare_parser.add_argument("--min-time", type=float, default=0.001)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        report = run(
+            args.sizes, args.seeds, args.repeat, args.steps,
+            progress=lambda message: print(message, file=sys.stderr)
+        )
+        text = json.dumps(report, indent=2)
+        if args.out == "-":
+            print(text)
+        else:
+            with open(args.out, "w") as f:
+                f.write(text)
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+    regressions = compare(baseline, current, args.threshold, args.min_time)
+    for r in regressions:
+        print(
+            f"REGRESSION {r['kind']}/{r['algorithm']} size={r['size']} {r['metric']}: "
+            f"{r['baseline']:.6g} -> {r['current']:.6g} (+{r['change']:.1%})"
+        )
+    if not regressions:
+        print("OK: регрессий нет")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,43 @@
+import copy
+
+from app.config import get_settings
+from benchmarks import suite
+
+
+class TestBenchmarkSuite:
+    """Тесты набора бенчмарков"""
+
+    def setup_method(self):
+        self.report = suite.run([11], [1, 2], repeat=1)
+
+    def test_run_covers_all_algorithms(self):
+        """Каждый алгоритм генерации и поиска замерен на каждом seed"""
+        settings = get_settings()
+        records = self.report["results"]
+
+        generators = {r["algorithm"] for r in records if r["kind"] == "generator"}
+        solvers = {r["algorithm"] for r in records if r["kind"] == "solver"}
+        assert generators == set(settings.GENERATION_ALGORITHMS)
+        assert solvers == set(settings.PATHFINDING_ALGORITHMS)
+        assert len(records) == 2 * (len(generators) + len(solvers))
+
+        for record in records:
+            assert record["wall_time_s"] >= 0
+            assert record["peak_memory_bytes"] > 0
+            assert record["output_bytes"] > 0
+            if record["kind"] == "solver":
+                assert record["nodes_explored"] > 0
+
+    def test_compare_detects_regression(self):
+        """compare сообщает о замедлении выше порога и молчит без изменений"""
+        assert suite.compare(self.report, self.report) == []
+
+        slower = copy.deepcopy(self.report)
+        for record in slower["results"]:
+            if record["algorithm"] == "bfs":
+                record["wall_time_s"] = max(record["wall_time_s"], 0.01) * 2
+                record["peak_memory_bytes"] *= 2
+
+        regressions = suite.compare(self.report, slower, threshold=0.2, min_time=0.0)
+        assert {r["algorithm"] for r in regressions} == {"bfs"}
+        assert {r["metric"] for r in regressions} == {"wall_time_s", "peak_memory_bytes"}
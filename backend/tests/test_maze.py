@@ -1,29 +1,90 @@
+import asyncio
+import gzip
+import io
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+import msgpack
+import numpy as np
+import orjson
+import pytest
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import insert, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from benchmarks.loadgen import LoadRunner, percentile
+from app.config import get_settings
 from app.main import app
-from app.database import Base, get_db
+from app.models.maze import Maze
+from app.database import Base, get_db, get_session_factory, create_db_engine, create_async_db_engine, create_schema
+from app.api.responses import RawJSON, dumps
+from app.schemas.maze import MazeResponse, SolutionResponse
+from app.services.grid_codec import unpack_grid, unpack_points, unpack_steps
+from app.repositories.job_repository import JobRepository
+from app.services.admission import (
+    AdmissionController,
+    AdmissionRejected,
+    get_admission_controller,
+    solve_cost
+)
+from app.services.grid_codec import pack_grid
+from app.services.grid_store import GridStore, PackedGrid, get_grid_store
+from app.services.analytics import analyze_grid, component_sizes, refresh_metrics
+from app.services.batch_paths import assemble_results, group_queries, split_groups
+from app.services.bitboard import bitboard_paths, open_tiles
+from app.services.compare import run_compare_solve, share_grid
+from app.services.ephemeral import generate_and_solve
+from app.services.executor import create_cpu_executor, get_request_executor
+from app.services.job_queue import JobQueue, get_job_queue, run_solve
+from app.services.live_solve import LiveControl, LiveSolveSession
+from app.services.maze_generator import MazeGenerator
+from app.services.metrics import Histogram
+from app.services.profiler import RequestProfiler
+from app.services.pathfinder import PathFinder, SearchBudget
+from app.services.replanner import IncrementalPlanner, ReplannerCache
+from app.services.response_cache import ResponseCache, get_response_cache
+from app.services.rollups import ZERO_BUCKET, rebuild_rollups, sketch_bucket, sketch_quantiles
+from app.services.shared_cache import SharedGridCache, get_shared_grid_cache
+from app.services.transfer import TransferError, read_records
+from app.services.write_behind import IdAllocator, WriteBehindBuffer, get_write_behind
 
-# Создание тестовой БД в памяти
-SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
-engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
-TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Создание тестовой БД: во временном каталоге, рядом с кодом не остаются test.db, -wal и -shm
+test_db_dir = tempfile.mkdtemp(prefix="maze_test_db_")
+SQLALCHEMY_DATABASE_URL = f"sqlite:///{os.path.join(test_db_dir, 'test.db')}"
+engine = create_db_engine(SQLALCHEMY_DATABASE_URL)
+async_engine = create_async_db_engine(SQLALCHEMY_DATABASE_URL)
+TestingSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
 
 Base.metadata.create_all(bind=engine)
 
 
-def override_get_db():
-    try:
-        db = TestingSessionLocal()
+async def override_get_db():
+    async with TestingSessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
 
+test_grid_store = GridStore(tempfile.mkdtemp(prefix="maze_grids_"))
+
 app.dependency_overrides[get_db] = override_get_db
+app.dependency_overrides[get_session_factory] = lambda: TestingSessionLocal
+app.dependency_overrides[get_grid_store] = lambda: test_grid_store
 client = TestClient(app)
 
 
+@pytest.fixture(scope="session", autouse=True)
+def remove_test_files():
+    yield
+    engine.dispose()
+    shutil.rmtree(test_db_dir, ignore_errors=True)
+    shutil.rmtree(test_grid_store.root, ignore_errors=True)
+
+
 class TestMazeGeneration:
     """Тесты генерации лабиринтов"""
     
@@ -339,6 +400,1859 @@ class TestAPIGeneral:
         assert response.status_code == 200
 
 
+class TestWriteBehind:
+    """Тесты отложенной записи"""
+    
+    def setup_method(self):
+        self.buffer = WriteBehindBuffer(TestingSessionLocal, batch_size=1000, flush_interval=60)
+        app.dependency_overrides[get_write_behind] = lambda: self.buffer
+    
+    def teardown_method(self):
+        app.dependency_overrides.pop(get_write_behind, None)
+    
+    def test_read_your_writes_before_flush(self):
+        """Созданный лабиринт и решение доступны до записи в БД"""
+        response = client.post(
+            "/api/maze/generate",
+            json={"width": 11, "height": 11, "algorithm": "prims"}
+        )
+        assert response.status_code == 200
+        maze_id = response.json()["id"]
+        assert self.buffer.pending == 1
+        
+        assert client.get(f"/api/maze/{maze_id}").status_code == 200
+        
+        response = client.post(f"/api/maze/{maze_id}/solve", json={"algorithm": "bfs"})
+        assert response.status_code == 200
+        solutions = client.get(f"/api/maze/{maze_id}/solutions").json()
+        assert [s["id"] for s in solutions] == [response.json()["id"]]
+    
+    def test_flush_persists_batch(self):
+        """После flush строки читаются из БД с теми же ID"""
+        ids = [
+            client.post(
+                "/api/maze/generate",
+                json={"width": 11, "height": 11, "algorithm": "kruskals"}
+            ).json()["id"]
+            for _ in range(3)
+        ]
+        assert len(set(ids)) == 3
+        
+        assert asyncio.run(self.buffer.flush()) == 3
+        assert self.buffer.pending == 0
+        assert self.buffer.get_maze(ids[0]) is None
+        
+        for maze_id in ids:
+            assert client.get(f"/api/maze/{maze_id}").json()["id"] == maze_id
+    
+    def test_delete_pending_maze(self):
+        """Удаление еще не записанного лабиринта"""
+        maze_id = client.post(
+            "/api/maze/generate",
+            json={"width": 11, "height": 11, "algorithm": "prims"}
+        ).json()["id"]
+        
+        assert client.delete(f"/api/maze/{maze_id}").status_code == 200
+        assert self.buffer.pending == 0
+        assert client.get(f"/api/maze/{maze_id}").status_code == 404
+    
+    def test_delete_waits_for_inflight_flush(self):
+        """Удаление ждет пачку, которую уже пишет flush: лабиринт не воскресает"""
+        maze_id = client.post("/api/maze/generate", json={"width": 11, "height": 11}).json()["id"]
+        client.post(f"/api/maze/{maze_id}/solve", json={"algorithm": "bfs"})
+        
+        async def scenario():
+            entered, release = asyncio.Event(), asyncio.Event()
+            write = self.buffer._write
+            
+            async def stalled_write(rows):
+                entered.set()
+                await release.wait()
+                await write(rows)
+            
+            self.buffer._write = stalled_write
+            transport = httpx.ASGITransport(app=app)
+            try:
+                async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+                    flushing = asyncio.create_task(self.buffer.flush())
+                    await entered.wait()
+                    deleting = asyncio.create_task(http.delete(f"/api/maze/{maze_id}"))
+                    await asyncio.sleep(0.2)
+                    waited = not deleting.done()
+                    release.set()
+                    await flushing
+                    deleted = await deleting
+                    return waited, deleted, await http.get(f"/api/maze/{maze_id}")
+            finally:
+                await async_engine.dispose()
+        
+        waited, deleted, after = asyncio.run(scenario())
+        
+        assert waited
+        assert deleted.status_code == 200
+        assert after.status_code == 404
+    
+    def test_concurrent_reservations_and_direct_writers(self):
+        """Первое резервирование без гонки, обычный INSERT не попадает в блок"""
+        async def scenario():
+            async with TestingSessionLocal() as db:
+                async with db.begin():
+                    await db.execute(text("DELETE FROM id_sequences"))
+            allocators = [IdAllocator(TestingSessionLocal, 50) for _ in range(4)]
+            starts = await asyncio.gather(*(a.next_id(Maze) for a in allocators))
+            await async_engine.dispose()
+            return starts
+        
+        starts = sorted(asyncio.run(scenario()))
+        for start, next_start in zip(starts, starts[1:]):
+            assert next_start - start >= 50
+        
+        app.dependency_overrides.pop(get_write_behind)
+        direct_id = client.post("/api/maze/generate", json={"width": 11, "height": 11}).json()["id"]
+        assert direct_id >= starts[-1] + 50
+    
+    def test_conflicting_row_dropped_after_retries(self):
+        """Строка с занятым ID после max_attempts отбрасывается, остальные пишутся"""
+        self.buffer.max_attempts = 2
+        ids = [
+            client.post("/api/maze/generate", json={"width": 11, "height": 11}).json()["id"]
+            for _ in range(2)
+        ]
+        
+        async def scenario():
+            async with TestingSessionLocal() as db:
+                async with db.begin():
+                    # Строка с тем же ID, записанная в обход буфера
+                    pending = self.buffer.get_maze(ids[0])
+                    row = {c.key: getattr(pending, c.key) for c in Maze.__table__.columns}
+                    await db.execute(insert(Maze), [row])
+            with pytest.raises(IntegrityError):
+                await self.buffer.flush()
+            written = await self.buffer.flush()
+            await async_engine.dispose()
+            return written
+        
+        assert asyncio.run(scenario()) == 1
+        assert self.buffer.dropped == 1
+        assert self.buffer.pending == 0
+        assert client.get(f"/api/maze/{ids[1]}").status_code == 200
+
+
+class TestFastSerialization:
+    """Тесты быстрого пути сериализации"""
+    
+    def test_maze_matches_pydantic_model(self):
+        """Ответ без валидации совпадает с сериализацией через MazeResponse"""
+        maze_id = client.post(
+            "/api/maze/generate",
+            json={"width": 12, "height": 9, "algorithm": "prims"}
+        ).json()["id"]
+        
+        data = client.get(f"/api/maze/{maze_id}").json()
+        validated = MazeResponse.model_validate(data).model_dump(mode="json")
+        assert data == validated
+    
+    def test_solution_matches_pydantic_model(self):
+        """Ответ решения совпадает с сериализацией через SolutionResponse"""
+        maze_id = client.post(
+            "/api/maze/generate",
+            json={"width": 11, "height": 11, "algorithm": "kruskals"}
+        ).json()["id"]
+        
+        data = client.post(f"/api/maze/{maze_id}/solve", json={"algorithm": "astar"}).json()
+        validated = SolutionResponse.model_validate(data).model_dump(mode="json")
+        assert data == validated
+    
+    def test_raw_json_spliced_verbatim(self):
+        """RawJSON вставляется в ответ без повторного кодирования"""
+        body = dumps({"id": 1, "grid": RawJSON("[[0, 1], [1, 0]]"), "items": [RawJSON(b"[]")]})
+        assert body == b'{"id":1,"grid":[[0, 1], [1, 0]],"items":[[]]}'
+    
+    def test_openapi_schema_unchanged(self):
+        """Схема OpenAPI по-прежнему ссылается на модели ответов"""
+        schema = client.get("/openapi.json").json()
+        get_maze = schema["paths"]["/api/maze/{maze_id}"]["get"]
+        content = get_maze["responses"]["200"]["content"]["application/json"]
+        assert content["schema"]["$ref"].endswith("/MazeResponse")
+
+
+class TestBinaryNegotiation:
+    """Тесты выдачи MessagePack по заголовку Accept"""
+    
+    def setup_method(self):
+        response = client.post(
+            "/api/maze/generate",
+            json={"width": 13, "height": 11, "algorithm": "recursive_backtracking"}
+        )
+        self.maze = response.json()
+    
+    def test_json_is_default(self):
+        """Без Accept и с */* возвращается JSON"""
+        for accept in (None, "*/*"):
+            headers = {"Accept": accept} if accept else {}
+            response = client.get(f"/api/maze/{self.maze['id']}", headers=headers)
+            assert response.headers["content-type"] == "application/json"
+            assert response.headers["vary"] == "Accept"
+    
+    def test_maze_msgpack_packed_grid(self):
+        """Сетка в MessagePack совпадает с JSON после распаковки"""
+        response = client.get(
+            f"/api/maze/{self.maze['id']}",
+            headers={"Accept": "application/json;q=0.5, application/x-msgpack"}
+        )
+        assert response.headers["content-type"] == "application/x-msgpack"
+        data = msgpack.unpackb(response.content)
+        
+        assert data["id"] == self.maze["id"]
+        assert len(data["grid"]) == (13 * 11 + 7) // 8
+        assert unpack_grid(data["grid"], data["width"], data["height"]) == self.maze["grid"]
+    
+    def test_solve_msgpack_path_and_steps(self):
+        """Путь и delta-трасса восстанавливаются из бинарного ответа"""
+        maze_id = self.maze["id"]
+        response = client.post(
+            f"/api/maze/{maze_id}/solve",
+            json={"algorithm": "bfs"},
+            headers={"Accept": "application/x-msgpack"}
+        )
+        data = msgpack.unpackb(response.content)
+        
+        solutions = client.get(f"/api/maze/{maze_id}/solutions").json()
+        expected = next(s for s in solutions if s["id"] == data["id"])
+        
+        assert [list(p) for p in unpack_points(data["path"])] == expected["path"]
+        steps = unpack_steps(data["steps"])
+        assert len(steps) == len(expected["steps"])
+        last, expected_last = steps[-1], expected["steps"][-1]
+        assert sorted(map(list, last["visited"])) == sorted(expected_last["visited"])
+        assert [list(p) for p in last["frontier"]] == expected_last["frontier"]
+
+
+class TestGridStore:
+    """Тесты файлового хранилища больших сеток"""
+    
+    def test_large_maze_stored_in_file(self):
+        """Большой лабиринт хранится в файле и читается через mmap"""
+        data = client.post(
+            "/api/maze/generate",
+            json={"width": 70, "height": 70, "algorithm": "kruskals"}
+        ).json()
+        maze_id = data["id"]
+        
+        with engine.connect() as conn:
+            grid, grid_file = conn.exec_driver_sql(
+                "SELECT grid, grid_file FROM mazes WHERE id = ?", (maze_id,)
+            ).one()
+        assert grid == ""
+        assert os.path.exists(os.path.join(test_grid_store.root, grid_file))
+        
+        mapped = test_grid_store.open(grid_file)
+        assert mapped.to_list() == data["grid"]
+        assert client.get(f"/api/maze/{maze_id}").json()["grid"] == data["grid"]
+        
+        response = client.post(f"/api/maze/{maze_id}/solve", json={"algorithm": "astar"})
+        assert response.status_code == 200
+        assert response.json()["stats"]["path_length"] > 0
+        
+        client.delete(f"/api/maze/{maze_id}")
+        assert not os.path.exists(os.path.join(test_grid_store.root, grid_file))
+    
+    def test_tile(self):
+        """Фрагмент совпадает со срезом сетки и обрезается по границе"""
+        data = client.post(
+            "/api/maze/generate",
+            json={"width": 70, "height": 70, "algorithm": "prims"}
+        ).json()
+        
+        response = client.get(
+            f"/api/maze/{data['id']}/tile",
+            params={"x": 60, "y": 5, "width": 20, "height": 3}
+        )
+        assert response.status_code == 200
+        tile = response.json()
+        assert tile["width"] == 10
+        assert tile["grid"] == [row[60:70] for row in data["grid"][5:8]]
+
+
+class TestMetrics:
+    """Тесты эндпоинта /metrics"""
+    
+    def test_metrics_exposition(self):
+        """Гистограммы запросов, генерации и поиска в формате Prometheus"""
+        maze_id = client.post(
+            "/api/maze/generate",
+            json={"width": 15, "height": 15, "algorithm": "prims"}
+        ).json()["id"]
+        client.post(f"/api/maze/{maze_id}/solve", json={"algorithm": "bfs"})
+        
+        response = client.get("/metrics")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+        text = response.text
+        
+        assert "# TYPE http_request_duration_seconds histogram" in text
+        assert (
+            'http_request_duration_seconds_count{method="POST",'
+            'route="/api/maze/{maze_id}/solve",status="200"}'
+        ) in text
+        assert 'maze_generation_seconds_bucket{algorithm="prims",size_bucket="<=16",le="+Inf"}' in text
+        assert 'maze_solve_nodes_explored_count{algorithm="bfs",size_bucket="<=16"}' in text
+        assert 'http_response_size_bytes_sum{method="POST",route="/api/maze/generate"}' in text
+        assert 'db_query_duration_seconds_count{statement="INSERT"}' in text
+    
+    def test_histogram_buckets_cumulative(self):
+        """Корзины гистограммы накопительные, count совпадает с +Inf"""
+        histogram = Histogram("test_seconds", "Тест", ("kind",), buckets=(0.1, 1.0))
+        for value in (0.05, 0.5, 5.0):
+            histogram.observe(value, kind="a")
+        
+        lines = list(histogram.samples())
+        assert lines == [
+            'test_seconds_bucket{kind="a",le="0.1"} 1',
+            'test_seconds_bucket{kind="a",le="1"} 2',
+            'test_seconds_bucket{kind="a",le="+Inf"} 3',
+            'test_seconds_sum{kind="a"} 5.55',
+            'test_seconds_count{kind="a"} 3',
+        ]
+
+
+class TestServerTiming:
+    """Тесты Server-Timing и профилирования"""
+    
+    def setup_method(self):
+        self.settings = get_settings()
+        self.saved = (self.settings.PROFILE_HEADER_ENABLED, self.settings.PROFILE_DIR)
+        self.settings.PROFILE_DIR = tempfile.mkdtemp(prefix="maze_profiles_")
+    
+    def teardown_method(self):
+        self.settings.PROFILE_HEADER_ENABLED, self.settings.PROFILE_DIR = self.saved
+    
+    def test_solve_phases(self):
+        """Фазы поиска перечислены в заголовке Server-Timing"""
+        maze_id = client.post(
+            "/api/maze/generate",
+            json={"width": 15, "height": 15, "algorithm": "prims"}
+        ).json()["id"]
+        response = client.post(f"/api/maze/{maze_id}/solve", json={"algorithm": "astar"})
+        
+        phases = {
+            item.split(";")[0].strip()
+            for item in response.headers["server-timing"].split(",")
+        }
+        assert {"db", "decode", "search", "encode", "serialize", "total"} <= phases
+    
+    def test_profile_header_ignored_when_disabled(self):
+        """Без разрешения в настройках заголовок не включает профилирование"""
+        self.settings.PROFILE_HEADER_ENABLED = False
+        response = client.get("/health", headers={"X-Profile": "1"})
+        assert "x-profile-id" not in response.headers
+    
+    def test_profile_header(self):
+        """Профиль сохраняется и доступен через /debug/profiles"""
+        self.settings.PROFILE_HEADER_ENABLED = True
+        response = client.get("/api/maze/?page=1&size=5", headers={"X-Profile": "1"})
+        profile_id = response.headers["x-profile-id"]
+        
+        assert os.path.exists(os.path.join(self.settings.PROFILE_DIR, f"{profile_id}.prof"))
+        report = client.get(f"/debug/profiles/{profile_id}")
+        assert report.status_code == 200
+        assert "cumulative" in report.text
+    
+    def test_stop_after_dump_error(self):
+        """Ошибка записи .prof: повторный stop() не освобождает блокировку дважды"""
+        with tempfile.NamedTemporaryFile() as occupied:
+            # Каталог профилей не создать: путь занят файлом
+            self.settings.PROFILE_DIR = os.path.join(occupied.name, "profiles")
+            profiler = RequestProfiler()
+            assert profiler.start()
+            with pytest.raises(OSError):
+                asyncio.run(profiler.stop())
+            assert asyncio.run(profiler.stop()) is None
+        
+        self.settings.PROFILE_DIR = tempfile.mkdtemp(prefix="maze_profiles_")
+        again = RequestProfiler()
+        assert again.start()
+        assert asyncio.run(again.stop()) is not None
+    
+    def test_old_profiles_removed(self, monkeypatch):
+        """В PROFILE_DIR остаются последние PROFILE_MAX_FILES профилей"""
+        monkeypatch.setattr(self.settings, "PROFILE_MAX_FILES", 2)
+        self.settings.PROFILE_HEADER_ENABLED = True
+        profile_ids = [
+            client.get("/health", headers={"X-Profile": "1"}).headers["x-profile-id"]
+            for _ in range(4)
+        ]
+        
+        saved = sorted(os.listdir(self.settings.PROFILE_DIR))
+        assert saved == sorted(f"{profile_id}.prof" for profile_id in profile_ids[-2:])
+    
+    def test_profile_includes_threadpool_search(self):
+        """Поиск в пуле потоков попадает в профиль запроса"""
+        self.settings.PROFILE_HEADER_ENABLED = True
+        maze_id = client.post(
+            "/api/maze/generate",
+            json={"width": 61, "height": 61, "algorithm": "prims"}
+        ).json()["id"]
+        response = client.post(
+            f"/api/maze/{maze_id}/solve", json={"algorithm": "astar"}, headers={"X-Profile": "1"}
+        )
+        profile_id = response.headers["x-profile-id"]
+        
+        report = client.get(f"/debug/profiles/{profile_id}")
+        assert "pathfinder.py" in report.text
+        assert "find_path" in report.text
+
+
+class TestLoadGenerator:
+    """Тесты нагрузочного генератора"""
+    
+    def test_in_process_run(self):
+        """Отчет содержит все эндпоинты смеси и перцентили"""
+        async def scenario():
+            transport = httpx.ASGITransport(app=app)
+            try:
+                async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+                    runner = LoadRunner(http, {"generate": 1, "get": 2, "list": 1, "solve": 1}, [11])
+                    await runner.seed(2)
+                    return await runner.run(concurrency=4, requests=40)
+            finally:
+                # Соединения пула привязаны к этому event loop
+                await async_engine.dispose()
+        
+        report = asyncio.run(scenario())
+        
+        assert report["total"]["requests"] == 40
+        assert report["total"]["errors"] == 0
+        assert set(report["endpoints"]) == {"generate", "get", "list", "solve"}
+        total = report["total"]
+        assert total["p50_ms"] <= total["p95_ms"] <= total["p99_ms"]
+    
+    def test_skips_reads_without_mazes(self):
+        """Без лабиринтов get и solve пропускаются, а не падают с IndexError"""
+        async def scenario():
+            transport = httpx.ASGITransport(app=app)
+            try:
+                async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+                    runner = LoadRunner(http, {"get": 1, "solve": 1}, [11])
+                    return await runner.run(concurrency=2, requests=10)
+            finally:
+                await async_engine.dispose()
+        
+        report = asyncio.run(scenario())
+        
+        assert report["total"]["skipped"] == 10
+        assert report["total"]["requests"] == 0
+        assert report["total"]["errors"] == 0
+    
+    def test_percentile_nearest_rank(self):
+        """Перцентиль по ближайшему рангу"""
+        values = list(range(1, 101))
+        assert percentile(values, 50) == 50
+        assert percentile(values, 99) == 99
+        assert percentile([], 50) is None
+
+
+class TestSolverInstrumentation:
+    """Тесты счетчиков поиска в SolutionStats"""
+    
+    def _maze(self, size=21):
+        response = client.post(
+            "/api/maze/generate",
+            json={"width": size, "height": size, "algorithm": "prims"}
+        )
+        return response.json()
+    
+    def test_solve_returns_counters(self):
+        """Решение содержит счетчики и время поиска без трассы"""
+        maze = self._maze()
+        response = client.post(f"/api/maze/{maze['id']}/solve", json={"algorithm": "astar"})
+        
+        stats = response.json()["stats"]
+        assert stats["search_time_ns"] > 0
+        assert stats["trace_time_ns"] > 0
+        assert stats["search_time_ns"] + stats["trace_time_ns"] <= stats["execution_time"] * 1e9 + 1
+        assert stats["heap_pops"] <= stats["heap_pushes"]
+        assert stats["neighbor_checks"] >= stats["nodes_explored"]
+        assert 0 < stats["peak_frontier"] <= stats["heap_pushes"]
+        assert stats["peak_memory_bytes"] > 0
+        
+        saved = client.get(f"/api/maze/{maze['id']}/solutions").json()
+        assert saved[0]["stats"] == stats
+    
+    def test_bfs_counters(self):
+        """BFS кладет каждую посещенную клетку во фронтир ровно один раз"""
+        maze = self._maze()
+        grid, start, end = maze["grid"], tuple(maze["start"]), tuple(maze["end"])
+        
+        stats = PathFinder(grid, start, end).find_path("bfs", record_steps=False)["stats"]
+        
+        assert stats["heap_pushes"] == stats["nodes_explored"]
+        assert stats["trace_time_ns"] == 0
+        assert stats["search_time_ns"] > 0
+
+
+class TestJobQueue:
+    """Тесты очереди фоновых задач"""
+    
+    def _run(self, scenario, **queue_options):
+        """Сценарий с отдельной очередью на потоках и ASGI-клиентом в одном event loop"""
+        async def runner():
+            queue = JobQueue(
+                TestingSessionLocal, test_grid_store, ThreadPoolExecutor(2),
+                poll_interval=0.05, **queue_options
+            )
+            app.dependency_overrides[get_job_queue] = lambda: queue
+            transport = httpx.ASGITransport(app=app)
+            try:
+                async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+                    return await scenario(queue, http)
+            finally:
+                await queue.stop()
+                del app.dependency_overrides[get_job_queue]
+                await async_engine.dispose()
+        
+        return asyncio.run(runner())
+    
+    def test_generate_and_solve_jobs(self):
+        """Задачи выполняются воркерами, long-poll возвращает результат"""
+        async def scenario(queue, http):
+            await queue.start()
+            response = await http.post(
+                "/api/jobs/generate",
+                json={"width": 151, "height": 151, "algorithm": "prims", "priority": 5}
+            )
+            assert response.status_code == 202
+            assert response.json()["status"] == "queued"
+            job = (await http.get(f"/api/jobs/{response.json()['id']}", params={"wait": 10})).json()
+            assert job["status"] == "succeeded", job
+            maze_id = job["result"]["maze_id"]
+            
+            response = await http.post(
+                "/api/jobs/solve", json={"maze_id": maze_id, "algorithm": "bfs"}
+            )
+            job = (await http.get(f"/api/jobs/{response.json()['id']}", params={"wait": 10})).json()
+            assert job["status"] == "succeeded", job
+            solutions = (await http.get(f"/api/maze/{maze_id}/solutions")).json()
+            return maze_id, job, solutions
+        
+        maze_id, job, solutions = self._run(scenario)
+        
+        assert solutions[0]["id"] == job["result"]["solution_id"]
+        assert solutions[0]["steps"] == []
+        assert client.get(f"/api/maze/{maze_id}").json()["width"] == 151
+    
+    def test_priority_and_cancel(self):
+        """Задача с большим приоритетом забирается первой, отмена до выполнения"""
+        async def scenario(queue, http):
+            low = (await http.post(
+                "/api/jobs/generate", json={"width": 11, "height": 11, "priority": -100}
+            )).json()
+            high = (await http.post(
+                "/api/jobs/generate", json={"width": 11, "height": 11, "priority": 100}
+            )).json()
+            async with TestingSessionLocal() as db:
+                claimed = await JobRepository(db).claim_next()
+                await JobRepository(db).requeue([claimed.id])
+            
+            cancelled = await http.post(f"/api/jobs/{low['id']}/cancel")
+            await http.post(f"/api/jobs/{high['id']}/cancel")
+            again = await http.post(f"/api/jobs/{low['id']}/cancel")
+            return claimed.id, high["id"], cancelled, again
+        
+        claimed_id, high_id, cancelled, again = self._run(scenario)
+        
+        assert claimed_id == high_id
+        assert cancelled.status_code == 200
+        assert cancelled.json()["status"] == "cancelled"
+        assert again.json()["status"] == "cancelled"
+    
+    def test_start_keeps_leased_jobs(self):
+        """Старт соседнего процесса не трогает задачи с живой арендой, истекшие - возвращает"""
+        async def scenario(queue, http):
+            job = (await http.post(
+                "/api/jobs/generate", json={"width": 11, "height": 11}
+            )).json()
+            async with TestingSessionLocal() as db:
+                repo = JobRepository(db)
+                claimed = await repo.claim_next("other-worker", lease=60)
+            await queue.start()
+            await asyncio.sleep(0.2)
+            kept = (await http.get(f"/api/jobs/{job['id']}")).json()
+            
+            async with TestingSessionLocal() as db:
+                repo = JobRepository(db)
+                assert await repo.renew("other-worker", [claimed.id], lease=-1) == 1
+                assert await repo.requeue_expired() == 1
+                assert not await repo.is_owned(claimed.id, "other-worker")
+            done = (await http.get(f"/api/jobs/{job['id']}", params={"wait": 10})).json()
+            
+            async with TestingSessionLocal() as db:
+                # Просроченный владелец не может записать результат
+                finished = await JobRepository(db).finish(claimed.id, "failed", owner="other-worker")
+            return claimed.id, job["id"], kept, done, finished
+        
+        claimed_id, job_id, kept, done, finished = self._run(scenario)
+        
+        assert claimed_id == job_id
+        assert kept["status"] == "running"
+        assert done["status"] == "succeeded", done
+        assert finished is False
+    
+    def test_queue_full_and_missing(self):
+        """Переполненная очередь - 503, несуществующие задача и лабиринт - 404"""
+        async def scenario(queue, http):
+            full = await http.post("/api/jobs/generate", json={"width": 11, "height": 11})
+            missing_job = await http.get("/api/jobs/999999")
+            missing_maze = await http.post("/api/jobs/solve", json={"maze_id": 999999})
+            return full, missing_job, missing_maze
+        
+        full, missing_job, missing_maze = self._run(scenario, max_queued=0)
+        
+        assert full.status_code == 503
+        assert "retry-after" in full.headers
+        assert missing_job.status_code == 404
+        assert missing_maze.status_code == 404
+    
+    def test_record_steps_limited_by_size(self, monkeypatch):
+        """Трасса для лабиринта больше JOB_MAX_TRACE_CELLS отклоняется с 422"""
+        monkeypatch.setattr(get_settings(), "JOB_MAX_TRACE_CELLS", 100)
+        maze_id = client.post(
+            "/api/maze/generate", json={"width": 11, "height": 11, "algorithm": "recursive_backtracking"}
+        ).json()["id"]
+        
+        async def scenario(queue, http):
+            traced = await http.post("/api/jobs/solve", json={"maze_id": maze_id, "record_steps": True})
+            plain = await http.post("/api/jobs/solve", json={"maze_id": maze_id})
+            return traced, plain
+        
+        traced, plain = self._run(scenario)
+        
+        assert traced.status_code == 422
+        assert "record_steps" in traced.json()["detail"]
+        assert plain.status_code == 202
+
+
+class TestLiveSolve:
+    """Тесты WebSocket-канала пошагового решения"""
+    
+    def _maze(self):
+        return client.post(
+            "/api/maze/generate",
+            json={"width": 21, "height": 21, "algorithm": "recursive_backtracking"}
+        ).json()
+    
+    def _receive_until(self, ws, types, ack=True):
+        frames = []
+        while True:
+            message = ws.receive_json()
+            if message["type"] == "frame":
+                frames.append(message)
+                if ack:
+                    ws.send_json({"type": "ack", "seq": message["seq"]})
+            elif message["type"] in types:
+                return frames, message
+    
+    def test_streams_frames_and_saves_solution(self):
+        """Кадры покрывают все раскрытые клетки, итог совпадает с обычным решением"""
+        maze = self._maze()
+        expected = client.post(f"/api/maze/{maze['id']}/solve", json={"algorithm": "astar"}).json()
+        
+        with client.websocket_connect(
+            f"/ws/maze/{maze['id']}/solve?algorithm=astar&fps=120&steps_per_frame=5"
+        ) as ws:
+            assert ws.receive_json()["type"] == "start"
+            frames, done = self._receive_until(ws, {"done"})
+        
+        assert [f["seq"] for f in frames] == list(range(1, len(frames) + 1))
+        expanded = [tuple(cell) for f in frames for cell in f["expanded"]]
+        assert len(expanded) == done["step_count"] == len(expected["steps"])
+        assert [tuple(cell) for cell in done["path"]] == [tuple(c) for c in expected["path"]]
+        assert done["stats"]["nodes_explored"] == expected["stats"]["nodes_explored"]
+        
+        solutions = client.get(f"/api/maze/{maze['id']}/solutions").json()
+        saved = next(s for s in solutions if s["id"] == done["solution_id"])
+        assert saved["steps"] == []
+    
+    def test_merges_frames_without_acks(self):
+        """Без подтверждений уходит не больше window кадров, остальное сливается"""
+        maze = self._maze()
+        
+        with client.websocket_connect(
+            f"/ws/maze/{maze['id']}/solve?algorithm=bfs&fps=120&steps_per_frame=2&save=false"
+        ) as ws:
+            start = ws.receive_json()
+            frames, done = self._receive_until(ws, {"done"}, ack=False)
+        
+        assert len(frames) <= start["window"] + 1
+        assert sum(f["steps"] for f in frames) == done["step_count"]
+        assert frames[-1]["steps"] > start["steps_per_frame"]
+        assert done["solution_id"] is None
+    
+    def test_tick_budget_limits_steps(self):
+        """Тик прерывается по бюджету времени, даже если steps_per_frame больше"""
+        grid = [[0] * 7 for _ in range(7)]
+        finder = PathFinder(grid, (0, 0), (6, 6))
+        messages = []
+        
+        async def send(message):
+            messages.append(message)
+        
+        control = LiveControl(120, 100, 120, 5000)
+        session = LiveSolveSession(finder, "bfs", control, send, window=1000, tick_budget_ms=0)
+        result = asyncio.run(session.run())
+        
+        frames = [m for m in messages if m["type"] == "frame"]
+        assert all(f["steps"] == 1 for f in frames)
+        assert len(frames) == result["step_count"]
+        assert result["path"][-1] == (6, 6)
+    
+    def test_pause_and_abort(self):
+        """Пауза останавливает поиск, отмена завершает сессию"""
+        maze = self._maze()
+        
+        with client.websocket_connect(
+            f"/ws/maze/{maze['id']}/solve?algorithm=dfs&fps=1"
+        ) as ws:
+            ws.receive_json()
+            ws.send_json({"type": "pause"})
+            ws.send_json({"type": "step"})
+            ws.send_json({"type": "abort"})
+            frames, aborted = self._receive_until(ws, {"aborted"})
+        
+        assert aborted["step_count"] <= 2
+    
+    def test_unknown_maze(self):
+        """Несуществующий лабиринт - сообщение об ошибке"""
+        with client.websocket_connect("/ws/maze/999999/solve") as ws:
+            message = ws.receive_json()
+        
+        assert message["type"] == "error"
+    
+    def test_bitboard_has_no_live_mode(self):
+        """У bfs_bitboard нет пошаговой трассы - сообщение об ошибке"""
+        maze = self._maze()
+        with client.websocket_connect(f"/ws/maze/{maze['id']}/solve?algorithm=bfs_bitboard") as ws:
+            message = ws.receive_json()
+        
+        assert message["type"] == "error"
+        assert "bfs_bitboard" in message["detail"]
+
+
+class TestHttpCaching:
+    """Тесты ETag, 304 и кеша сериализованных ответов"""
+    
+    def _maze(self):
+        return client.post("/api/maze/generate", json={"width": 11, "height": 11}).json()
+    
+    def test_maze_etag_and_not_modified(self):
+        """ETag по ревизии и формату, 304 по If-None-Match"""
+        maze = self._maze()
+        response = client.get(f"/api/maze/{maze['id']}")
+        etag = response.headers["etag"]
+        
+        assert response.headers["cache-control"] == "no-cache"
+        assert response.headers["vary"] == "Accept"
+        
+        cached = client.get(f"/api/maze/{maze['id']}", headers={"If-None-Match": f"W/{etag}"})
+        assert cached.status_code == 304
+        assert cached.content == b""
+        assert cached.headers["etag"] == etag
+        
+        binary = client.get(
+            f"/api/maze/{maze['id']}",
+            headers={"Accept": "application/x-msgpack", "If-None-Match": etag}
+        )
+        assert binary.status_code == 200
+        assert binary.headers["etag"] != etag
+    
+    def test_deleted_maze_is_not_revalidated(self):
+        """После удаления старый ETag дает 404, а не 304"""
+        maze = self._maze()
+        etag = client.get(f"/api/maze/{maze['id']}").headers["etag"]
+        client.delete(f"/api/maze/{maze['id']}")
+        
+        response = client.get(f"/api/maze/{maze['id']}", headers={"If-None-Match": etag})
+        assert response.status_code == 404
+    
+    def test_recreated_maze_gets_new_id(self):
+        """ID удаленного последнего лабиринта не выдается снова, старый ETag не совпадает"""
+        maze = self._maze()
+        etag = client.get(f"/api/maze/{maze['id']}").headers["etag"]
+        client.delete(f"/api/maze/{maze['id']}")
+        
+        recreated = self._maze()
+        assert recreated["id"] > maze["id"]
+        response = client.get(f"/api/maze/{recreated['id']}", headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.headers["etag"] != etag
+    
+    def test_legacy_tables_rebuilt_with_autoincrement(self):
+        """Таблицы без AUTOINCREMENT пересоздаются с сохранением строк"""
+        legacy = create_db_engine("sqlite://")
+        with legacy.begin() as conn:
+            conn.exec_driver_sql(
+                "CREATE TABLE mazes (id INTEGER NOT NULL PRIMARY KEY, width INTEGER NOT NULL, "
+                "height INTEGER NOT NULL, grid TEXT NOT NULL, start_x INTEGER NOT NULL, "
+                "start_y INTEGER NOT NULL, end_x INTEGER NOT NULL, end_y INTEGER NOT NULL, "
+                "algorithm VARCHAR(50) NOT NULL, created_at DATETIME)"
+            )
+            conn.exec_driver_sql(
+                "INSERT INTO mazes VALUES (1, 5, 5, '[]', 0, 0, 4, 4, 'prims', NULL), "
+                "(2, 5, 5, '[]', 0, 0, 4, 4, 'prims', NULL)"
+            )
+            create_schema(conn)
+            sql = conn.exec_driver_sql("SELECT sql FROM sqlite_master WHERE name = 'mazes'").scalar()
+            assert "AUTOINCREMENT" in sql
+            conn.exec_driver_sql("DELETE FROM mazes WHERE id = 2")
+            conn.exec_driver_sql(
+                "INSERT INTO mazes (width, height, grid, start_x, start_y, end_x, end_y, algorithm) "
+                "VALUES (5, 5, '[]', 0, 0, 4, 4, 'prims')"
+            )
+            assert [row[0] for row in conn.exec_driver_sql("SELECT id FROM mazes ORDER BY id")] == [1, 3]
+        legacy.dispose()
+    
+    def test_solutions_etag_changes_with_new_solution(self):
+        """ETag списка решений меняется при добавлении решения"""
+        maze = self._maze()
+        url = f"/api/maze/{maze['id']}/solutions"
+        first = client.get(url)
+        assert first.headers["cache-control"] == "no-cache"
+        assert client.get(url, headers={"If-None-Match": first.headers["etag"]}).status_code == 304
+        
+        client.post(f"/api/maze/{maze['id']}/solve", json={"algorithm": "bfs"})
+        
+        second = client.get(url, headers={"If-None-Match": first.headers["etag"]})
+        assert second.status_code == 200
+        assert len(second.json()) == 1
+        assert second.headers["etag"] != first.headers["etag"]
+    
+    def test_response_cache(self):
+        """Повторный запрос отдается из кеша сериализованных байтов"""
+        cache = ResponseCache(1 << 20)
+        app.dependency_overrides[get_response_cache] = lambda: cache
+        try:
+            maze = self._maze()
+            first = client.get(f"/api/maze/{maze['id']}")
+            second = client.get(f"/api/maze/{maze['id']}")
+        finally:
+            del app.dependency_overrides[get_response_cache]
+        
+        assert second.content == first.content
+        assert second.headers["etag"] == first.headers["etag"]
+        assert second.headers["content-type"] == "application/json"
+        assert len(cache) == 1
+    
+    def test_response_cache_evicts_by_size(self):
+        """LRU вытесняет старые записи при превышении лимита байтов"""
+        cache = ResponseCache(10)
+        cache.put("a", b"12345")
+        cache.put("b", b"12345")
+        cache.get("a")
+        cache.put("c", b"123")
+        cache.put("huge", b"x" * 11)
+        
+        assert cache.get("b") is None
+        assert cache.get("a") == b"12345"
+        assert cache.get("huge") is None
+        assert cache.size <= 10
+
+
+class TestAdmission:
+    """Тесты контроля допуска по стоимости"""
+    
+    def test_trace_cost_dominates_large_grids(self):
+        """Трасса растет квадратично и делает большой запрос дорогим"""
+        assert solve_cost(101, 101, "bfs", True) > 10 * solve_cost(101, 101, "bfs", False)
+        assert solve_cost(21, 21, "dfs", False) < solve_cost(21, 21, "astar", False)
+    
+    def test_budget_queue_and_reject(self):
+        """Сверх бюджета запрос ждет освобождения, по таймауту - отказ"""
+        async def scenario():
+            controller = AdmissionController(100, 100, 4, queue_timeout=0.2)
+            await controller.acquire("a", 80)
+            
+            waiter = asyncio.create_task(controller.acquire("b", 50))
+            await asyncio.sleep(0.01)
+            assert not waiter.done()
+            controller.release("a", 80)
+            await asyncio.wait_for(waiter, 1)
+            assert controller.in_flight == 50
+            
+            with pytest.raises(AdmissionRejected) as exc:
+                await controller.acquire("c", 60)
+            assert exc.value.retry_after >= 1
+            controller.release("b", 50)
+            assert controller.in_flight == 0
+        
+        asyncio.run(scenario())
+    
+    def test_oversized_and_free_requests(self):
+        """Запрос дороже бюджета идет в одиночку, дешевые не ограничены бюджетом"""
+        async def scenario():
+            controller = AdmissionController(100, 100, 2, free_cost=5, queue_timeout=0)
+            await controller.acquire("a", 1000)
+            await controller.acquire("b", 5)
+            with pytest.raises(AdmissionRejected):
+                await controller.acquire("b", 10)
+            await controller.acquire("b", 5)
+            # Лимит одновременных запросов клиента действует и для дешевых
+            with pytest.raises(AdmissionRejected):
+                await controller.acquire("b", 1)
+        
+        asyncio.run(scenario())
+    
+    def test_disabled_by_default(self):
+        """Без ADMISSION_ENABLED контроллер не создается, запросы не ограничиваются"""
+        assert get_settings().ADMISSION_ENABLED is False
+        assert get_admission_controller() is None
+    
+    def test_saturated_endpoint_returns_429(self):
+        """При заполненном бюджете API отвечает 429 с Retry-After"""
+        generated = client.post(
+            "/api/maze/generate", json={"width": 15, "height": 15}
+        ).json()
+        saturated = AdmissionController(1, 1, 1, queue_timeout=0)
+        saturated.in_flight = 2_500_000
+        app.dependency_overrides[get_admission_controller] = lambda: saturated
+        try:
+            response = client.post(
+                f"/api/maze/{generated['id']}/solve", json={"algorithm": "bfs"}
+            )
+            assert response.status_code == 429
+            assert response.headers["retry-after"] == "3"
+            assert client.post(
+                "/api/maze/generate", json={"width": 15, "height": 15}
+            ).status_code == 429
+        finally:
+            del app.dependency_overrides[get_admission_controller]
+    
+    def test_solve_without_trace(self):
+        """record_steps=False - решение без пошаговой трассы"""
+        generated = client.post(
+            "/api/maze/generate", json={"width": 21, "height": 21}
+        ).json()
+        response = client.post(
+            f"/api/maze/{generated['id']}/solve",
+            json={"algorithm": "astar", "record_steps": False}
+        )
+        assert response.status_code == 200
+        assert response.json()["steps"] == []
+        assert response.json()["path"]
+
+
+class TestSolveBudget:
+    """Тесты бюджетов и отмены поиска"""
+    
+    def _maze(self, size=41):
+        generated = client.post(
+            "/api/maze/generate", json={"width": size, "height": size, "algorithm": "prims"}
+        ).json()
+        return generated, [[int(c) for c in row] for row in generated["grid"]]
+    
+    def test_budget_stops_search_with_partial_stats(self):
+        """max_nodes и отмена останавливают поиск, пустой бюджет ничего не меняет"""
+        generated, grid = self._maze()
+        start, end = tuple(generated["start"]), tuple(generated["end"])
+        full = PathFinder(grid, start, end).find_path("bfs")
+        
+        unlimited = PathFinder(grid, start, end).find_path("bfs", budget=SearchBudget())
+        assert unlimited["stopped"] is None
+        assert unlimited["path"] == full["path"]
+        
+        limited = PathFinder(grid, start, end).find_path("bfs", budget=SearchBudget(max_nodes=10))
+        assert limited["stopped"] == "max_nodes"
+        assert limited["path"] == [] and limited["steps"] == []
+        assert limited["stats"]["heap_pops"] == 11
+        assert 0 < limited["stats"]["nodes_explored"] < full["stats"]["nodes_explored"]
+        
+        budget = SearchBudget()
+        budget.cancel()
+        cancelled = PathFinder(grid, start, end).find_path("astar", budget=budget)
+        assert cancelled["stopped"] == "cancelled"
+    
+    def test_api_budget_exceeded_is_not_persisted(self):
+        """Исчерпанный бюджет - 422 с частичной статистикой, решение не сохраняется"""
+        generated, _ = self._maze()
+        response = client.post(
+            f"/api/maze/{generated['id']}/solve",
+            json={"algorithm": "dfs", "max_nodes": 5}
+        )
+        assert response.status_code == 422
+        body = response.json()
+        assert body["reason"] == "max_nodes"
+        assert body["stats"]["path_length"] == 0
+        assert client.get(f"/api/maze/{generated['id']}/solutions").json() == []
+        
+        response = client.post(
+            f"/api/maze/{generated['id']}/solve",
+            json={"algorithm": "dfs", "max_nodes": 100000, "max_ms": 10000}
+        )
+        assert response.status_code == 200
+    
+    def test_disconnect_cancels_search(self):
+        """Разрыв соединения отменяет бюджет поиска"""
+        from app.api.routes.maze import cancel_on_disconnect
+        
+        class DisconnectedRequest:
+            async def receive(self):
+                return {"type": "http.disconnect"}
+        
+        budget = SearchBudget()
+        asyncio.run(cancel_on_disconnect(DisconnectedRequest(), budget))
+        assert budget.cancelled
+    
+    def test_job_budget(self):
+        """Фоновый поиск передает бюджет в пул"""
+        generated, grid = self._maze(21)
+        result = run_solve(
+            grid, None, tuple(generated["start"]), tuple(generated["end"]),
+            "bfs", False, max_nodes=3
+        )
+        assert result["stopped"] == "max_nodes"
+
+
+class TestEphemeralMaze:
+    """Тесты генерации и решения без сохранения"""
+    
+    def setup_method(self):
+        self.executor = ThreadPoolExecutor(2)
+        app.dependency_overrides[get_request_executor] = lambda: self.executor
+    
+    def teardown_method(self):
+        del app.dependency_overrides[get_request_executor]
+        self.executor.shutdown()
+    
+    def test_generate_and_solve_without_persistence(self):
+        """Лабиринт и решение в одном ответе, в БД ничего не появляется"""
+        total = client.get("/api/maze/").json()["total"]
+        response = client.post(
+            "/api/maze/ephemeral",
+            json={"width": 31, "height": 31, "algorithm": "prims", "solve": "astar"}
+        )
+        assert response.status_code == 200
+        data = response.json()
+        assert "id" not in data
+        assert len(data["grid"]) == 31
+        solution = data["solution"]
+        assert solution["path"][0] == data["start"]
+        assert solution["path"][-1] == data["end"]
+        assert solution["steps"] == []
+        assert solution["stats"]["path_length"] == len(solution["path"])
+        assert client.get("/api/maze/").json()["total"] == total
+    
+    def test_without_solution_and_validation(self):
+        """Без solve решение не строится, неизвестный алгоритм - 422"""
+        response = client.post("/api/maze/ephemeral", json={"width": 11, "height": 11})
+        assert response.json()["solution"] is None
+        
+        response = client.post(
+            "/api/maze/ephemeral", json={"width": 11, "height": 11, "solve": "dijkstra"}
+        )
+        assert response.status_code == 422
+    
+    def test_msgpack(self):
+        """MessagePack: упакованная сетка, путь и трасса"""
+        response = client.post(
+            "/api/maze/ephemeral",
+            json={"width": 15, "height": 15, "solve": "bfs", "record_steps": True},
+            headers={"Accept": "application/x-msgpack"}
+        )
+        assert response.headers["content-type"] == "application/x-msgpack"
+        data = msgpack.unpackb(response.content)
+        grid = unpack_grid(data["grid"], 15, 15)
+        path = [list(p) for p in unpack_points(data["solution"]["path"])]
+        steps = unpack_steps(data["solution"]["steps"])
+        assert grid[path[0][1]][path[0][0]] == 0
+        assert len(steps) == data["solution"]["stats"]["heap_pops"]
+    
+    def test_worker_function(self):
+        """Функция пула возвращает готовое тело и статистику для метрик"""
+        body, generation_time, stats = generate_and_solve(21, 21, "kruskals", "dfs", False, False)
+        data = orjson.loads(body)
+        assert generation_time > 0
+        assert stats["path_length"] == len(data["solution"]["path"])
+
+
+class TestCompare:
+    """Тесты сравнения алгоритмов одним запросом"""
+    
+    def setup_method(self):
+        self.executor = ThreadPoolExecutor(3)
+        app.dependency_overrides[get_request_executor] = lambda: self.executor
+    
+    def teardown_method(self):
+        del app.dependency_overrides[get_request_executor]
+        self.executor.shutdown()
+    
+    def test_compare_persists_all_results(self):
+        """Все алгоритмы решают один лабиринт, решения сохраняются вместе"""
+        generated = client.post(
+            "/api/maze/generate", json={"width": 41, "height": 41, "algorithm": "kruskals"}
+        ).json()
+        response = client.post(f"/api/maze/{generated['id']}/compare", json={})
+        assert response.status_code == 200
+        data = response.json()
+        assert [r["algorithm"] for r in data["results"]] == ["bfs", "dfs", "astar"]
+        
+        by_algorithm = {r["algorithm"]: r for r in data["results"]}
+        assert by_algorithm["bfs"]["stats"]["path_length"] == by_algorithm["astar"]["stats"]["path_length"]
+        
+        solutions = client.get(f"/api/maze/{generated['id']}/solutions").json()
+        assert sorted(s["id"] for s in solutions) == sorted(r["solution_id"] for r in data["results"])
+        
+        grid = [[int(c) for c in row] for row in generated["grid"]]
+        expected = PathFinder(grid, tuple(generated["start"]), tuple(generated["end"])).find_path("bfs")
+        assert by_algorithm["bfs"]["path"] == [list(p) for p in expected["path"]]
+    
+    def test_validation_and_missing_maze(self):
+        """Повторы и неизвестные алгоритмы - 422, нет лабиринта - 404"""
+        assert client.post("/api/maze/999999/compare", json={}).status_code == 404
+        generated = client.post("/api/maze/generate", json={"width": 11, "height": 11}).json()
+        for algorithms in (["bfs", "bfs"], ["dijkstra"], []):
+            response = client.post(
+                f"/api/maze/{generated['id']}/compare", json={"algorithms": algorithms}
+            )
+            assert response.status_code == 422
+    
+    def test_bitboard_in_compare_and_ephemeral(self):
+        """bfs_bitboard объявлен в GET / и принимается compare и ephemeral"""
+        assert "bfs_bitboard" in client.get("/").json()["algorithms"]["pathfinding"]
+        generated = client.post(
+            "/api/maze/generate", json={"width": 41, "height": 41, "algorithm": "prims"}
+        ).json()
+        response = client.post(
+            f"/api/maze/{generated['id']}/compare",
+            json={"algorithms": ["bfs", "dfs", "astar", "bfs_bitboard"], "record_steps": True}
+        )
+        assert response.status_code == 200
+        by_algorithm = {r["algorithm"]: r for r in response.json()["results"]}
+        assert by_algorithm["bfs_bitboard"]["stats"]["path_length"] == by_algorithm["bfs"]["stats"]["path_length"]
+        
+        response = client.post(
+            "/api/maze/ephemeral", json={"width": 21, "height": 21, "solve": "bfs_bitboard"}
+        )
+        assert response.status_code == 200
+        solution = response.json()["solution"]
+        assert solution["steps"] == []
+        assert solution["stats"]["path_length"] == len(solution["path"])
+    
+    def test_shared_memory_in_worker_processes(self):
+        """Воркеры-процессы читают сетку из shared_memory и из файла GridStore"""
+        grid, start, end = MazeGenerator(31, 31).generate("prims")
+        expected = PathFinder(grid, start, end).find_path("astar")["path"]
+        grid_file = test_grid_store.write(grid, start, end)
+        shm = share_grid(grid)
+        executor = create_cpu_executor("process", 2)
+        try:
+            from_shm = executor.submit(
+                run_compare_solve, shm.name, None, 31, 31, start, end, "astar", False
+            )
+            from_file = executor.submit(
+                run_compare_solve, None, test_grid_store.path(grid_file), 31, 31, start, end, "astar", False
+            )
+            assert from_shm.result(timeout=60)["path"] == expected
+            assert from_file.result(timeout=60)["path"] == expected
+        finally:
+            executor.shutdown()
+            shm.close()
+            shm.unlink()
+
+
+class TestBitboardBfs:
+    """Тесты волнового BFS на битбордах"""
+    
+    def test_matches_bfs_path_length(self):
+        """Длина пути совпадает с _bfs, путь проходит по соседним открытым клеткам"""
+        for algorithm in ("recursive_backtracking", "prims", "kruskals"):
+            grid, start, end = MazeGenerator(31, 23).generate(algorithm)
+            expected = PathFinder(grid, start, end).find_path("bfs", record_steps=False)
+            for source in (grid, PackedGrid(pack_grid(grid), 31, 23)):
+                result = PathFinder(source, start, end).find_path("bfs_bitboard")
+                path = result["path"]
+                assert result["stats"]["path_length"] == expected["stats"]["path_length"]
+                assert path[0] == start and path[-1] == end
+                for (x1, y1), (x2, y2) in zip(path, path[1:]):
+                    assert abs(x1 - x2) + abs(y1 - y2) == 1
+                    assert grid[y2][x2] == 0
+    
+    def test_edge_cases(self):
+        """Недостижимая цель, старт в цели, бюджет"""
+        grid = [[0, 0, 0], [1, 1, 1], [0, 0, 0]]
+        assert PathFinder(grid, (0, 0), (2, 2)).find_path("bfs_bitboard")["path"] == []
+        assert PathFinder(grid, (0, 0), (0, 0)).find_path("bfs_bitboard")["path"] == [(0, 0)]
+        # Перенос через край строки не считается соседством
+        assert PathFinder(grid, (2, 0), (0, 2)).find_path("bfs_bitboard")["path"] == []
+        stopped = PathFinder(grid, (0, 0), (2, 0)).find_path(
+            "bfs_bitboard", budget=SearchBudget(max_nodes=1)
+        )
+        assert stopped["stopped"] == "max_nodes"
+    
+    def test_api_solve(self):
+        """bfs_bitboard доступен через /solve"""
+        generated = client.post(
+            "/api/maze/generate", json={"width": 25, "height": 25, "algorithm": "prims"}
+        ).json()
+        response = client.post(
+            f"/api/maze/{generated['id']}/solve", json={"algorithm": "bfs_bitboard"}
+        )
+        assert response.status_code == 200
+        data = response.json()
+        assert data["algorithm"] == "bfs_bitboard"
+        assert data["steps"] == []
+        assert data["stats"]["path_length"] == len(data["path"])
+
+
+class TestCellEdits:
+    """Тесты правки клеток и досчета пути LPA*"""
+    
+    def test_planner_matches_bfs_after_edits(self):
+        """После каждой правки длина пути LPA* совпадает с полным BFS"""
+        rng = random.Random(3)
+        grid, start, end = MazeGenerator(21, 21).generate("prims")
+        planner = IncrementalPlanner(grid, 21, 21, start, end)
+        for _ in range(40):
+            x, y = rng.randrange(1, 20), rng.randrange(1, 20)
+            if (x, y) in (start, end):
+                continue
+            result = planner.apply([(x, y, None)])
+            expected = PathFinder(planner.rows(), start, end).find_path("bfs", record_steps=False)
+            assert len(result["path"]) == len(expected["path"])
+        assert planner.distance(*start) == 0
+    
+    def test_blocked_and_reopened(self):
+        """Стена на единственном проходе обрывает путь, снятие стены возвращает его"""
+        grid = [[0, 0, 0], [1, 0, 1], [0, 0, 0]]
+        planner = IncrementalPlanner(grid, 3, 3, (0, 0), (2, 2))
+        assert len(planner.path()) == 5
+        
+        blocked = planner.apply([(1, 1, True)])
+        assert blocked["changed"] == 1
+        assert blocked["path"] == []
+        
+        reopened = planner.apply([(1, 1, False), (1, 1, False)])
+        assert reopened["changed"] == 1
+        assert len(reopened["path"]) == 5
+        assert planner.distance(2, 2) == 4
+    
+    def test_patch_updates_maze_and_etag(self):
+        """PATCH меняет сетку, ревизию и ETag; старый ETag больше не дает 304"""
+        maze = client.post("/api/maze/generate", json={"width": 11, "height": 11}).json()
+        etag = client.get(f"/api/maze/{maze['id']}").headers["etag"]
+        x, y = next(
+            (x, y) for y in range(1, 10) for x in range(1, 10) if maze["grid"][y][x] == 1
+        )
+        
+        response = client.patch(
+            f"/api/maze/{maze['id']}/cells", json={"cells": [{"x": x, "y": y}], "revision": 0}
+        )
+        assert response.status_code == 200
+        data = response.json()
+        assert data["revision"] == 1
+        assert data["changed"] == 1
+        assert data["path"][0] == list(maze["start"])
+        assert data["path"][-1] == list(maze["end"])
+        
+        updated = client.get(f"/api/maze/{maze['id']}", headers={"If-None-Match": etag})
+        assert updated.status_code == 200
+        assert updated.json()["grid"][y][x] == 0
+        assert updated.json()["revision"] == 1
+        
+        # Тот же путь считается BFS по сохраненной сетке
+        solved = client.post(f"/api/maze/{maze['id']}/solve", json={"algorithm": "bfs"}).json()
+        assert len(solved["path"]) == len(data["path"])
+    
+    def test_patch_conflicts_and_validation(self):
+        """Устаревшая ревизия - 409, клетки вне сетки и старт/выход - 422"""
+        maze = client.post("/api/maze/generate", json={"width": 11, "height": 11}).json()
+        url = f"/api/maze/{maze['id']}/cells"
+        
+        assert client.patch(url, json={"cells": [{"x": 1, "y": 1}], "revision": 5}).status_code == 409
+        assert client.patch(url, json={"cells": [{"x": 11, "y": 1}]}).status_code == 422
+        start = maze["start"]
+        assert client.patch(url, json={"cells": [{"x": start[0], "y": start[1]}]}).status_code == 422
+        assert client.patch("/api/maze/999999/cells", json={"cells": [{"x": 1, "y": 1}]}).status_code == 404
+        
+        # Правка без изменений не повышает ревизию
+        x, y = 5, 5
+        wall = maze["grid"][y][x] == 1
+        noop = client.patch(url, json={"cells": [{"x": x, "y": y, "wall": wall}]}).json()
+        assert noop["changed"] == 0
+        assert noop["revision"] == 0
+    
+    def test_replanner_cache(self):
+        """Запись действительна для своей ревизии, вытеснение по числу клеток"""
+        grid = [[0] * 4 for _ in range(4)]
+        cache = ReplannerCache(max_cells=40)
+        first = IncrementalPlanner(grid, 4, 4, (0, 0), (3, 3))
+        second = IncrementalPlanner(grid, 4, 4, (0, 0), (3, 3))
+        
+        cache.put(1, 0, first)
+        assert cache.get(1, 0) is first
+        assert cache.get(1, 1) is None
+        
+        cache.put(2, 0, second)
+        cache.put(3, 0, IncrementalPlanner(grid, 4, 4, (0, 0), (3, 3)))
+        assert cache.get(1, 0) is None
+        assert cache.size == 32
+
+
+class TestAnalytics:
+    """Тесты структурных метрик и их выборки"""
+    
+    def test_analyze_grid(self):
+        """Тупики, развилки, коридоры и извилистость на известной сетке"""
+        grid = [
+            [0, 0, 0, 0, 0],
+            [1, 1, 0, 1, 0],
+            [0, 0, 0, 1, 0],
+            [1, 1, 1, 1, 0],
+        ]
+        for source in (grid, PackedGrid(pack_grid(grid), 5, 4)):
+            metrics = analyze_grid(source, 5, 4, (0, 0), (4, 3))
+            assert metrics["dead_ends"] == 3
+            assert metrics["junctions"] == 1
+            assert metrics["crossroads"] == 0
+            # (1,0); (3,0)-(4,0)-(4,1)-(4,2); (2,1)-(2,2)-(1,2)
+            assert metrics["corridor_count"] == 3
+            assert metrics["corridor_max"] == 4
+            assert metrics["corridor_histogram"] == [1, 1, 1]
+            assert metrics["solution_length"] == 8
+            assert metrics["tortuosity"] == 1.0
+        
+        blocked = analyze_grid([[0, 1, 0]], 3, 1, (0, 0), (2, 0))
+        assert blocked["solution_length"] is None
+        assert blocked["tortuosity"] is None
+    
+    def test_component_sizes(self):
+        """Компоненты не склеиваются через край строки"""
+        mask = np.array([[1, 1, 0, 1], [1, 0, 0, 1], [0, 1, 1, 1]], dtype=bool)
+        assert sorted(component_sizes(mask).tolist()) == [3, 5]
+    
+    def test_refresh_and_list(self):
+        """Пакетный пересчет заполняет maze_metrics, правка делает метрики устаревшими"""
+        maze = client.post(
+            "/api/maze/generate", json={"width": 21, "height": 21, "algorithm": "kruskals"}
+        ).json()
+        
+        async def refresh(force=False):
+            try:
+                return await refresh_metrics(
+                    TestingSessionLocal, ThreadPoolExecutor(2), test_grid_store, force, batch_size=7
+                )
+            finally:
+                await async_engine.dispose()
+        
+        assert asyncio.run(refresh()) >= 1
+        assert asyncio.run(refresh()) == 0
+        
+        response = client.get(
+            "/api/analytics/mazes",
+            params={"algorithm": "kruskals", "sort": "-solution_length", "size": 100}
+        )
+        assert response.status_code == 200
+        items = response.json()["items"]
+        lengths = [item["solution_length"] for item in items]
+        assert lengths == sorted(lengths, reverse=True)
+        entry = next(item for item in items if item["maze_id"] == maze["id"])
+        expected = client.post(
+            f"/api/maze/{maze['id']}/solve", json={"algorithm": "bfs", "record_steps": False}
+        ).json()
+        assert entry["solution_length"] == len(expected["path"])
+        assert entry["stale"] is False
+        
+        filtered = client.get(
+            "/api/analytics/mazes",
+            params={"min_dead_ends": entry["dead_ends"], "max_dead_ends": entry["dead_ends"]}
+        ).json()
+        assert all(item["dead_ends"] == entry["dead_ends"] for item in filtered["items"])
+        assert client.get("/api/analytics/mazes", params={"sort": "grid"}).status_code == 422
+        
+        x, y = next(
+            (x, y) for y in range(1, 20) for x in range(1, 20) if maze["grid"][y][x] == 1
+        )
+        client.patch(f"/api/maze/{maze['id']}/cells", json={"cells": [{"x": x, "y": y}]})
+        stale = client.get("/api/analytics/mazes", params={"size": 100, "algorithm": "kruskals"}).json()
+        assert next(i for i in stale["items"] if i["maze_id"] == maze["id"])["stale"] is True
+        assert asyncio.run(refresh()) == 1
+    
+    def test_analyze_job(self):
+        """Задача analyze пересчитывает метрики в пуле очереди"""
+        async def runner():
+            queue = JobQueue(
+                TestingSessionLocal, test_grid_store, ThreadPoolExecutor(2), poll_interval=0.05
+            )
+            app.dependency_overrides[get_job_queue] = lambda: queue
+            transport = httpx.ASGITransport(app=app)
+            try:
+                await queue.start()
+                async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+                    submitted = await http.post("/api/jobs/analyze", json={"force": True})
+                    assert submitted.status_code == 202
+                    return (await http.get(
+                        f"/api/jobs/{submitted.json()['id']}", params={"wait": 30}
+                    )).json()
+            finally:
+                await queue.stop()
+                del app.dependency_overrides[get_job_queue]
+                await async_engine.dispose()
+        
+        job = asyncio.run(runner())
+        assert job["status"] == "succeeded", job
+        assert job["result"]["analyzed"] >= 1
+
+
+class TestRollups:
+    """Тесты накопительных агрегатов решений"""
+    
+    def _stats(self, **params):
+        response = client.get("/api/stats/algorithms", params=params)
+        assert response.status_code == 200
+        return response.json()["items"]
+    
+    def _count(self, algorithm, generator, size_bucket):
+        items = self._stats(algorithm=algorithm, generator=generator, size_bucket=size_bucket)
+        return items[0]["count"] if items else 0
+    
+    def test_sketch_quantiles(self):
+        """Оценка перцентиля в пределах относительной точности скетча"""
+        rng = random.Random(7)
+        values = sorted(rng.lognormvariate(0, 2) for _ in range(5000))
+        buckets = {}
+        for value in values + [0.0]:
+            index = sketch_bucket(value)
+            buckets[index] = buckets.get(index, 0) + 1
+        
+        estimates = sketch_quantiles(buckets.items(), (0.5, 0.9, 0.99))
+        for q, estimate in estimates.items():
+            exact = sorted(values + [0.0])[int(q * len(values))]
+            assert abs(estimate - exact) / exact <= 0.011
+        assert sketch_quantiles([(ZERO_BUCKET, 3)], (0.5,)) == {0.5: 0.0}
+    
+    def test_solve_updates_rollup(self):
+        """Решение и сравнение сразу попадают в агрегаты своего ключа"""
+        before = self._count("dfs", "kruskals", "<=32")
+        maze = client.post(
+            "/api/maze/generate", json={"width": 25, "height": 25, "algorithm": "kruskals"}
+        ).json()
+        solved = client.post(
+            f"/api/maze/{maze['id']}/solve", json={"algorithm": "dfs", "record_steps": False}
+        ).json()
+        client.post(f"/api/maze/{maze['id']}/compare", json={"algorithms": ["dfs", "bfs"]})
+        
+        items = self._stats(algorithm="dfs", generator="kruskals", size_bucket="<=32")
+        assert len(items) == 1
+        entry = items[0]
+        assert entry["count"] == before + 2
+        nodes = entry["nodes_explored"]
+        assert nodes["min"] <= solved["stats"]["nodes_explored"] <= nodes["max"]
+        assert nodes["min"] <= nodes["p50"] <= nodes["p99"] <= nodes["max"] * 1.01
+        assert entry["execution_time"]["mean"] > 0
+        assert all(item["algorithm"] == "bfs" for item in self._stats(algorithm="bfs"))
+    
+    def test_write_behind_rolls_up_on_flush(self):
+        """В режиме отложенной записи агрегаты обновляются вместе с пачкой"""
+        buffer = WriteBehindBuffer(TestingSessionLocal, batch_size=1000, flush_interval=60)
+        app.dependency_overrides[get_write_behind] = lambda: buffer
+        try:
+            before = self._count("astar", "prims", "<=16")
+            maze = client.post(
+                "/api/maze/generate", json={"width": 13, "height": 13, "algorithm": "prims"}
+            ).json()
+            client.post(f"/api/maze/{maze['id']}/solve", json={"algorithm": "astar"})
+            assert self._count("astar", "prims", "<=16") == before
+            asyncio.run(buffer.flush())
+        finally:
+            app.dependency_overrides.pop(get_write_behind, None)
+        assert self._count("astar", "prims", "<=16") == before + 1
+    
+    def test_rebuild_matches_solutions(self):
+        """Пересборка учитывает каждое решение из таблицы solutions ровно один раз"""
+        async def rebuild():
+            try:
+                return await rebuild_rollups(TestingSessionLocal, batch_size=50)
+            finally:
+                await async_engine.dispose()
+        
+        processed = asyncio.run(rebuild())
+        with engine.connect() as connection:
+            stored = connection.exec_driver_sql(
+                "SELECT COUNT(*) FROM solutions JOIN mazes ON mazes.id = solutions.maze_id"
+            ).scalar()
+        
+        items = self._stats()
+        assert processed == stored > 0
+        assert sum(item["count"] for item in items) == stored
+        assert all(item["path_length"]["p50"] is not None for item in items)
+
+
+class TestTransfer:
+    """Тесты потокового экспорта и импорта"""
+    
+    def _create(self, size, algorithm="prims"):
+        maze = client.post(
+            "/api/maze/generate", json={"width": size, "height": size, "algorithm": algorithm}
+        ).json()
+        client.post(f"/api/maze/{maze['id']}/solve", json={"algorithm": "astar"})
+        client.post(f"/api/maze/{maze['id']}/solve", json={"algorithm": "bfs", "record_steps": False})
+        return maze
+    
+    def _export(self, after_id, **params):
+        response = client.get("/api/export", params={"after_id": after_id, **params})
+        assert response.status_code == 200
+        return [orjson.loads(line) for line in response.content.splitlines()]
+    
+    @staticmethod
+    def _strip(records):
+        """Записи без ID, которые меняются при импорте"""
+        return [
+            {key: value for key, value in record.items() if key not in ("id", "maze_id")}
+            for record in records if record["type"] != "header"
+        ]
+    
+    def test_ndjson_roundtrip(self):
+        """Экспорт -> импорт дает те же лабиринты и решения под новыми ID"""
+        small = self._create(15)
+        large = self._create(71)  # 71 * 71 >= GRID_STORE_MIN_CELLS - сетка в файле
+        records = self._export(small["id"] - 1)
+        assert records[0] == {"type": "header", "format": "maze-export", "version": 1}
+        assert [r["type"] for r in records[1:]] == ["maze", "solution", "solution"] * 2
+        assert records[1]["grid"] == small["grid"]
+        assert records[4]["grid"] == large["grid"]
+        assert all(r["maze_id"] == large["id"] for r in records[5:])
+        
+        body = b"\n".join(orjson.dumps(record) for record in records)
+        response = client.post("/api/import", content=body, headers={"Content-Type": "application/x-ndjson"})
+        assert response.status_code == 200
+        assert response.json() == {"mazes": 2, "solutions": 4}
+        
+        imported = self._export(large["id"])
+        assert self._strip(imported) == self._strip(records)
+        copy = client.get(f"/api/maze/{imported[1]['id']}").json()
+        assert copy["grid"] == small["grid"] and copy["id"] > large["id"]
+        solutions = client.get(f"/api/maze/{imported[4]['id']}/solutions").json()
+        assert len(solutions) == 2
+    
+    def test_msgpack_gzip_roundtrip(self):
+        """MessagePack: сетка и путь упакованы; gzip в обе стороны"""
+        maze = self._create(21, "kruskals")
+        response = client.get(
+            "/api/export",
+            params={"after_id": maze["id"] - 1, "compression": "gzip"},
+            headers={"Accept": "application/x-msgpack"}
+        )
+        assert response.status_code == 200
+        assert response.headers["content-encoding"] == "gzip"
+        assert response.headers["content-type"] == "application/x-msgpack"
+        records = list(msgpack.Unpacker(io.BytesIO(response.content), raw=False))
+        assert records[1]["grid"] == pack_grid(maze["grid"])
+        solution = records[2]
+        stored = client.get(f"/api/maze/{maze['id']}/solutions").json()
+        by_id = {s["id"]: s for s in stored}
+        assert unpack_points(solution["path"]) == [tuple(p) for p in by_id[solution["id"]]["path"]]
+        assert orjson.loads(solution["steps"]) == by_id[solution["id"]]["steps"]
+        
+        response = client.post(
+            "/api/import",
+            content=gzip.compress(response.content),
+            headers={"Content-Type": "application/x-msgpack", "Content-Encoding": "gzip"}
+        )
+        assert response.json() == {"mazes": 1, "solutions": 2}
+        copy = self._export(maze["id"])
+        assert copy[1]["grid"] == maze["grid"]
+        assert self._strip(copy) == self._strip(self._export(maze["id"] - 1)[:4])
+    
+    def test_export_options(self):
+        """solutions=false и steps=false сокращают выгрузку"""
+        maze = self._create(11)
+        only_mazes = self._export(maze["id"] - 1, solutions="false")
+        assert [r["type"] for r in only_mazes] == ["header", "maze"]
+        without_steps = self._export(maze["id"] - 1, steps="false")
+        assert len(without_steps) == 4
+        assert all("steps" not in r for r in without_steps[2:])
+        assert all(r["path"] for r in without_steps[2:])
+        
+        # Импорт без трасс сохраняет пустой steps
+        body = b"\n".join(orjson.dumps(record) for record in without_steps)
+        assert client.post("/api/import", content=body).json() == {"mazes": 1, "solutions": 2}
+        copy = self._export(maze["id"])
+        assert all(r["steps"] == [] for r in copy[2:])
+    
+    def test_import_rollups(self):
+        """Импортированные решения попадают в агрегаты статистики"""
+        def count():
+            items = client.get(
+                "/api/stats/algorithms",
+                params={"algorithm": "astar", "generator": "recursive_backtracking", "size_bucket": "<=16"}
+            ).json()["items"]
+            return items[0]["count"] if items else 0
+        
+        maze = self._create(9, "recursive_backtracking")
+        before = count()
+        body = b"\n".join(orjson.dumps(r) for r in self._export(maze["id"] - 1))
+        client.post("/api/import", content=body + b"\n" + body)
+        assert count() == before + 2
+    
+    def test_import_errors(self):
+        """Ошибка записи - 422 с номером записи и числом уже записанных строк"""
+        maze = self._create(9)
+        records = self._export(maze["id"] - 1)
+        
+        orphan = [records[0], records[2]]
+        response = client.post("/api/import", content=b"\n".join(orjson.dumps(r) for r in orphan))
+        assert response.status_code == 422
+        assert response.json()["detail"].startswith("Запись 2:")
+        
+        broken = dict(records[1], grid=records[1]["grid"][:-1])
+        response = client.post("/api/import", content=orjson.dumps(broken))
+        assert response.status_code == 422
+        assert "размер сетки" in response.json()["detail"]
+        
+        response = client.post("/api/import", content=b"{}", headers={"Content-Type": "text/csv"})
+        assert response.status_code == 415
+        response = client.post("/api/import", content=b"{not json")
+        assert response.status_code == 422
+    
+    def test_import_commits_batches(self, monkeypatch):
+        """Пачки до ошибки остаются записанными"""
+        monkeypatch.setattr(get_settings(), "TRANSFER_BATCH_SIZE", 3)
+        maze = self._create(9)
+        records = self._export(maze["id"] - 1)
+        body = b"\n".join(orjson.dumps(r) for r in records + [{"type": "unknown"}])
+        response = client.post("/api/import", content=body)
+        assert response.status_code == 422
+        assert "записано лабиринтов: 1, решений: 2" in response.json()["detail"]
+        assert len(self._export(maze["id"])) == 4
+    
+    def test_write_behind_ids(self):
+        """В режиме отложенной записи ID берутся из зарезервированных блоков"""
+        buffer = WriteBehindBuffer(TestingSessionLocal, batch_size=1000, flush_interval=60)
+        app.dependency_overrides[get_write_behind] = lambda: buffer
+        try:
+            maze = self._create(9)
+            records = self._export(maze["id"] - 1)
+            assert len(records) == 4
+            response = client.post("/api/import", content=b"\n".join(orjson.dumps(r) for r in records))
+            assert response.json() == {"mazes": 1, "solutions": 2}
+            queued = client.post(
+                "/api/maze/generate", json={"width": 9, "height": 9, "algorithm": "prims"}
+            ).json()
+            asyncio.run(buffer.flush())
+        finally:
+            app.dependency_overrides.pop(get_write_behind, None)
+        copy = self._export(maze["id"])
+        assert [r["type"] for r in copy] == ["header", "maze", "solution", "solution", "maze"]
+        assert copy[4]["id"] == queued["id"] != copy[1]["id"]
+    
+    def test_read_records_chunks(self):
+        """Строки, разрезанные по кускам, собираются; длинная запись отклоняется"""
+        async def collect(chunks, binary=False, limit=1024):
+            async def source():
+                for chunk in chunks:
+                    yield chunk
+            return [record async for record in read_records(source(), binary, limit)]
+        
+        body = b'{"a": 1}\n\n{"b": [1, 2, 3]}\n{"c": "x"}'
+        pieces = [body[i:i + 3] for i in range(0, len(body), 3)]
+        assert asyncio.run(collect(pieces)) == [{"a": 1}, {"b": [1, 2, 3]}, {"c": "x"}]
+        with pytest.raises(TransferError):
+            asyncio.run(collect([b'{"a": "' + b"x" * 100], limit=50))
+        
+        packed = msgpack.packb({"a": 1}) + msgpack.packb({"b": b"\x00\x01"})
+        assert asyncio.run(collect([packed[:3], packed[3:]], binary=True)) == [{"a": 1}, {"b": b"\x00\x01"}]
+        with pytest.raises(TransferError):
+            asyncio.run(collect([packed[:-1]], binary=True))
+
+
+class TestSharedGridCache:
+    """Тесты общего для процессов кеша сеток в shared_memory"""
+    
+    def _cache(self, max_bytes=1 << 20, slots=8):
+        return SharedGridCache(f"maze_test_{os.getpid()}_{random.getrandbits(32):x}", max_bytes, slots)
+    
+    def test_publish_and_attach_from_other_process(self):
+        """Сетка публикуется один раз, другой процесс читает тот же сегмент"""
+        grid, start, end = MazeGenerator(31, 23).generate("kruskals")
+        cache = self._cache()
+        try:
+            assert cache.get(1, 0, 7) is None
+            shared = cache.put(1, 0, 7, pack_grid(grid), 31, 23)
+            assert shared.to_list() == grid
+            assert [list(row) for row in shared] == grid
+            assert cache.get(1, 0, 7) is shared
+            # Другая ревизия или источник - другая запись
+            assert cache.get(1, 1, 7) is None
+            assert cache.get(1, 0, 8) is None
+            expected = PathFinder(grid, start, end).find_path("astar")
+            for algorithm in ("astar", "bfs_bitboard"):
+                result = PathFinder(shared, start, end).find_path(algorithm)
+                assert result["stats"]["path_length"] == expected["stats"]["path_length"]
+            
+            code = (
+                "import sys\n"
+                "from app.services.shared_cache import SharedGridCache\n"
+                f"cache = SharedGridCache({cache.name!r}, 1 << 20)\n"
+                "grid = cache.get(1, 0, 7)\n"
+                "sys.stdout.write(repr((cache.stats()['users'], grid.to_list())))\n"
+                "cache.close()\n"
+            )
+            result = subprocess.run(
+                [sys.executable, "-c", code], capture_output=True, text=True, timeout=60,
+                cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+            )
+            assert result.returncode == 0, result.stderr
+            assert eval(result.stdout) == (2, grid)
+            assert cache.stats() == {"entries": 1, "bytes": 31 * 23 + 90, "attached": 1, "users": 1}
+            with pytest.raises(TypeError):
+                shared[0][0] = 1
+        finally:
+            cache.close()
+        assert not os.path.exists(f"/dev/shm/{cache.name}_index")
+    
+    def test_lru_eviction(self):
+        """При нехватке места вытесняется давно не использованная сетка"""
+        grid = [[0, 1, 0, 0], [0, 1, 0, 1], [0, 0, 0, 0]]
+        packed = pack_grid(grid)
+        cache = self._cache(max_bytes=3 * 14, slots=8)
+        try:
+            for maze_id in range(3):
+                cache.put(maze_id, 0, 0, packed, 4, 3)
+            cache.get(0, 0, 0)
+            cache.put(3, 0, 0, packed, 4, 3)
+            assert cache.get(1, 0, 0) is None
+            assert cache.get(0, 0, 0).to_list() == grid
+            assert cache.stats()["entries"] == 3
+            # Сетка больше кеша не публикуется
+            assert cache.put(4, 0, 0, pack_grid([[0] * 10] * 10), 10, 10) is None
+        finally:
+            cache.close()
+        
+        cache = self._cache(max_bytes=1 << 20, slots=2)
+        try:
+            for maze_id in range(3):
+                cache.put(maze_id, 0, 0, packed, 4, 3)
+            assert cache.get(0, 0, 0) is None
+            assert cache.stats()["entries"] == 2
+        finally:
+            cache.close()
+    
+    def test_api_uses_shared_grid(self):
+        """Поиск и фрагменты идут по сетке из кеша, правка публикует новую ревизию"""
+        cache = self._cache()
+        app.dependency_overrides[get_shared_grid_cache] = lambda: cache
+        try:
+            for size in (21, 70):
+                maze = client.post(
+                    "/api/maze/generate", json={"width": size, "height": size, "algorithm": "prims"}
+                ).json()
+                solved = client.post(f"/api/maze/{maze['id']}/solve", json={"algorithm": "astar"})
+                assert solved.status_code == 200
+                tile = client.get(
+                    f"/api/maze/{maze['id']}/tile", params={"x": 3, "y": 2, "width": 8, "height": 4}
+                ).json()
+                assert tile["grid"] == [row[3:11] for row in maze["grid"][2:6]]
+            assert cache.stats()["entries"] == 2
+            
+            x, y = next(
+                (x, y) for y, row in enumerate(maze["grid"]) for x, cell in enumerate(row)
+                if cell == 0 and (x, y) not in (tuple(maze["start"]), tuple(maze["end"]))
+            )
+            edited = client.patch(
+                f"/api/maze/{maze['id']}/cells", json={"cells": [{"x": x, "y": y, "wall": True}]}
+            )
+            assert edited.status_code == 200
+            tile = client.get(
+                f"/api/maze/{maze['id']}/tile", params={"x": x, "y": y, "width": 1, "height": 1}
+            ).json()
+            assert tile["grid"] == [[1]]
+        finally:
+            del app.dependency_overrides[get_shared_grid_cache]
+            cache.close()
+
+
+class TestBatchPaths:
+    """Тесты пакетных запросов путей"""
+    
+    def setup_method(self):
+        self.executor = ThreadPoolExecutor(2)
+        app.dependency_overrides[get_request_executor] = lambda: self.executor
+    
+    def teardown_method(self):
+        del app.dependency_overrides[get_request_executor]
+        self.executor.shutdown()
+    
+    def test_grouping(self):
+        """Пары с общей целью считаются одной волной от цели"""
+        hub = (5, 5)
+        queries = [((1, 1), hub), ((3, 1), hub), (hub, (7, 1)), ((1, 1), (3, 1)), ((3, 1), hub)]
+        groups, placement = group_queries(queries)
+        assert groups[0] == (hub, [(1, 1), (3, 1), (7, 1)])
+        assert placement[:3] == [(0, True), (0, True), (0, False)]
+        assert len(groups) == 2
+        chunks = split_groups(groups, 4)
+        assert sorted(number for chunk in chunks for number, _ in chunk) == [0, 1]
+    
+    def test_braided_maze_paths(self):
+        """В лабиринте с циклами пути кратчайшие и идут по проходам"""
+        random.seed(7)
+        grid, _, _ = MazeGenerator(41, 31).generate("kruskals")
+        for _ in range(150):
+            grid[random.randrange(1, 30)][random.randrange(1, 40)] = 0
+        cells = [(x, y) for y, row in enumerate(grid) for x, cell in enumerate(row) if cell == 0]
+        hubs = random.sample(cells, 3)
+        queries = [(random.choice(cells), random.choice(hubs)) for _ in range(60)]
+        queries += [(random.choice(cells), random.choice(cells)) for _ in range(20)]
+        
+        groups, placement = group_queries(queries)
+        assert len(groups) < len(queries)
+        tiles = open_tiles(grid, 41, 31)
+        paths = {number: bitboard_paths(tiles, source, targets) for number, (source, targets) in enumerate(groups)}
+        for (start, end), result in zip(queries, assemble_results(queries, placement, paths)):
+            expected = PathFinder(grid, start, end).find_path("bfs", record_steps=False)
+            assert result["path_length"] == len(expected["path"])
+            path = result["path"]
+            if path:
+                assert path[0] == start and path[-1] == end
+                for (x1, y1), (x2, y2) in zip(path, path[1:]):
+                    assert abs(x1 - x2) + abs(y1 - y2) == 1
+                    assert grid[y2][x2] == 0
+    
+    def test_api(self):
+        """Ответ в порядке запросов, недостижимая клетка - пустой путь"""
+        for size in (25, 70):
+            maze = client.post(
+                "/api/maze/generate", json={"width": size, "height": size, "algorithm": "prims"}
+            ).json()
+            start, end = tuple(maze["start"]), tuple(maze["end"])
+            wall = next(
+                (x, y) for y, row in enumerate(maze["grid"]) for x, cell in enumerate(row) if cell
+            )
+            queries = [(start, end), (end, start), (start, end), (start, wall), (end, end)]
+            response = client.post(
+                f"/api/maze/{maze['id']}/paths/batch",
+                json={"queries": [{"start": a, "end": b} for a, b in queries]}
+            )
+            assert response.status_code == 200
+            data = response.json()
+            assert data["searches"] <= 2
+            results = data["results"]
+            expected = PathFinder(maze["grid"], start, end).find_path("bfs", record_steps=False)["path"]
+            assert results[0]["path_length"] == len(expected)
+            assert results[0]["path"][0] == list(start) and results[0]["path"][-1] == list(end)
+            assert results[1]["path"] == results[0]["path"][::-1]
+            assert results[2] == results[0]
+            assert results[3]["path"] == [] and results[3]["path_length"] == 0
+            assert results[4]["path"] == [list(end)]
+        
+        response = client.post(
+            f"/api/maze/{maze['id']}/paths/batch",
+            json={"queries": [{"start": [0, 0], "end": [size, 0]}]}
+        )
+        assert response.status_code == 422
+        assert client.post(
+            "/api/maze/999999/paths/batch", json={"queries": [{"start": [0, 0], "end": [1, 1]}]}
+        ).status_code == 404
+
+
 # Запуск тестов с pytest
 # pytest tests/test_maze.py -v
 # pytest tests/test_maze.py -v --cov=app
\ No newline at end of file
@@ -1,4 +1,4 @@
-import React, { useState, useEffect, useCallback } from 'react';
+import React, { useState, useEffect, useCallback, useRef } from 'react';
 import { mazeApi } from './api/mazeApi';
 import MazeGrid from './components/MazeGrid';
 import Controls from './components/Controls';
@@ -15,6 +15,12 @@ function App() {
   const [currentStepIndex, setCurrentStepIndex] = useState(0);
   const [isPlaying, setIsPlaying] = useState(false);
   const [showPath, setShowPath] = useState(false);
+  const [fps, setFps] = useState(10);
+
+  // Текущий кадр WebSocket-решения: раскрытые клетки копятся на клиенте
+  const [liveStep, setLiveStep] = useState(null);
+  const visitedRef = useRef([]);
+  const streamRef = useRef(null);
 
 
   const [isGenerating, setIsGenerating] = useState(false);
@@ -22,8 +28,18 @@ function App() {
   const [error, setError] = useState(null);
 
 
+  const stopStream = useCallback(() => {
+    streamRef.current?.abort();
+    streamRef.current = null;
+    visitedRef.current = [];
+    setLiveStep(null);
+    setIsSolving(false);
+    setIsPlaying(false);
+  }, []);
+
   const handleGenerate = useCallback(async () => {
     try {
+      stopStream();
       setIsGenerating(true);
       setError(null);
       setSolution(null);
@@ -43,67 +59,106 @@ function App() {
     } finally {
       setIsGenerating(false);
     }
-  }, [mazeSize, generationAlgorithm]);
+  }, [mazeSize, generationAlgorithm, stopStream]);
 
- const handleSolve = async () => {
+  // Поиск идет на сервере и приходит кадрами, полная трасса steps не загружается.
+  // save=false - повторное воспроизведение уже найденного решения
+  const startStream = (save) => {
     if (!maze) return;
 
-    try {
-      setIsSolving(true);
-      setError(null);
-      setCurrentStepIndex(0);
-      setShowPath(false);
+    stopStream();
+    setError(null);
+    setCurrentStepIndex(0);
+    setShowPath(false);
+    setIsSolving(true);
+    setIsPlaying(true);
+
+    const algorithm = pathfindingAlgorithm;
+    streamRef.current = mazeApi.openSolveStream(maze.id, algorithm, {
+      fps,
+      save,
+      onFrame: (frame) => {
+        visitedRef.current = visitedRef.current.concat(frame.expanded);
+        setCurrentStepIndex((prev) => prev + frame.steps);
+        setLiveStep({
+          current: frame.current,
+          visited: visitedRef.current,
+          frontier: frame.frontier,
+        });
+      },
+      onDone: (message) => {
+        streamRef.current = null;
+        setSolution((prev) => ({
+          id: message.solution_id ?? prev?.id,
+          maze_id: maze.id,
+          algorithm,
+          path: message.path,
+          steps: [],
+          step_count: message.step_count,
+          stats: message.stats,
+        }));
+        setShowPath(true);
+        setIsSolving(false);
+        setIsPlaying(false);
+      },
+      onAborted: () => {
+        streamRef.current = null;
+        setIsSolving(false);
+        setIsPlaying(false);
+      },
+      onError: (err) => {
+        streamRef.current = null;
+        setError('Ошибка поиска пути: ' + err.message);
+        console.error(err);
+        setIsSolving(false);
+        setIsPlaying(false);
+      },
+    });
+  };
 
-      const newSolution = await mazeApi.solveMaze(maze.id, pathfindingAlgorithm);
-      setSolution(newSolution);
-    } catch (err) {
-      setError('Ошибка поиска пути: ' + err.message);
-      console.error(err);
-    } finally {
-      setIsSolving(false);
-    }
+  const handleSolve = () => {
+    setSolution(null);
+    startStream(true);
   };
 
   const handlePlayPause = () => {
+    if (!streamRef.current) {
+      startStream(false);
+      return;
+    }
+    if (isPlaying) {
+      streamRef.current.pause();
+    } else {
+      streamRef.current.resume();
+    }
     setIsPlaying(!isPlaying);
   };
 
   const handleReset = () => {
+    stopStream();
     setCurrentStepIndex(0);
-    setIsPlaying(false);
     setShowPath(false);
   };
 
   const handleStepForward = () => {
-    if (solution && currentStepIndex < solution.steps.length - 1) {
-      setCurrentStepIndex(currentStepIndex + 1);
+    if (streamRef.current && !isPlaying) {
+      streamRef.current.step();
     }
   };
 
-  useEffect(() => {
-    
-    if (!isPlaying || !solution) return;
-
-    const interval = setInterval(() => {
-      setCurrentStepIndex((prev) => {
-        if (prev >= solution.steps.length - 1) {
-          setIsPlaying(false);
-          setShowPath(true);
-          return prev;
-        }
-        return prev + 1;
-      });
-    }, 100); 
-
-    return () => clearInterval(interval);
-  }, [isPlaying, solution]);
+  const handleFpsChange = (value) => {
+    setFps(value);
+    streamRef.current?.setFps(value);
+  };
+
+  useEffect(() => () => streamRef.current?.abort(), []);
 
   useEffect(() => {
   handleGenerate();
 }, [handleGenerate]); // ✅ добавили handleGenerate в зависимости
 
 
-  const currentStep = solution?.steps[currentStepIndex];
+  const currentStep = liveStep;
 
   return (
     <div className="min-h-screen bg-gradient-to-br from-blue-50 to-purple-50">
@@ -138,9 +193,11 @@ function App() {
               onPlayPause={handlePlayPause}
               onReset={handleReset}
               onStepForward={handleStepForward}
+              fps={fps}
+              onFpsChange={handleFpsChange}
               isGenerating={isGenerating}
               isSolving={isSolving}
-              hasSolution={!!solution}
+              hasSolution={!!solution || isSolving}
             />
           </div>
 
@@ -1,6 +1,7 @@
 import axios from 'axios';
 
 const API_BASE_URL = 'http://localhost:8000';
+const WS_BASE_URL = API_BASE_URL.replace(/^http/, 'ws');
 
 const api = axios.create({
   baseURL: API_BASE_URL,
@@ -41,6 +42,47 @@ export const mazeApi = {
     return response.data;
   },
 
+  // Сравнение алгоритмов одним запросом: решения сохраняются вместе
+  compareAlgorithms: async (mazeId, algorithms = ['bfs', 'dfs', 'astar']) => {
+    const response = await api.post(`/api/maze/${mazeId}/compare`, {
+      algorithms,
+    });
+    return response.data;
+  },
+
+  // Правка клеток (wall не задан - переключить); в ответе новый путь и ревизия
+  editCells: async (mazeId, cells, revision) => {
+    const response = await api.patch(`/api/maze/${mazeId}/cells`, {
+      cells,
+      revision,
+    });
+    return response.data;
+  },
+
+  // Метрики сложности: sort - поле, '-' в начале - по убыванию; фильтры min_*/max_*
+  getMazeMetrics: async (params = {}) => {
+    const response = await api.get('/api/analytics/mazes', { params });
+    return response.data;
+  },
+
+  // Агрегаты решений по алгоритму, генератору и размеру
+  getAlgorithmStats: async (params = {}) => {
+    const response = await api.get('/api/stats/algorithms', { params });
+    return response.data;
+  },
+
+  exportMazes: async (params = {}) => {
+    const response = await api.get('/api/export', { params, responseType: 'blob' });
+    return response.data;
+  },
+
+  importMazes: async (file) => {
+    const response = await api.post('/api/import', file, {
+      headers: { 'Content-Type': 'application/x-ndjson' },
+    });
+    return response.data;
+  },
+
   getMazeSolutions: async (mazeId) => {
     const response = await api.get(`/api/maze/${mazeId}/solutions`);
     return response.data;
@@ -50,6 +92,71 @@ export const mazeApi = {
     const response = await api.delete(`/api/maze/${mazeId}`);
     return response.data;
   },
+
+  // Пошаговое решение по WebSocket: кадры приходят по мере поиска.
+  // Кадр подтверждается (ack) после отрисовки, поэтому сервер не присылает
+  // больше, чем браузер успевает показать, и сливает лишние кадры.
+  openSolveStream: (mazeId, algorithm, { fps = 30, stepsPerFrame = 1, save = true, onStart, onFrame, onDone, onAborted, onError } = {}) => {
+    const params = new URLSearchParams({
+      algorithm,
+      fps: String(fps),
+      steps_per_frame: String(stepsPerFrame),
+      save: String(save),
+    });
+    const socket = new WebSocket(`${WS_BASE_URL}/ws/maze/${mazeId}/solve?${params}`);
+    let finished = false;
+
+    const send = (message) => {
+      if (socket.readyState === WebSocket.OPEN) {
+        socket.send(JSON.stringify(message));
+      }
+    };
+
+    socket.onmessage = (event) => {
+      const message = JSON.parse(event.data);
+      switch (message.type) {
+        case 'start':
+          onStart?.(message);
+          break;
+        case 'frame':
+          onFrame?.(message);
+          requestAnimationFrame(() => send({ type: 'ack', seq: message.seq }));
+          break;
+        case 'done':
+          finished = true;
+          onDone?.(message);
+          break;
+        case 'aborted':
+          finished = true;
+          onAborted?.(message);
+          break;
+        case 'error':
+          finished = true;
+          onError?.(new Error(message.detail));
+          break;
+        default:
+          break;
+      }
+    };
+
+    socket.onerror = () => {
+      if (!finished) {
+        onError?.(new Error('Соединение WebSocket прервано'));
+      }
+    };
+
+    return {
+      setFps: (value) => send({ type: 'fps', value }),
+      setStepsPerFrame: (value) => send({ type: 'steps_per_frame', value }),
+      pause: () => send({ type: 'pause' }),
+      resume: () => send({ type: 'resume' }),
+      step: () => send({ type: 'step' }),
+      abort: () => {
+        send({ type: 'abort' });
+        socket.close();
+      },
+    };
+  },
 };
 
 export default mazeApi;
\ No newline at end of file
@@ -14,6 +14,8 @@ const Controls = ({
   onPlayPause,
   onReset,
   onStepForward,
+  fps,
+  onFpsChange,
   isGenerating,
   isSolving,
   hasSolution,
@@ -135,6 +137,20 @@ const Controls = ({
               <RotateCcw size={18} />
             </button>
           </div>
+
+          <div className="mt-3">
+            <label className="block text-sm font-medium mb-1">
+              Скорость: {fps} кадр/с
+            </label>
+            <input
+              type="range"
+              min="1"
+              max="60"
+              value={fps}
+              onChange={(e) => onFpsChange(parseInt(e.target.value))}
+              className="w-full"
+            />
+          </div>
         </div>
       )}
 
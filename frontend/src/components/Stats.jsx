@@ -5,8 +5,10 @@ const Stats = ({ solution, currentStepIndex }) => {
   if (!solution) return null;
 
   const { stats, algorithm } = solution;
-  const progress = solution.steps.length > 0 
-    ? Math.round((currentStepIndex / solution.steps.length) * 100)
+  // Решение по WebSocket приходит без трассы, число шагов - в step_count
+  const totalSteps = solution.steps.length || solution.step_count || 0;
+  const progress = totalSteps > 0 
+    ? Math.round((currentStepIndex / totalSteps) * 100)
     : 0;
 
   const algorithmNames = {
@@ -39,7 +41,7 @@ const Stats = ({ solution, currentStepIndex }) => {
             ></div>
           </div>
           <div className="text-xs text-gray-500 mt-1">
-            Шаг {currentStepIndex} из {solution.steps.length}
+            Шаг {currentStepIndex} из {totalSteps}
           </div>
         </div>
 